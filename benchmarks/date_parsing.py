@@ -0,0 +1,58 @@
+"""Measure time taken by parsing birthdays, compared with plain strptime.
+
+Usage:
+    python benchmarks/date_parsing.py [number_of_dates]
+"""
+from __future__ import annotations
+
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from source.datamodels import Birthday  # noqa: E402
+from source.datamodels.fields import DATE_FORMAT, _parsed_dates  # noqa: E402
+
+
+def build_dates(count: int, distinct: int) -> list[str]:
+    first = datetime.date(1950, 1, 1).toordinal()
+    return [
+        datetime.date.fromordinal(first + i % distinct).strftime(DATE_FORMAT)
+        for i in range(count)
+    ]
+
+
+def parse_with_strptime(dates: list[str]) -> None:
+    for date_str in dates:
+        datetime.datetime.strptime(date_str, DATE_FORMAT).date()
+
+
+def parse_with_birthday(dates: list[str]) -> None:
+    for date_str in dates:
+        Birthday.validate_date(date_str)
+
+
+def measure(parser, dates: list[str]) -> float:
+    """Get number of microseconds taken to parse one date."""
+    _parsed_dates.clear()
+    start = time.perf_counter()
+    parser(dates)
+    return (time.perf_counter() - start) / len(dates) * 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    for title, distinct in (("distinct", count), ("repeated", 365 * 70)):
+        dates = build_dates(count, distinct)
+        print(
+            f"{title} dates ({count} dates, {min(distinct, count)} distinct): "
+            f"strptime {measure(parse_with_strptime, dates):.2f} us, "
+            f"validate_date {measure(parse_with_birthday, dates):.2f} us per date"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Measure memory taken by address book records and notes, with and without __slots__.
+
+Usage:
+    python benchmarks/record_memory.py [number_of_records]
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from source.datamodels import Note, Record  # noqa: E402
+
+
+def build_records(count: int) -> list[Record]:
+    return [
+        Record(
+            name_=f"user{i}",
+            phones=[f"{i:010d}", f"{i + 1:010d}"],
+            birthday=f"19{i % 100:02d}.{i % 12 + 1:02d}.{i % 28 + 1:02d}",
+            address=f"Street {i}",
+            email=f"user{i}@example.com",
+        )
+        for i in range(count)
+    ]
+
+
+def build_notes(count: int) -> list[Note]:
+    return [
+        Note(
+            name_=f"user{i}",
+            project_role="Developer",
+            project_tasks=f"Task {i}",
+            hobbies=["Reading", "Music"],
+        )
+        for i in range(count)
+    ]
+
+
+# Classes with the same attributes as slotted ones, that keep attributes in instance __dict__.
+_unslotted_classes: dict[type, type] = {}
+
+
+def unslotted_copy(value):
+    """Copy object along with its fields into instances of classes without __slots__."""
+    if isinstance(value, list):
+        return [unslotted_copy(item) for item in value]
+
+    cls = type(value)
+    slots = [
+        slot
+        for klass in cls.__mro__
+        for slot in getattr(klass, "__slots__", ())
+        if slot not in ("__weakref__", "__dict__")
+    ]
+    if not slots:
+        return value
+
+    if cls not in _unslotted_classes:
+        _unslotted_classes[cls] = type(cls.__name__, (), {})
+    copy = _unslotted_classes[cls]()
+    for slot in slots:
+        setattr(copy, slot, unslotted_copy(getattr(value, slot)))
+    return copy
+
+
+def unslotted(builder):
+    def build(count: int) -> list:
+        return [unslotted_copy(value) for value in builder(count)]
+
+    return build
+
+
+def measure(builder, count: int) -> float:
+    """Get number of bytes allocated per object built by builder."""
+    tracemalloc.start()
+    objects = builder(count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    for title, builder in (("Record", build_records), ("Note", build_notes)):
+        print(
+            f"{title}: {measure(builder, count):.0f} bytes, "
+            f"{measure(unslotted(builder), count):.0f} bytes without __slots__ "
+            f"per {title.lower()} ({count} {title.lower()}s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Measure import time of cli_bot with `python -X importtime` and check it against a budget.
+
+Fails if cli_bot takes longer than budget to import, or if it imports modules that should
+be imported only once they are needed.
+
+Usage:
+    python benchmarks/startup_time.py [budget_ms] [number_of_runs]
+"""
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE = "source.cli_bot"
+# Interactive UI stack is needed only once a session starts, books only once they are opened.
+LAZY_MODULES = ("prompt_toolkit", "source.autocomplete", "source.datamodels", "source.reader")
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Import module in a fresh interpreter, get cumulative import time of every module in microseconds."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_PATH,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Skip the header line.
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 50
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    results = [import_times(MODULE) for _ in range(runs)]
+    best_ms = min(times[MODULE] for times in results) / 1000
+    eager_modules = [
+        lazy
+        for lazy in LAZY_MODULES
+        if any(name == lazy or name.startswith(lazy + ".") for name in results[0])
+    ]
+
+    print(f"{MODULE}: {best_ms:.1f} ms (best of {runs} runs), budget {budget_ms:.1f} ms")
+    if eager_modules:
+        print(f"Imported eagerly: {', '.join(eager_modules)}")
+
+    if best_ms > budget_ms or eager_modules:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,60 @@
 from __future__ import annotations
 
+from contextlib import nullcontext
+from itertools import islice
+from typing import TYPE_CHECKING, ContextManager
+
+from prompt_toolkit.completion import Completer, Completion, NestedCompleter
 from prompt_toolkit.styles import Style
 
+if TYPE_CHECKING:
+    from source.datamodels import AddressBook
+
+
+COMMANDS_WITH_NAMES = [
+    'add-birthday', 'add-address', 'add-email', 'update-phone', 'phone', 'show-birthday', 'delete-contact',
+    'delete-email', 'delete-phone', 'delete-address', 'delete-birthday', 'update-email', 'update-address',
+    'update-birthday'
+]
+# Names completed at most, the completion menu shows only a few of them at once anyway.
+COMPLETIONS_LIMIT = 100
+
+
+class NameCompleter(Completer):
+    """Completes contact names straight from the address book name index, without copying it."""
+
+    def __init__(self, address_book: AddressBook, lock: ContextManager = None):
+        self.address_book = address_book
+        self.lock = lock or nullcontext()
+
+    def get_completions(self, document, complete_event):
+        text = document.text_before_cursor
+
+        # Only the first argument is a name.
+        if " " in text:
+            return
 
-def get_autocomplete(list_of_names: list[str], supported_commands: list[str]) -> dict[str, list[str] | None]:
-    result = {}
+        # Books are saved and refreshed in the background while the prompt waits for input, so names
+        # are taken out of the lazily sorted index before the lock is released.
+        with self.lock:
+            names = list(islice(self.address_book.get_names_starting_with(text), COMPLETIONS_LIMIT))
 
-    commands_with_names = [
-        'add-birthday', 'add-address', 'add-email', 'update-phone', 'phone', 'show-birthday', 'delete-contact',
-        'delete-email', 'delete-phone', 'delete-address', 'delete-birthday', 'update-email', 'update-address',
-        'update-birthday'
-    ]
+        for name in names:
+            yield Completion(name, start_position=-len(text))
 
-    names = {}
-    for name in list_of_names or []:
-        names[name] = None
 
-    for command in supported_commands:
-        result[command] = names if command in commands_with_names else None
+def get_autocomplete(
+    address_book: AddressBook, supported_commands: list[str], lock: ContextManager = None
+) -> NestedCompleter:
+    """Build a completer for bot commands, that stays up to date with address book changes."""
+    name_completer = NameCompleter(address_book, lock)
 
-    return result
+    return NestedCompleter(
+        {
+            command: name_completer if command in COMMANDS_WITH_NAMES else None
+            for command in supported_commands
+        }
+    )
 
 
 style = Style.from_dict({
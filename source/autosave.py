@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from source.reader import BookReader
+
+
+# Seconds between saves, changes made in between are written together by a single save.
+AUTOSAVE_INTERVAL = 30.0
+
+
+class Autosaver(threading.Thread):
+    """Background thread that saves changed books of a book reader at most once per interval.
+
+    Lag of a save is the time from the oldest change it includes until the save is written.
+    """
+
+    def __init__(self, reader: BookReader, interval: float = AUTOSAVE_INTERVAL):
+        super().__init__(name="autosave", daemon=True)
+        self.reader = reader
+        self.interval = interval
+        self._stopped = threading.Event()
+
+        self.saves_count = 0
+        self.failures_count = 0
+        self.last_error: OSError | None = None
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.last_duration = 0.0
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.save()
+
+    def save(self) -> bool:
+        """Save changed books now, failures are counted and retried on the next save.
+
+        Returns:
+            Whether anything was saved.
+        """
+        started_at = time.monotonic()
+        try:
+            oldest_change_at = self.reader.autosave()
+        except OSError as e:
+            self.failures_count += 1
+            self.last_error = e
+            return False
+
+        if oldest_change_at is None:
+            return False
+
+        finished_at = time.monotonic()
+        self.saves_count += 1
+        self.last_duration = finished_at - started_at
+        self.last_lag = finished_at - oldest_change_at
+        self.max_lag = max(self.max_lag, self.last_lag)
+        self.total_lag += self.last_lag
+        return True
+
+    def stop(self) -> None:
+        """Stop the thread, waiting for a save in progress, and save changes made after it."""
+        self._stopped.set()
+        if self.is_alive():
+            self.join()
+        self.save()
+
+    def stats(self) -> dict:
+        """Get metrics of saves made so far, times are in seconds."""
+        return {
+            "saves": self.saves_count,
+            "failures": self.failures_count,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+            "average_lag": self.total_lag / self.saves_count if self.saves_count else 0.0,
+            "last_duration": self.last_duration,
+        }
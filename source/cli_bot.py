@@ -1,19 +1,27 @@
 from __future__ import annotations
 
-from prompt_toolkit import PromptSession
-from prompt_toolkit.completion import NestedCompleter
+import argparse
+from contextlib import nullcontext, redirect_stdout
+import sys
 
-from typing import Any
+from typing import TYPE_CHECKING, Any, Callable, ContextManager, Iterable, TextIO
 from functools import wraps
 
-from source.autocomplete import get_autocomplete, style
-from source.datamodels import (
-    AddressBook,
-    Record,
-    NotesBook,
-    Note,
+from source.autosave import AUTOSAVE_INTERVAL
+from source.output import (
+    DEFAULT_PAGE_SIZE,
+    StreamedOutput,
+    paginate,
+    write_batch_error,
+    write_batch_result,
+    write_output,
 )
-from source.reader import BookReader
+
+# Data models, book readers and the interactive UI stack are imported only once they are needed,
+# so that batch runs and '--help' start fast.
+if TYPE_CHECKING:
+    from source.datamodels import AddressBook, NotesBook
+    from source.journal import Journal
 
 
 class BaseCliHelperException(Exception):
@@ -32,6 +40,10 @@ class CommandOperationalError(BaseCliHelperException):
     """This exception is raised whenever we try to do an operation that is not allowed."""
 
 
+class CommandFailure(str):
+    """Output of a command that failed on invalid input, it is printed as any other output."""
+
+
 def input_error(error_msg_base):
     def decorator(func):
         @wraps(func)
@@ -44,7 +56,7 @@ def input_error(error_msg_base):
                 ValueError,
                 KeyError,
             ) as e:
-                return f"{error_msg_base}: {e}"
+                return CommandFailure(f"{error_msg_base}: {e}")
 
         return wrapper
 
@@ -54,8 +66,16 @@ def input_error(error_msg_base):
 class CliHelperBot:
     _address_book: AddressBook = None
     _notes_book: NotesBook = None
-
-    def __init__(self, address_book: AddressBook, notes_book: NotesBook):
+    _journal: Journal = None
+
+    def __init__(
+        self,
+        address_book: AddressBook,
+        notes_book: NotesBook,
+        journal: Journal = None,
+        lock: ContextManager = None,
+        refresh: Callable[[], None] = None,
+    ):
         self.supported_commands = {
             "close": self.stop,
             "exit": self.stop,
@@ -74,12 +94,16 @@ class CliHelperBot:
             "delete-note": self.delete_note,
             "find-note": self.find_note,
             "all-notes": self.all_notes,
+            "search-notes": self.search_notes,
             "add-project-tasks": self.add_project_tasks,
             "add-hobby": self.add_hobby,
             "find-project-role": self.find_project_role,
             "find-hobby": self.find_hobby,
             "update-hobby": self.update_hobby,
             "delete-contact": self.delete_contact,
+            "import": self.import_contacts,
+            "export": self.export_contacts,
+            "export-notes": self.export_notes,
             "delete-email": self.delete_email,
             "delete-phone": self.delete_phone,
             "delete-address": self.delete_address,
@@ -91,6 +115,31 @@ class CliHelperBot:
         }
         self._address_book = address_book
         self._notes_book = notes_book
+        self._journal = journal
+        # Held while a command runs, so that books are not saved in the middle of it.
+        self._lock = lock or nullcontext()
+        # Picks up changes made by other processes, called before every interactive command.
+        self._refresh = refresh
+
+    def _log_contact_change(self, username: str) -> None:
+        """Append the current state of the contact to the journal, if journaling is enabled."""
+        if self._journal is None:
+            return
+
+        if username in self._address_book:
+            self._journal.log_record(self._address_book.find(username))
+        else:
+            self._journal.log_record_deleted(username)
+
+    def _log_note_change(self, name: str) -> None:
+        """Append the current state of the note to the journal, if journaling is enabled."""
+        if self._journal is None:
+            return
+
+        if name in self._notes_book:
+            self._journal.log_note(self._notes_book.find(name))
+        else:
+            self._journal.log_note_deleted(name)
 
     def help(self, *args: str) -> str:
         """Outputs a help message for user."""
@@ -185,6 +234,7 @@ class CliHelperBot:
             ) from e
 
         record.add_birthday(date_str)
+        self._log_contact_change(username)
         return f"Contact {username} updated with date: {date_str}."
 
     @input_error(error_msg_base="Command 'add' failed")
@@ -207,6 +257,8 @@ class CliHelperBot:
             )
 
         username, phone = args
+        from source.datamodels import Record
+
         record = self._address_book.add_record(Record(name_=username, phones=[phone]))
 
         if record is None:
@@ -215,6 +267,7 @@ class CliHelperBot:
                 f"If you want to update number, please use 'change' command."
             )
 
+        self._log_contact_change(username)
         return f"Contact {username} created with phone: {phone}."
 
     @input_error(error_msg_base="Command 'update' failed")
@@ -247,6 +300,7 @@ class CliHelperBot:
             ) from e
 
         record.edit_phone(record.phones[0].value, phone)
+        self._log_contact_change(username)
         return f"Contact {username} updated with phone: {phone}."
 
     @input_error(error_msg_base="Command 'show-birthday' failed")
@@ -280,11 +334,12 @@ class CliHelperBot:
         return f"User's {username} birthday is: {record.birthday}"
 
     @input_error(error_msg_base="Command 'search' failed")
-    def search_contact(self, *args: str) -> str:
+    def search_contact(self, *args: str) -> str | StreamedOutput:
         """Search user data by search query.
 
         Args:
-            args: List of one argument - search query
+            args: Search query, optionally followed by paging options:
+                offset=N (records to skip), limit=N (records to show), page-size=N (records per output chunk).
 
         Returns:
             Command output.
@@ -292,23 +347,20 @@ class CliHelperBot:
         Raises:
             CommandOperationalError: if wrong arguments
         """
-        if len(args) != 1:
+        query_args, offset, limit, page_size = self._parse_paging_options(args)
+        if len(query_args) != 1:
             raise CommandOperationalError(
                 "command expects an input of one argument: search query. "
                 f"Received: {' '.join(args)}"
             )
 
-        query = args[0]
+        query = query_args[0]
         records = self._address_book.search(query)
 
         if not records:
             return "No records found with provided query."
 
-        command_output = "Found Records: "
-        for record in records:
-            command_output += f"\n{record}"
-
-        return command_output
+        return StreamedOutput(paginate("Found Records: ", records, offset, limit), page_size)
 
     @input_error(error_msg_base="Command 'phone' failed")
     def get_contact(self, *args: str) -> str:
@@ -375,30 +427,60 @@ class CliHelperBot:
 
         return command_output
 
-    def print_all_contacts(self, *args: str) -> str:
+    @input_error(error_msg_base="Command 'all' failed")
+    def print_all_contacts(self, *args: str) -> StreamedOutput:
         """Prepares contacts to be outputted into console.
 
         Args:
-            args: Command doesn't expect any args, list should be empty.
+            args: Optional paging options:
+                offset=N (records to skip), limit=N (records to show), page-size=N (records per output chunk).
 
         Returns:
             Command output.
         """
-        command_output = ""
-        if args:
-            command_output += (
-                "Warning: Command doesn't expect any arguments. "
-                f"Received: {' '.join(args)}\n"
-            )
+        positional_args, offset, limit, page_size = self._parse_paging_options(args)
+        header = self._unexpected_args_warning(positional_args) + "All Records: "
 
-        command_output += "All Records: "
-        for record in self._address_book.values():
-            command_output += f"\n{record}"
+        return StreamedOutput(
+            paginate(header, self._address_book.values(), offset, limit), page_size
+        )
 
-        return command_output
+    @staticmethod
+    def _parse_paging_options(args: tuple[str, ...]) -> (list[str], int, int | None, int):
+        """Split paging options (offset=N, limit=N, page-size=N) from the rest of command arguments.
+
+        Raises:
+            CommandOperationalError: if option value is not a valid number.
+        """
+        options = {"offset": 0, "limit": None, "page-size": DEFAULT_PAGE_SIZE}
+        other_args = []
+
+        for arg in args:
+            option, separator, value = arg.partition("=")
+            if not separator or option not in options:
+                other_args.append(arg)
+                continue
+
+            if not value.isdigit() or (option == "page-size" and int(value) == 0):
+                raise CommandOperationalError(
+                    f"option '{option}' expects a non-negative integer. Received: {arg}"
+                )
+            options[option] = int(value)
+
+        return other_args, options["offset"], options["limit"], options["page-size"]
+
+    @staticmethod
+    def _unexpected_args_warning(positional_args: list[str]) -> str:
+        """Get warning about arguments other than paging options, that are ignored."""
+        if not positional_args:
+            return ""
+        return (
+            "Warning: Command doesn't expect any arguments other than paging options: "
+            f"offset=N, limit=N, page-size=N. Received: {' '.join(positional_args)}\n"
+        )
 
     @input_error(error_msg_base="Command execution failed")
-    def execute_command(self, command: str, args: list[str]) -> str:
+    def execute_command(self, command: str, args: list[str]) -> str | StreamedOutput:
         if command not in self.supported_commands:
             raise CommandNotSupported(f"command '{command}' is not supported!")
 
@@ -436,6 +518,7 @@ class CliHelperBot:
             ) from e
 
         record.add_address(address_str)
+        self._log_contact_change(username)
         return f"Contact {username} updated with address: {address_str}."
 
     @input_error(error_msg_base="Command 'add-email' failed")
@@ -469,6 +552,7 @@ class CliHelperBot:
             ) from e
 
         record.add_email(email_str)
+        self._log_contact_change(username)
         return f"Contact {username} updated with email: {email_str}."
 
     @input_error(error_msg_base="Command 'add-note' failed")
@@ -491,6 +575,8 @@ class CliHelperBot:
             )
 
         name, project_role = args
+        from source.datamodels import Note
+
         note = self._notes_book.add_note(Note(name_=name, project_role=project_role))
 
         if note is None:
@@ -499,6 +585,7 @@ class CliHelperBot:
                 f"If you want to update project role, please use 'change-project-role' command."
             )
 
+        self._log_note_change(name)
         return f"Created note {name} {project_role}."
 
     @input_error(error_msg_base="Command 'delete-note' failed")
@@ -529,6 +616,7 @@ class CliHelperBot:
                 f"Note with name {name} doesn't exist. "
             ) from e
 
+        self._log_note_change(name)
         return f"Note {name} removed from Notes book."
 
     @input_error(error_msg_base="Command 'add-project-tasks' failed")
@@ -563,6 +651,7 @@ class CliHelperBot:
             ) from e
 
         note.add_project_tasks(tasks_str)
+        self._log_note_change(name)
         return f"Note {name} updated"
 
     @input_error(error_msg_base="Command 'find-note' failed")
@@ -650,6 +739,7 @@ class CliHelperBot:
             ) from e
 
         note.add_hobby(hobby_str)
+        self._log_note_change(name)
         return f"Note {name} updated with hobby: {hobby_str}."
 
     @input_error(error_msg_base="Command 'find-hobby' failed")
@@ -709,30 +799,178 @@ class CliHelperBot:
             ) from e
 
         note.edit_hobby(hobby=old_hobby, new_hobby=new_hobby)
+        self._log_note_change(name)
         return f"Note {name} updated with new hobby: {new_hobby}."
 
-    def all_notes(self, *args: str) -> str:
+    @input_error(error_msg_base="Command 'all-notes' failed")
+    def all_notes(self, *args: str) -> StreamedOutput:
         """Prepares notes to be outputted into console.
 
         Args:
-            args: Command doesn't expect any args, list should be empty.
+            args: Optional paging options:
+                offset=N (notes to skip), limit=N (notes to show), page-size=N (notes per output chunk).
 
         Returns:
             Command output.
         """
-        command_output = ""
-        if args:
-            command_output += (
-                "Warning: Command doesn't expect any arguments. "
-                f"Received: {' '.join(args)}\n"
+        positional_args, offset, limit, page_size = self._parse_paging_options(args)
+        header = self._unexpected_args_warning(positional_args) + "All Notes: "
+
+        return StreamedOutput(
+            paginate(header, self._notes_book.values(), offset, limit), page_size
+        )
+
+    @input_error(error_msg_base="Command 'search-notes' failed")
+    def search_notes(self, *args: str) -> str | StreamedOutput:
+        """Search notes by words from project role, project tasks and hobbies, most relevant first.
+
+        Args:
+            args: Search words, optionally followed by paging options:
+                offset=N (notes to skip), limit=N (notes to show), page-size=N (notes per output chunk).
+
+        Returns:
+            Command output.
+
+        Raises:
+            CommandOperationalError: if wrong arguments
+        """
+        query_args, offset, limit, page_size = self._parse_paging_options(args)
+        if not query_args:
+            raise CommandOperationalError(
+                "command expects an input of at least one argument: search words. "
+                f"Received: {' '.join(args)}"
             )
 
-        command_output += "All Notes: "
-        for note in self._notes_book.values():
-            command_output += f"\n{note}"
+        notes = self._notes_book.search(
+            " ".join(query_args), limit=None if limit is None else offset + limit
+        )
+
+        if not notes:
+            return "No notes found with provided query."
+
+        return StreamedOutput(paginate("Found Notes: ", notes, offset, limit), page_size)
+
+    @input_error(error_msg_base="Command 'import' failed")
+    def import_contacts(self, *args: str) -> str:
+        """Import contacts from CSV or vCard file, contacts that already exist are skipped.
+
+        Args:
+            args: Path to CSV file with name, phones, birthday, address and email columns
+                (phones separated by ';'), or to vCard file with .vcf extension.
+
+        Returns:
+            Command output.
+
+        Raises:
+            CommandOperationalError: if wrong arguments or file can't be read
+        """
+        if len(args) != 1:
+            raise CommandOperationalError(
+                "command expects an input of one argument: path to CSV or vCard file. "
+                f"Received: {' '.join(args)}"
+            )
+
+        from source.importer import import_file, write_rejected_report
+
+        path = args[0]
+        try:
+            result = import_file(self._address_book, path)
+        except OSError as e:
+            raise CommandOperationalError(f"file {path} can't be read: {e}") from e
+
+        if self._journal is not None:
+            self._journal.log_records(result.imported)
+
+        command_output = f"Imported {len(result.imported)} contacts."
+        if result.rejected:
+            report_path = f"{path}.rejected.csv"
+            write_rejected_report(result.rejected, report_path)
+            command_output += f" Rejected {len(result.rejected)} rows, see {report_path}."
 
         return command_output
 
+    @input_error(error_msg_base="Command 'export' failed")
+    def export_contacts(self, *args: str) -> str:
+        """Export contacts to CSV (.csv), JSON Lines (.jsonl) or vCard (.vcf) file.
+
+        Args:
+            args: Path to the file, optionally followed by filters:
+                search=QUERY (contacts found by search query), birthdays=N (contacts with BD in N days).
+
+        Returns:
+            Command output.
+
+        Raises:
+            CommandOperationalError: if wrong arguments or file can't be written
+        """
+        from source.exporter import birthday_predicate, export_records, search_predicate
+
+        filters = {}
+        positional_args = []
+        for arg in args:
+            option, separator, value = arg.partition("=")
+            if separator and option in ("search", "birthdays"):
+                filters[option] = value
+            else:
+                positional_args.append(arg)
+
+        if len(positional_args) != 1:
+            raise CommandOperationalError(
+                "command expects an input of one argument: path to the file, "
+                "optionally followed by search=QUERY and birthdays=N filters. "
+                f"Received: {' '.join(args)}"
+            )
+
+        predicates = []
+        if "search" in filters:
+            predicates.append(search_predicate(self._address_book, filters["search"]))
+        if "birthdays" in filters:
+            if not filters["birthdays"].isdigit():
+                raise CommandOperationalError(
+                    f"filter 'birthdays' expects a non-negative integer. Received: {filters['birthdays']}"
+                )
+            predicates.append(birthday_predicate(int(filters["birthdays"])))
+
+        def predicate(record_) -> bool:
+            return all(_predicate(record_) for _predicate in predicates)
+
+        path = positional_args[0]
+        try:
+            export_records(self._address_book, path, predicate if predicates else None)
+        except OSError as e:
+            raise CommandOperationalError(f"file {path} can't be written: {e}") from e
+
+        return f"Contacts exported to {path}."
+
+    @input_error(error_msg_base="Command 'export-notes' failed")
+    def export_notes(self, *args: str) -> str:
+        """Export notes to CSV (.csv) or JSON Lines (.jsonl) file.
+
+        Args:
+            args: Path to the file.
+
+        Returns:
+            Command output.
+
+        Raises:
+            CommandOperationalError: if wrong arguments or file can't be written
+        """
+        from source.exporter import export_notes
+
+        if len(args) != 1:
+            raise CommandOperationalError(
+                "command expects an input of one argument: path to the file. "
+                f"Received: {' '.join(args)}"
+            )
+
+        path = args[0]
+        try:
+            export_notes(self._notes_book, path)
+        except OSError as e:
+            raise CommandOperationalError(f"file {path} can't be written: {e}") from e
+
+        return f"Notes exported to {path}."
+
     @input_error(error_msg_base="Command 'delete-contact' failed")
     def delete_contact(self, *args: str) -> str:
         """Delete contact in Address Book.
@@ -761,6 +999,7 @@ class CliHelperBot:
                 f"user with username {username} doesn't exist. "
             ) from e
 
+        self._log_contact_change(username)
         return f"Contact {username} removed from Address book."
 
     @input_error(error_msg_base="Command 'delete-phone' failed")
@@ -791,6 +1030,7 @@ class CliHelperBot:
             ) from e
 
         record.remove_phone(phone)
+        self._log_contact_change(username)
         return f"Phone of contact  {username} removed from Address book."
 
     @input_error(error_msg_base="Command 'delete-email' failed")
@@ -821,6 +1061,7 @@ class CliHelperBot:
             ) from e
 
         record.remove_email()
+        self._log_contact_change(username)
         return f"Email of contact  {username} removed from Address book."
 
     @input_error(error_msg_base="Command 'delete-address' failed")
@@ -851,6 +1092,7 @@ class CliHelperBot:
             ) from e
 
         record.remove_address()
+        self._log_contact_change(username)
         return f"Address of contact  {username} removed from Address book."
 
     @input_error(error_msg_base="Command 'delete-birthday' failed")
@@ -881,6 +1123,7 @@ class CliHelperBot:
             ) from e
 
         record.remove_birthday()
+        self._log_contact_change(username)
         return f"Birthday of contact {username} removed from Address book."
 
     @input_error(error_msg_base="Command 'update-email' failed")
@@ -911,6 +1154,7 @@ class CliHelperBot:
             ) from e
 
         record.update_email(email)
+        self._log_contact_change(username)
         return f"Email of contact  {username} updated."
 
     @input_error(error_msg_base="Command 'update-address' failed")
@@ -941,6 +1185,7 @@ class CliHelperBot:
             ) from e
 
         record.update_address(address)
+        self._log_contact_change(username)
         return f"Address of contact  {username} updated."
 
     @input_error(error_msg_base="Command 'update-birthday' failed")
@@ -971,29 +1216,35 @@ class CliHelperBot:
             ) from e
 
         record.update_birthday(birthday)
+        self._log_contact_change(username)
         return f"Birthday of contact  {username} updated."
 
     def main(self) -> None:
+        from prompt_toolkit import PromptSession
+
+        from source.autocomplete import get_autocomplete, style
+
+        completer = get_autocomplete(
+            self._address_book, list(self.supported_commands.keys()), self._lock
+        )
+        session = PromptSession(completer=completer, style=style)
 
         while True:
             try:
-                autocomplete_list = get_autocomplete(
-                    self._address_book.get_all_names(),
-                    list(self.supported_commands.keys()),
-                )
-                text = NestedCompleter.from_nested_dict(autocomplete_list)
-                session = PromptSession(completer=text, style=style)
-
                 user_input = session.prompt(
                     "Enter a command with arguments separated with a ' ' character: "
                 )
 
                 command, args = self.parse_input(user_input)
-                command_output = self.execute_command(command, args)
-                print(
-                    f"Command was'{command}' executed, might have been successfully. Result is:"
-                    f"\n{command_output}"
-                )
+                with self._lock:
+                    if self._refresh is not None:
+                        self._refresh()
+                    command_output = self.execute_command(command, args)
+                    print(
+                        f"Command was'{command}' executed, might have been successfully. Result is:"
+                    )
+                    # Streamed output reads books while it is written.
+                    write_output(command_output)
 
             except CliHelperSigStop as e:
                 print(e)
@@ -1006,11 +1257,110 @@ class CliHelperBot:
                 )
                 raise
 
+    def run_batch(self, lines: Iterable[str], stream: TextIO = None) -> None:
+        """Execute commands one per line, without interactive prompt.
+
+        Every result is written to stream as a JSON line, empty lines and lines starting
+        with '#' are skipped. A failed command is reported in its line and the rest are still
+        executed. Execution stops after 'close' or 'exit' command.
+
+        Journal entries of the whole batch are appended under one file lock and flushed at the end.
+        """
+        with self._journal.batch() if self._journal is not None else nullcontext():
+            self._run_batch_lines(lines, stream)
+
+    def _run_batch_lines(self, lines: Iterable[str], stream: TextIO = None) -> None:
+        for line_number, user_input in enumerate(lines, 1):
+            if not user_input.strip() or user_input.lstrip().startswith("#"):
+                continue
+
+            command, args = self.parse_input(user_input)
+            try:
+                command_output = self.execute_command(command, args)
+                # Streamed output is rendered right away, so that its failures belong to the line.
+                output = str(command_output)
+            except CliHelperSigStop as e:
+                write_batch_result(line_number, command, str(e), stream)
+                break
+            except Exception as e:
+                write_batch_error(line_number, command, f"{type(e).__name__}: {e}", stream)
+                continue
+
+            if isinstance(command_output, CommandFailure):
+                write_batch_error(line_number, command, output, stream)
+            else:
+                write_batch_result(line_number, command, output, stream)
+
+
+# Storage backend -> name of book reader class in source.reader
+BOOK_READERS = {
+    "columnar": "ColumnarBookReader",
+    "json": "BookReader",
+    "lazy": "LazyBookReader",
+    "snapshot": "SnapshotBookReader",
+    "sqlite": "SqliteBookReader",
+}
+
+
+def get_book_reader(storage: str):
+    import source.reader
+
+    return getattr(source.reader, BOOK_READERS[storage])()
+
 
 def main():
-    with BookReader() as book:
-        cli_helper = CliHelperBot(book.address_book, book.notes_book)
-        cli_helper.main()
+    parser = argparse.ArgumentParser(prog="cli_bot", description="Personal assistant bot.")
+    parser.add_argument(
+        "--storage",
+        choices=sorted(BOOK_READERS),
+        default="json",
+        help="Storage backend for address book and notes book.",
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="Execute commands from FILE, one per line, and print results as JSON lines. "
+        "Use '-' to read commands from stdin.",
+    )
+    parser.add_argument(
+        "--autosave-interval",
+        metavar="SECONDS",
+        type=float,
+        default=AUTOSAVE_INTERVAL,
+        help="Save changed books in the background at most once per SECONDS in interactive "
+        f"sessions, {AUTOSAVE_INTERVAL:g} by default. Use 0 to save only on exit.",
+    )
+    parser.add_argument(
+        "stdin",
+        nargs="?",
+        choices=["-"],
+        help="Shortcut for '--batch -'.",
+    )
+    cli_args = parser.parse_args()
+    batch_path = cli_args.batch or cli_args.stdin
+
+    if batch_path is None:
+        with get_book_reader(cli_args.storage) as book:
+            if cli_args.autosave_interval > 0:
+                book.start_autosave(cli_args.autosave_interval)
+            cli_helper = CliHelperBot(
+                book.address_book, book.notes_book, book.journal, book.lock, book.refresh
+            )
+            cli_helper.main()
+        return
+
+    results_stream = sys.stdout
+    # Only command results go to stdout, loading and saving messages are moved to stderr.
+    with redirect_stdout(sys.stderr), get_book_reader(cli_args.storage) as book:
+        # Journal is synced once on exit, instead of after every command.
+        book.journal.sync = False
+        cli_helper = CliHelperBot(book.address_book, book.notes_book, book.journal)
+
+        if batch_path == "-":
+            cli_helper.run_batch(sys.stdin, results_stream)
+        else:
+            with open(batch_path, "r") as batch_in:
+                cli_helper.run_batch(batch_in, results_stream)
 
 
 if __name__ == "__main__":
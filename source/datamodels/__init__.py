@@ -1,2 +1,6 @@
 from .address_book import *
+from .columnar_book import *
 from .note_book import *
+from .sqlite_books import *
+from .lazy_books import *
+from .binary_snapshot import *
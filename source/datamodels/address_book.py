@@ -2,14 +2,17 @@ from __future__ import annotations
 
 from collections import UserDict
 from datetime import date
+from typing import Iterable
 import warnings
-import re
 
 from .fields import Address, Birthday, Email, Name, Phone
-from source.utils import get_birthdays_per_days
+from .indexes import BirthdayIndex, FuzzyIndex, NameIndex, PhoneIndex, SearchCache, SubstringIndex
+from source.utils import BIRTHDAY_OUTPUT_FORMAT, compile_search_pattern
 
 
 class Record:
+    __slots__ = ("name", "phones", "birthday", "address", "email", "book", "__weakref__")
+
     def __init__(
         self,
         name_: str,
@@ -23,6 +26,27 @@ class Record:
         self.birthday = Birthday(birthday)
         self.address: Address = Address(address)
         self.email = Email(email)
+        # Address book the record belongs to, it is notified about changes of the record.
+        self.book: AddressBook | None = None
+
+    @classmethod
+    def from_validated(
+        cls,
+        name_: str,
+        phones: list[str],
+        birthday: date | None,
+        address: str | None,
+        email: str | None,
+    ) -> Record:
+        """Create record from values that were already validated, e.g. by importer workers."""
+        record_ = cls.__new__(cls)
+        record_.name = Name(name_)
+        record_.phones = [Phone.from_validated(phone) for phone in phones]
+        record_.birthday = Birthday.from_validated(birthday)
+        record_.address = Address(address)
+        record_.email = Email.from_validated(email)
+        record_.book = None
+        return record_
 
     def __hash__(self):
         return hash(self.name.value)
@@ -30,9 +54,33 @@ class Record:
     def __eq__(self, other):
         return self.name.value == other.self.value
 
+    def _changed(self, field: str, old_value=None, new_value=None) -> None:
+        if self.book is not None:
+            self.book.record_changed(self, field, old_value, new_value)
+
+    def get_birthday_date(self) -> date | None:
+        """Get birthday date of the record, if set."""
+        if self.birthday is not None and isinstance(self.birthday.value, date):
+            return self.birthday.value
+
+    def get_email(self) -> str | None:
+        """Get email of the record, if set."""
+        if self.email is not None and self.email.value is not None and self.email.value != "None":
+            return self.email.value
+
+    def _set_email(self, email: Email | None) -> None:
+        old_email = self.get_email()
+        self.email = email
+        self._changed("email", old_email, self.get_email())
+
+    def _set_birthday(self, birthday: Birthday | None) -> None:
+        old_birthday = self.get_birthday_date()
+        self.birthday = birthday
+        self._changed("birthday", old_birthday, self.get_birthday_date())
+
     def add_birthday(self, birthday_str: str):
         """Add birthday to record, overwrite if already exists."""
-        self.birthday = Birthday(birthday_str)
+        self._set_birthday(Birthday(birthday_str))
 
     def add_phone(self, phone: str):
         """Add phone to record if not already present.
@@ -47,6 +95,7 @@ class Record:
             )
         except KeyError:
             self.phones.append(Phone(phone))
+            self._changed("phones", new_value=phone)
 
     def find_phone(self, phone: str):
         """Find phone record by value.
@@ -79,8 +128,9 @@ class Record:
         if len(query) > 10:
             return
 
+        pattern = compile_search_pattern(query)
         for _phone in self.phones:
-            if re.search(query, _phone.value) is not None:
+            if pattern.search(_phone.value) is not None:
                 return _phone
 
     def remove_phone(self, phone: str):
@@ -94,6 +144,7 @@ class Record:
         """
         _phone = self.find_phone(phone)
         self.phones.remove(_phone)
+        self._changed("phones", old_value=phone)
 
     def edit_phone(self, phone: str, new_phone: str):
         """Edit phone record.
@@ -113,15 +164,16 @@ class Record:
     def add_address(self, address_str: str):
         """Add address to record, overwrite if already exists."""
         self.address = Address(address_str)
+        self._changed("address")
 
     def add_email(self, email_str: str):
         """Add email to record, overwrite if already exists."""
         _email = Email.validate_email(email_str)
-        self.email = Email(_email)
+        self._set_email(Email(_email))
 
     def remove_email(self):
         """Remove email from record."""
-        self.email = None
+        self._set_email(None)
 
     def update_email(self, new_email: str):
         """Update email in record.
@@ -129,19 +181,21 @@ class Record:
         Raises:
             ValueError: if email is invalid.
         """
-        self.email = Email(new_email)
+        self._set_email(Email(new_email))
 
     def remove_address(self):
         """Remove address from record."""
         self.address = None
+        self._changed("address")
 
     def update_address(self, new_address: str):
         """Update address in record."""
         self.address = Address(new_address)
+        self._changed("address")
 
     def remove_birthday(self):
         """Remove birthday from record."""
-        self.birthday = None
+        self._set_birthday(None)
 
     def update_birthday(self, new_birthday: str):
         """Update birthday in record.
@@ -149,8 +203,17 @@ class Record:
         Raises:
             ValueError: if birthday is invalid.
         """
-        validated_date = Birthday.validate_date(new_birthday)
-        self.birthday = Birthday(validated_date)
+        self._set_birthday(Birthday(new_birthday))
+
+    def dump_to_json(self) -> dict:
+        """Dump record into a JSON serializable dict, accepted back by Record constructor."""
+        return {
+            "name_": self.name.value,
+            "phones": [phone.value for phone in self.phones],
+            "birthday": str(self.birthday),
+            "address": str(self.address),
+            "email": str(self.email),
+        }
 
     def __str__(self):
         return (
@@ -162,27 +225,143 @@ class Record:
 
 class AddressBook(UserDict):
     data: dict[str, Record] = {}
+    # Number of edits tolerated by name and email search, once exact search finds nothing.
+    fuzzy_max_distance = 1
+    # Number of search queries with cached results.
+    search_cache_size = 128
+
+    def __init__(self, *args, **kwargs):
+        # Incremented on every change of the book or its records, so cached searches are dropped.
+        self.generation = 0
+        # Names of records added, changed or removed since the book was last saved.
+        self.changed_names: set[str] = set()
+        self.search_cache = SearchCache(self.search_cache_size)
+        self.name_index = NameIndex()
+        self.birthday_index = BirthdayIndex()
+        self._drop_indexes()
+        self._is_indexed = True
+        super().__init__(*args, **kwargs)
+
+    def _drop_indexes(self) -> None:
+        """Forget search indexes, they are built again by the first search that needs them.
+
+        Name and birthday indexes are cheap to keep, search indexes take most of the memory
+        and most of the load time of the book.
+        """
+        self._is_indexed = False
+        self.substring_index = SubstringIndex()
+        self.fuzzy_index = FuzzyIndex()
+        self.phone_index = PhoneIndex()
+
+    def _ensure_indexed(self) -> None:
+        if self._is_indexed:
+            return
+        self._is_indexed = True
+        for record_ in self.data.values():
+            self._index_search_fields(record_)
+
+    def __setitem__(self, name_: str, record_: Record) -> None:
+        self.generation += 1
+        self.changed_names.add(name_)
+        if name_ in self.data:
+            self._unindex_record(self.data[name_])
+        self.data[name_] = record_
+        self._index_record(record_)
+
+    def __delitem__(self, name_: str) -> None:
+        self.generation += 1
+        self._unindex_record(self.data.pop(name_))
+        self.changed_names.add(name_)
+
+    def _index_record(self, record_: Record) -> None:
+        record_.book = self
+        self.name_index.add(record_.name.value)
+        self.birthday_index.add(record_.get_birthday_date(), record_.name.value)
+        if self._is_indexed:
+            self._index_search_fields(record_)
+
+    def _index_search_fields(self, record_: Record) -> None:
+        self.substring_index.add(record_.name.value, record_.name.value)
+        self.substring_index.add(str(record_.get_email()), record_.name.value)
+        self.fuzzy_index.add(record_.name.value, record_.name.value)
+        self.fuzzy_index.add(Email.local_part(record_.get_email()), record_.name.value)
+        for phone in record_.phones:
+            self.phone_index.add(phone.value, record_.name.value)
+
+    def _unindex_record(self, record_: Record) -> None:
+        record_.book = None
+        self.name_index.remove(record_.name.value)
+        self.birthday_index.remove(record_.get_birthday_date(), record_.name.value)
+        if not self._is_indexed:
+            return
+        self.substring_index.remove(record_.name.value, record_.name.value)
+        self.substring_index.remove(str(record_.get_email()), record_.name.value)
+        self.fuzzy_index.remove(record_.name.value, record_.name.value)
+        self.fuzzy_index.remove(Email.local_part(record_.get_email()), record_.name.value)
+        for phone in record_.phones:
+            self.phone_index.remove(phone.value, record_.name.value)
+
+    def record_changed(self, record_: Record, field: str, old_value=None, new_value=None) -> None:
+        """Keep indexes up to date with a change made to one of the book records.
+
+        Args:
+            record_: Changed record.
+            field: Name of the changed record field.
+            old_value: Removed value, if any.
+            new_value: Added value, if any.
+        """
+        self.generation += 1
+        self.changed_names.add(record_.name.value)
+        if field == "birthday":
+            self.birthday_index.remove(old_value, record_.name.value)
+            self.birthday_index.add(new_value, record_.name.value)
+        elif not self._is_indexed:
+            return
+        elif field == "phones":
+            if old_value is not None:
+                self.phone_index.remove(old_value, record_.name.value)
+            if new_value is not None:
+                self.phone_index.add(new_value, record_.name.value)
+        elif field == "email":
+            self.substring_index.remove(str(old_value), record_.name.value)
+            self.substring_index.add(str(new_value), record_.name.value)
+            self.fuzzy_index.remove(Email.local_part(old_value), record_.name.value)
+            self.fuzzy_index.add(Email.local_part(new_value), record_.name.value)
+
+    def mark_saved(self) -> None:
+        """Forget changes made so far, should be called once the book is saved or loaded."""
+        self.changed_names.clear()
 
     def print_book(self):
         for name, record in self.data.items():
             print(record)
 
     def load_data_from_json(self, json_data):
-        self.data = {
-            _record_data["name_"]: Record(**_record_data) for _record_data in json_data
-        }
+        """Replace book content with records from JSON data, search indexes are built only once needed."""
+        self.generation += 1
+        self.data = {}
+        self.name_index = NameIndex()
+        self.birthday_index = BirthdayIndex()
+        self._drop_indexes()
+        for _record_data in json_data:
+            self[_record_data["name_"]] = Record(**_record_data)
+        self.changed_names.clear()
 
     def dump_data_to_json(self):
-        return [
-            {
-                "name_": _record.name.value,
-                "phones": [phone.value for phone in _record.phones],
-                "birthday": str(_record.birthday),
-                "address": str(_record.address),
-                "email": str(_record.email),
-            }
-            for _record in self.data.values()
-        ]
+        return list(self.iter_json_data())
+
+    def iter_json_data(self):
+        """Iterate over records serialized one by one, the same way as in dump_data_to_json."""
+        return (_record.dump_to_json() for _record in self.data.values())
+
+    def snapshot_json_data(self):
+        """Iterate over records serialized one by one, that were in the book at the time of the call.
+
+        Records may be serialized while they are being changed by another thread, so a snapshot
+        is consistent only along with journal entries appended after the call.
+        """
+        records = list(self.data.values())
+        return (_record.dump_to_json() for _record in records)
 
     def add_record(self, record_: Record) -> Record | None:
         """Add a record to an address book if not already present.
@@ -191,12 +370,30 @@ class AddressBook(UserDict):
             record_: Record to add.
         """
         if record_.name.value not in self.data:
-            self.data[record_.name.value] = record_
+            self[record_.name.value] = record_
             return record_
 
+    def add_records(self, records: Iterable[Record]) -> list[Record | None]:
+        """Add many records to an address book, skipping ones that are already present.
+
+        Search indexes are dropped rather than updated record by record, the next search builds
+        them once for the whole book.
+
+        Returns:
+            Added records, None in place of skipped ones.
+        """
+        self._drop_indexes()
+        return [self.add_record(record_) for record_ in records]
+
     def get_birthdays_per_days(self, days) -> dict[str, list[Record]]:
-        """Returns a list of records for users that have BD in a following week."""
-        return get_birthdays_per_days(list(self.data.values()), days)
+        """Returns a list of records for users that have BD in a following number of days.
+
+        Only calendar buckets of the requested days are visited, not the whole book.
+        """
+        return {
+            birthday_date.strftime(BIRTHDAY_OUTPUT_FORMAT): [self.data[name_] for name_ in names]
+            for birthday_date, names in self.birthday_index.upcoming(date.today(), days)
+        }
 
     def search_by_number(self, number_query: str) -> list[Record]:
         """Find all records in address book by number query.
@@ -207,82 +404,101 @@ class AddressBook(UserDict):
         Returns:
             All matched records if any.
         """
-        results = [
-            record for record in self.data.values() if record.search_phone(number_query)
-        ]
+        # The query is too long, phone has 10 chars at max
+        if len(number_query) > 10:
+            return []
+
+        self._ensure_indexed()
+        names = self.phone_index.search(number_query)
 
         # Advanced search will make too much false positives if input term is too short.
-        if not results and len(number_query) > 3:
-            results = set()
-
-            for char in number_query:
-                # Replace a single search character with any digit to account for input error
-                updated_query = number_query.replace(char, r"\d")
-                results.update(
-                    [
-                        record
-                        for record in self.data.values()
-                        if record.search_phone(updated_query)
-                    ]
-                )
-
-        return list(results)
-
-    def search_by_name_or_email(self, query: str):
-        """Find all records in address book by number query.
+        if not names and len(number_query) > 3:
+            # Replace a single search character with any digit to account for input error
+            names = self.phone_index.search_with_typo(number_query)
+
+        return [self.data[name_] for name_ in names]
+
+    def search_by_name_or_email(self, query: str, max_distance: int = None):
+        """Find all records in address book by name or email query.
+
+        Names and emails containing the query as is are looked up in the substring index and
+        sorted by name. If there are none, names and email local parts containing it with a few
+        typos are looked up instead, the closest first.
 
         Args:
             query: Search term
+            max_distance: Number of tolerated typos, fuzzy_max_distance by default.
 
         Returns:
             All matched records if any.
         """
-        results = [
-            record
-            for record in self.data.values()
-            if (query in record.name.value or query in record.email.value)
-        ]
+        self._ensure_indexed()
+        names = self.substring_index.search(query)
 
         # Advanced search will make too much false positives if input term is too short.
-        if not results and len(query) > 3:
-            results = set()
-
-            try:
-                re.compile(query)
-            except re.error:
-                # String cannot be used as a regex pattern, because of some bad characters.
-                return []
-
-            for char in query:
-                updated_query = query.replace(char, ".")
-                results.update(
-                    [
-                        record
-                        for record in self.data.values()
-                        if (
-                            re.search(updated_query, record.name.value) is not None
-                            or re.search(updated_query, record.email.value) is not None
-                        )
-                    ]
-                )
-
-        return list(results)
+        if not names and len(query) > 3:
+            names = self._fuzzy_search(query, max_distance)
+
+        return [self.data[name_] for name_ in names]
+
+    def _fuzzy_search(self, query: str, max_distance: int = None) -> list[str]:
+        if max_distance is None:
+            max_distance = self.fuzzy_max_distance
+        return self.fuzzy_index.search(query, max_distance)
+
+    @staticmethod
+    def _is_number_query(query: str) -> bool:
+        return len(query) <= 10 and all(c.isdigit() for c in query)
+
+    def matches_query(self, record_: Record, query: str) -> bool:
+        """Check whether record matches search query without typos."""
+        if self._is_number_query(query):
+            return any(query in phone.value for phone in record_.phones)
+        return query in record_.name.value or query in str(record_.email)
 
     def search(self, query: str) -> list[Record]:
         """Find all records in address book that meet search criteria.
 
+        Results are cached until the book changes. A query that extends an already cached one
+        is answered by filtering its results, as long as some of them still match.
+
         Args:
             query: Username of the user to find.
 
         Returns:
             A list of all found records.
         """
-        # The input query is a number
-        if len(query) <= 10 and all(c.isdigit() for c in query):
-            return self.search_by_number(query)
+        query = query.strip()
+        names = self.search_cache.get(query, self.generation)
+        if names is not None:
+            return [self.data[name_] for name_ in names]
+
+        cached_prefix = self.search_cache.get_longest_prefix(query, self.generation)
+        if cached_prefix is not None:
+            prefix, prefix_names = cached_prefix
+            # Both queries have to be searched in the same fields to compare results.
+            if self._is_number_query(prefix) == self._is_number_query(query):
+                records = [
+                    record
+                    for record in (self.data[name_] for name_ in prefix_names)
+                    if self.matches_query(record, query)
+                ]
+                # Nothing matches without typos, typo tolerant search has to go over the whole book.
+                if records:
+                    self.search_cache.put(
+                        query, [r.name.value for r in records], self.generation, refined=True
+                    )
+                    return records
 
+        # The input query is a number
+        if self._is_number_query(query):
+            records = self.search_by_number(query)
         # The input query is a name or an email
-        return self.search_by_name_or_email(query)
+        else:
+            records = self.search_by_name_or_email(query)
+
+        self.search_cache.put(query, [r.name.value for r in records], self.generation)
+        return records
 
     def find(self, name_: str) -> Record:
         """Find a record in address book by username.
@@ -308,8 +524,12 @@ class AddressBook(UserDict):
             KeyError: if record doesn't exist.
         """
         _record = self.find(name_)
-        del self.data[name_]
+        del self[name_]
 
     def get_all_names(self) -> list[str]:
         """Get all names from address book."""
         return list(self.data.keys())
+
+    def get_names_starting_with(self, prefix: str):
+        """Iterate over names from address book that start with prefix, ignoring case."""
+        return self.name_index.startswith(prefix)
@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+from array import array
+from contextlib import contextmanager
+from datetime import date
+import gc
+import mmap
+import struct
+from typing import BinaryIO, Iterable
+
+from .columnar_book import NO_BIRTHDAY, ColumnarAddressBook
+from .note_book import Note, NotesBook
+
+
+# Snapshot layout, all numbers are little-endian 64-bit integers unless stated otherwise:
+#   header: magic, format version and kind (32-bit each), number of entries and of strings
+#   sections: byte length and data, padded to 8 bytes; the first one is the string table
+#   footer: byte length of everything before it, end magic
+SNAPSHOT_MAGIC = b"BOOKSNAP"
+SNAPSHOT_END_MAGIC = b"SNAPEND\0"
+SNAPSHOT_VERSION = 1
+RECORDS_KIND = 1
+NOTES_KIND = 2
+
+_HEADER = struct.Struct("<8sIIQQ")
+_SECTION_LENGTH = struct.Struct("<Q")
+_FOOTER = struct.Struct("<Q8s")
+_OFFSET_TYPECODE = "q"
+_ALIGNMENT = 8
+# Strings are joined into one UTF-8 blob with this separator, so it can't be a part of them.
+_STRING_SEPARATOR = "\0"
+# Id of a missing (None) string.
+NO_STRING = -1
+
+# Number of sections following the string table, for every kind of snapshot.
+_SECTIONS_COUNT = {RECORDS_KIND: 7, NOTES_KIND: 5}
+
+
+class SnapshotError(ValueError):
+    """Raised when binary snapshot is damaged, or was written by an unsupported version."""
+
+
+class _StringTable:
+    """Distinct strings of a snapshot, every string is stored once and referred to by id."""
+
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+
+    def add(self, value: str | None) -> int:
+        if value is None:
+            return NO_STRING
+
+        string_id = self.ids.get(value)
+        if string_id is None:
+            if _STRING_SEPARATOR in value:
+                raise ValueError(f"String {value!r} can't be stored in binary snapshot")
+            string_id = self.ids[value] = len(self.ids)
+        return string_id
+
+    def encode(self) -> bytes:
+        return _STRING_SEPARATOR.join(self.ids).encode("utf-8")
+
+
+def _write_snapshot(
+    stream: BinaryIO, kind: int, count: int, strings: _StringTable, sections: list[array]
+) -> None:
+    length = stream.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, kind, count, len(strings.ids)))
+    for section in (strings.encode(), *(section.tobytes() for section in sections)):
+        length += stream.write(_SECTION_LENGTH.pack(len(section)))
+        length += stream.write(section)
+        length += stream.write(b"\0" * (-len(section) % _ALIGNMENT))
+    stream.write(_FOOTER.pack(length, SNAPSHOT_END_MAGIC))
+
+
+def _read_snapshot(buffer, kind: int) -> tuple[int, list[str | None], list[memoryview]]:
+    """Check snapshot header and split it into sections.
+
+    Returns:
+        Number of entries, strings with None at the end, so NO_STRING id refers to it,
+        and views of the rest of sections.
+    """
+    if len(buffer) < _HEADER.size + _FOOTER.size:
+        raise SnapshotError("Snapshot is too short")
+    magic, version, snapshot_kind, count, strings_count = _HEADER.unpack_from(buffer)
+    if magic != SNAPSHOT_MAGIC or snapshot_kind != kind:
+        raise SnapshotError("Snapshot has wrong type")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Snapshot version {version} is not supported")
+
+    view = memoryview(buffer)
+    position = _HEADER.size
+    sections = []
+    for _ in range(_SECTIONS_COUNT[kind] + 1):
+        (length,) = _SECTION_LENGTH.unpack_from(buffer, position)
+        position += _SECTION_LENGTH.size
+        sections.append(view[position:position + length])
+        position += length + -length % _ALIGNMENT
+
+    strings = str(sections[0], "utf-8").split(_STRING_SEPARATOR) if strings_count else []
+    if len(strings) != strings_count:
+        raise SnapshotError("Snapshot string table is damaged")
+    strings.append(None)
+    return count, strings, sections[1:]
+
+
+def _to_array(typecode: str, section: memoryview) -> array:
+    """Copy section of 64-bit integers into array of typecode, that may have a different size."""
+    values = array(typecode)
+    if values.itemsize == array(_OFFSET_TYPECODE).itemsize:
+        values.frombytes(section)
+    else:
+        values.extend(section.cast(_OFFSET_TYPECODE))
+    return values
+
+
+def _strings_of(strings: list[str | None], section: memoryview) -> list[str | None]:
+    return list(map(strings.__getitem__, section.cast(_OFFSET_TYPECODE)))
+
+
+def _ordinal_of(birthday) -> int:
+    if birthday is None or birthday == "None":
+        return NO_BIRTHDAY
+    if isinstance(birthday, date):
+        return birthday.toordinal()
+    year, month, day = birthday.split(".")
+    return date(int(year), int(month), int(day)).toordinal()
+
+
+def write_records_snapshot(records_data: Iterable[dict], stream: BinaryIO) -> None:
+    """Write serialized records as binary snapshot, that is loaded by read_records_snapshot.
+
+    Phones are stored as integers and birthdays as ordinals, names, emails and addresses
+    are stored in the string table, names first.
+    """
+    records_data = list(records_data)
+    strings = _StringTable()
+    for record_data in records_data:
+        strings.add(record_data["name_"])
+
+    emails = array(_OFFSET_TYPECODE)
+    addresses = array(_OFFSET_TYPECODE)
+    birthdays = array(_OFFSET_TYPECODE)
+    phones_start = array(_OFFSET_TYPECODE)
+    phones_count = array(_OFFSET_TYPECODE)
+    phones = array(_OFFSET_TYPECODE)
+    phone_rows = array(_OFFSET_TYPECODE)
+
+    for row, record_data in enumerate(records_data):
+        emails.append(strings.add(record_data["email"]))
+        addresses.append(strings.add(record_data["address"]))
+        birthdays.append(_ordinal_of(record_data["birthday"]))
+        phones_start.append(len(phones))
+        phones_count.append(len(record_data["phones"]))
+        phones.extend(int(phone) for phone in record_data["phones"])
+        phone_rows.extend([row] * len(record_data["phones"]))
+
+    _write_snapshot(
+        stream,
+        RECORDS_KIND,
+        len(records_data),
+        strings,
+        [emails, addresses, birthdays, phones_start, phones_count, phones, phone_rows],
+    )
+
+
+def write_notes_snapshot(notes_data: Iterable[dict], stream: BinaryIO) -> None:
+    """Write serialized notes as binary snapshot, that is loaded by read_notes_snapshot."""
+    notes_data = list(notes_data)
+    strings = _StringTable()
+    for note_data in notes_data:
+        strings.add(note_data["name_"])
+
+    project_roles = array(_OFFSET_TYPECODE)
+    project_tasks = array(_OFFSET_TYPECODE)
+    hobbies_start = array(_OFFSET_TYPECODE)
+    hobbies_count = array(_OFFSET_TYPECODE)
+    hobbies = array(_OFFSET_TYPECODE)
+
+    for note_data in notes_data:
+        project_roles.append(strings.add(note_data["project_role"]))
+        project_tasks.append(strings.add(note_data["project_tasks"]))
+        hobbies_start.append(len(hobbies))
+        hobbies_count.append(len(note_data["hobbies"]))
+        hobbies.extend(strings.add(hobby) for hobby in note_data["hobbies"])
+
+    _write_snapshot(
+        stream,
+        NOTES_KIND,
+        len(notes_data),
+        strings,
+        [project_roles, project_tasks, hobbies_start, hobbies_count, hobbies],
+    )
+
+
+def is_snapshot_complete(path: str) -> bool:
+    """Check that snapshot ends with a footer that matches its length, without reading it all.
+
+    Raises:
+        FileNotFoundError: if snapshot doesn't exist.
+    """
+    with open(path, "rb") as snapshot_in:
+        length = snapshot_in.seek(0, 2) - _FOOTER.size
+        if length < _HEADER.size:
+            return False
+        snapshot_in.seek(length)
+        footer_length, end_magic = _FOOTER.unpack(snapshot_in.read(_FOOTER.size))
+        return footer_length == length and end_magic == SNAPSHOT_END_MAGIC
+
+
+@contextmanager
+def _mapped(path: str):
+    """Map snapshot file, damaged snapshot errors raised inside are turned into SnapshotError."""
+    with open(path, "rb") as snapshot_in:
+        buffer = mmap.mmap(snapshot_in.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield buffer
+    except (struct.error, TypeError, IndexError, UnicodeDecodeError) as e:
+        raise SnapshotError(f"Snapshot is damaged: {e}") from e
+    finally:
+        try:
+            buffer.close()
+        except BufferError:
+            # Views into the map are still referenced by a traceback, it is closed once they are gone.
+            pass
+
+
+@contextmanager
+def _collection_paused():
+    """Pause cyclic garbage collector, that would otherwise rescan loaded objects over and over.
+
+    Loaded objects don't make reference cycles, so nothing is left for the collector to free.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _read_records_columns(buffer) -> dict:
+    count, strings, sections = _read_snapshot(buffer, RECORDS_KIND)
+    emails, addresses, birthdays, phones_start, phones_count, phones, phone_rows = sections
+    return {
+        "names": strings[:count],
+        "emails": _strings_of(strings, emails),
+        "addresses": _strings_of(strings, addresses),
+        "birthdays": _to_array("l", birthdays),
+        "phones_start": _to_array("l", phones_start),
+        "phones_count": _to_array("l", phones_count),
+        "phones": _to_array("q", phones),
+        "phone_rows": _to_array("l", phone_rows),
+    }
+
+
+def _read_notes(buffer) -> list[Note]:
+    count, strings, sections = _read_snapshot(buffer, NOTES_KIND)
+    project_roles, project_tasks, hobbies_start, hobbies_count, hobbies = (
+        section.cast(_OFFSET_TYPECODE).tolist() for section in sections
+    )
+    return [
+        Note(
+            strings[row],
+            strings[project_roles[row]],
+            strings[project_tasks[row]],
+            [
+                strings[hobby]
+                for hobby in hobbies[hobbies_start[row]:hobbies_start[row] + hobbies_count[row]]
+            ],
+        )
+        for row in range(count)
+    ]
+
+
+def read_records_snapshot(path: str, address_book: ColumnarAddressBook) -> None:
+    """Replace address book content with records from binary snapshot, without validating them again.
+
+    Raises:
+        FileNotFoundError: if snapshot doesn't exist.
+        SnapshotError: if snapshot is damaged.
+    """
+    with _collection_paused():
+        with _mapped(path) as buffer:
+            columns = _read_records_columns(buffer)
+        address_book.load_columns(columns)
+
+
+def read_notes_snapshot(path: str, notes_book: NotesBook) -> None:
+    """Replace notes book content with notes from binary snapshot, they are indexed once searched.
+
+    Raises:
+        FileNotFoundError: if snapshot doesn't exist.
+        SnapshotError: if snapshot is damaged.
+    """
+    with _collection_paused():
+        with _mapped(path) as buffer:
+            notes = _read_notes(buffer)
+        notes_book.load_notes(notes)
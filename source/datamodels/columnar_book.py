@@ -0,0 +1,428 @@
+from __future__ import annotations
+
+from array import array
+from collections.abc import MutableMapping
+from datetime import date
+import re
+import sys
+import weakref
+
+from .address_book import AddressBook, Record
+from .fields import DATE_FORMAT, Birthday, Email
+from .indexes import BirthdayIndex, FuzzyIndex, NameIndex, SubstringIndex
+
+
+# Phones are exactly 10 digits, so they fit into signed 64-bit integers.
+PHONE_LENGTH = 10
+# Every phone takes that many bytes of the digits blob, its digits and a separator.
+_PHONE_STRIDE = PHONE_LENGTH + 1
+# Ordinal stored for records without birthday, real dates always have ordinal >= 1.
+NO_BIRTHDAY = 0
+# Deleted phones are marked by this owner row until the next compaction.
+NO_ROW = -1
+
+
+def _intern(value: str | None) -> str | None:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class _ColumnarRecords(MutableMapping):
+    """Dict-like view over address book columns, that materializes records only on access.
+
+    Every record takes one row in name, email, address and birthday columns. Phones of all
+    records live in one flat packed column, each row owns a contiguous range of it. Deleted rows
+    and replaced phone ranges are left as holes and dropped on compaction, once they make up
+    half of the store. Phone search runs over a blob with digits of the phone column, that is
+    built on the first search.
+
+    Objects that are still referenced elsewhere are kept in an identity map, so two lookups
+    of the same name return the same record, and its changes are written back to the columns.
+    """
+
+    def __init__(self, book: ColumnarAddressBook):
+        self.book = book
+        self._loaded = weakref.WeakValueDictionary()
+        self._clear()
+
+    def _clear(self) -> None:
+        self.rows: dict[str, int] = {}
+        self.names: list[str | None] = []
+        self.emails: list[str | None] = []
+        self.addresses: list[str | None] = []
+        self.birthdays = array("l")
+        self.phones_start = array("l")
+        self.phones_count = array("l")
+        self.phones = array("q")
+        self.phone_rows = array("l")
+        self._dead_phones = 0
+        self._digits: bytearray | None = None
+
+    def _drop_phones(self, row: int) -> None:
+        start = self.phones_start[row]
+        count = self.phones_count[row]
+        self.phone_rows[start:start + count] = array("l", [NO_ROW] * count)
+        self._dead_phones += count
+
+    def _write_phones(self, row: int, phones: list[str]) -> None:
+        self.phones_start[row] = len(self.phones)
+        self.phones_count[row] = len(phones)
+        self.phones.extend(int(phone) for phone in phones)
+        self.phone_rows.extend([row] * len(phones))
+        if self._digits is not None:
+            self._digits += self._encode_phones(self.phones[len(self.phones) - len(phones):])
+
+    @staticmethod
+    def _encode_phones(phones) -> bytes:
+        return "".join(f"{phone:0{PHONE_LENGTH}d}\n" for phone in phones).encode("ascii")
+
+    def digits(self) -> bytearray:
+        """Get digits of the phone column, every phone is followed by a newline.
+
+        Phone number i of the column starts at byte i * _PHONE_STRIDE, so a pattern that matches
+        no newline never matches across phones.
+        """
+        if self._digits is None:
+            self._digits = bytearray(self._encode_phones(self.phones))
+        return self._digits
+
+    def rows_with_phone(self, pattern: re.Pattern) -> list[int]:
+        """Get rows, in insertion order, that own a phone matched by bytes pattern of digits."""
+        phone_rows = self.phone_rows
+        starts = (match.start() for match in pattern.finditer(self.digits()))
+        rows = {phone_rows[start // _PHONE_STRIDE] for start in starts}
+        rows.discard(NO_ROW)
+        return sorted(rows)
+
+    def store(self, record_data: dict) -> None:
+        """Insert or update already serialized record, in place of the old one if present."""
+        name_ = record_data["name_"]
+        birthday = record_data["birthday"]
+        if isinstance(birthday, str) and birthday != "None":
+            birthday = Birthday.validate_date(birthday)
+        ordinal = birthday.toordinal() if isinstance(birthday, date) else NO_BIRTHDAY
+
+        row = self.rows.get(name_)
+        if row is None:
+            row = self.rows[name_] = len(self.names)
+            self.names.append(_intern(name_))
+            self.emails.append(None)
+            self.addresses.append(None)
+            self.birthdays.append(NO_BIRTHDAY)
+            self.phones_start.append(0)
+            self.phones_count.append(0)
+        else:
+            self._drop_phones(row)
+
+        self.emails[row] = _intern(record_data["email"])
+        self.addresses[row] = record_data["address"]
+        self.birthdays[row] = ordinal
+        self._write_phones(row, record_data["phones"])
+        self._maybe_compact()
+
+    def phones_of(self, row: int) -> list[str]:
+        start = self.phones_start[row]
+        return [
+            f"{phone:0{PHONE_LENGTH}d}"
+            for phone in self.phones[start:start + self.phones_count[row]]
+        ]
+
+    def birthday_of(self, row: int) -> date | None:
+        ordinal = self.birthdays[row]
+        return date.fromordinal(ordinal) if ordinal != NO_BIRTHDAY else None
+
+    def dump_row(self, row: int) -> dict:
+        """Serialize record stored in the row the same way as Record.dump_to_json does."""
+        birthday = self.birthday_of(row)
+        return {
+            "name_": self.names[row],
+            "phones": self.phones_of(row),
+            "birthday": birthday.strftime(DATE_FORMAT) if birthday is not None else "None",
+            "address": str(self.addresses[row]),
+            "email": str(self.emails[row]),
+        }
+
+    def live_rows(self):
+        """Iterate over rows of records that were not deleted, in insertion order."""
+        return (row for row, name_ in enumerate(self.names) if name_ is not None)
+
+    def copy_columns(self) -> _ColumnarRecords:
+        """Copy columns that rows are dumped from, so they can be dumped while the store changes.
+
+        Columns are copied as a whole, without building anything per row.
+        """
+        copy = _ColumnarRecords(self.book)
+        copy.names = self.names.copy()
+        copy.emails = self.emails.copy()
+        copy.addresses = self.addresses.copy()
+        copy.birthdays = array("l", self.birthdays)
+        copy.phones_start = array("l", self.phones_start)
+        copy.phones_count = array("l", self.phones_count)
+        copy.phones = array("q", self.phones)
+        return copy
+
+    def _compact(self) -> None:
+        """Rebuild columns without deleted rows and replaced phones."""
+        records_data = [self.dump_row(row) for row in self.live_rows()]
+        self._clear()
+        for record_data in records_data:
+            self.store(record_data)
+
+    def _maybe_compact(self) -> None:
+        if len(self.rows) * 2 < len(self.names) or self._dead_phones * 2 > len(self.phones):
+            self._compact()
+
+    def __getitem__(self, name_: str) -> Record:
+        record_ = self._loaded.get(name_)
+        if record_ is None:
+            row = self.rows[name_]
+            record_ = Record(
+                name_=self.names[row],
+                phones=self.phones_of(row),
+                birthday=self.birthday_of(row),
+                address=self.addresses[row],
+                email=self.emails[row],
+            )
+            record_.book = self.book
+            self._loaded[name_] = record_
+        return record_
+
+    def __setitem__(self, name_: str, record_: Record) -> None:
+        replaced = self._loaded.get(name_)
+        if replaced is not None and replaced is not record_:
+            replaced.book = None
+
+        self.store(record_.dump_to_json())
+        record_.book = self.book
+        self._loaded[name_] = record_
+
+    def __delitem__(self, name_: str) -> None:
+        row = self.rows.pop(name_)
+        self._drop_phones(row)
+        self.names[row] = self.emails[row] = self.addresses[row] = None
+        self.birthdays[row] = NO_BIRTHDAY
+        record_ = self._loaded.pop(name_, None)
+        if record_ is not None:
+            record_.book = None
+        self._maybe_compact()
+
+    def __contains__(self, name_: object) -> bool:
+        return name_ in self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def get_many(self, rows) -> list[Record]:
+        return [self[self.names[row]] for row in rows]
+
+    def _unload(self) -> None:
+        for record_ in self._loaded.values():
+            record_.book = None
+        self._loaded = weakref.WeakValueDictionary()
+
+    def replace_all(self, json_data: list[dict]) -> None:
+        """Replace whole store content with already serialized records."""
+        self._unload()
+        self._clear()
+        for record_data in json_data:
+            self.store(record_data)
+
+    def replace_columns(
+        self,
+        names: list[str],
+        emails: list[str | None],
+        addresses: list[str | None],
+        birthdays: array,
+        phones_start: array,
+        phones_count: array,
+        phones: array,
+        phone_rows: array,
+    ) -> None:
+        """Replace whole store content with columns of live rows, that are used as is, without validation."""
+        self._unload()
+        self._clear()
+        self.rows = dict(zip(names, range(len(names))))
+        self.names = names
+        self.emails = emails
+        self.addresses = addresses
+        self.birthdays = birthdays
+        self.phones_start = phones_start
+        self.phones_count = phones_count
+        self.phones = phones
+        self.phone_rows = phone_rows
+
+
+class ColumnarAddressBook(AddressBook):
+    """Address book that keeps records in packed columns, records are built only when accessed.
+
+    Phone search and JSON dump are passes over the columns, that never build records that are
+    not part of the result. Name, search and birthday indexes are built from the columns on the
+    first lookup, so that loads don't pay for them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.data = _ColumnarRecords(self)
+        self._is_indexed = True
+        self._birthdays_indexed = True
+        self.update(*args, **kwargs)
+
+    def _email_of(self, name_: str) -> str | None:
+        return self.data.emails[self.data.rows[name_]]
+
+    def _index_names(self, name_: str, email: str | None) -> None:
+        if not self._is_indexed:
+            return
+        self.name_index.add(name_)
+        self.substring_index.add(name_, name_)
+        self.substring_index.add(str(email), name_)
+        self.fuzzy_index.add(name_, name_)
+        self.fuzzy_index.add(Email.local_part(email), name_)
+
+    def _unindex_names(self, name_: str, email: str | None) -> None:
+        if not self._is_indexed:
+            return
+        self.name_index.remove(name_)
+        self.substring_index.remove(name_, name_)
+        self.substring_index.remove(str(email), name_)
+        self.fuzzy_index.remove(name_, name_)
+        self.fuzzy_index.remove(Email.local_part(email), name_)
+
+    def _index_birthday(self, name_: str, birthday: date | None) -> None:
+        if self._birthdays_indexed:
+            self.birthday_index.add(birthday, name_)
+
+    def _unindex_birthday(self, name_: str, birthday: date | None) -> None:
+        if self._birthdays_indexed:
+            self.birthday_index.remove(birthday, name_)
+
+    def _drop_indexes(self) -> None:
+        self.name_index = NameIndex()
+        self.substring_index = SubstringIndex()
+        self.fuzzy_index = FuzzyIndex()
+        self.birthday_index = BirthdayIndex()
+        self._is_indexed = False
+        self._birthdays_indexed = False
+
+    def _ensure_indexed(self) -> None:
+        if self._is_indexed:
+            return
+        self._is_indexed = True
+        for name_ in self.data:
+            self._index_names(name_, self._email_of(name_))
+
+    def _ensure_birthdays_indexed(self) -> None:
+        if self._birthdays_indexed:
+            return
+        self._birthdays_indexed = True
+        for name_, row in self.data.rows.items():
+            self._index_birthday(name_, self.data.birthday_of(row))
+
+    def __setitem__(self, name_: str, record_: Record) -> None:
+        self.generation += 1
+        self.changed_names.add(name_)
+        # Phones are searched in the columns, without an index.
+        if name_ in self.data:
+            self._unindex_names(name_, self._email_of(name_))
+            self._unindex_birthday(name_, self.data.birthday_of(self.data.rows[name_]))
+        self.data[name_] = record_
+        self._index_names(name_, record_.get_email())
+        self._index_birthday(name_, record_.get_birthday_date())
+
+    def __delitem__(self, name_: str) -> None:
+        self.generation += 1
+        email = self._email_of(name_)
+        birthday = self.data.birthday_of(self.data.rows[name_])
+        del self.data[name_]
+        self._unindex_names(name_, email)
+        self._unindex_birthday(name_, birthday)
+        self.changed_names.add(name_)
+
+    def record_changed(self, record_: Record, field: str, old_value=None, new_value=None) -> None:
+        """Write changed record back into its row."""
+        if record_.name.value not in self.data:
+            return
+
+        self.generation += 1
+        self.changed_names.add(record_.name.value)
+        self.data.store(record_.dump_to_json())
+        if field == "email" and self._is_indexed:
+            self.substring_index.remove(str(old_value), record_.name.value)
+            self.substring_index.add(str(new_value), record_.name.value)
+            self.fuzzy_index.remove(Email.local_part(old_value), record_.name.value)
+            self.fuzzy_index.add(Email.local_part(new_value), record_.name.value)
+        elif field == "birthday":
+            self._unindex_birthday(record_.name.value, old_value)
+            self._index_birthday(record_.name.value, new_value)
+
+    def load_data_from_json(self, json_data):
+        self.generation += 1
+        self._drop_indexes()
+        self.data.replace_all(json_data)
+        self.changed_names.clear()
+
+    def load_columns(self, columns: dict) -> None:
+        """Replace whole book content with already validated columns, see _ColumnarRecords.replace_columns."""
+        self.generation += 1
+        self._drop_indexes()
+        self.data.replace_columns(**columns)
+        self.changed_names.clear()
+
+    def get_names_starting_with(self, prefix: str):
+        self._ensure_indexed()
+        return super().get_names_starting_with(prefix)
+
+    def iter_json_data(self):
+        """Iterate over records serialized straight from columns, without building records."""
+        return (self.data.dump_row(row) for row in self.data.live_rows())
+
+    def snapshot_json_data(self):
+        """Iterate over records serialized from a copy of the columns, taken at the time of the call.
+
+        Columns are changed in place and rebuilt by compaction, so records can't be serialized
+        from them while the book is used.
+        """
+        data = self.data.copy_columns()
+        return (data.dump_row(row) for row in data.live_rows())
+
+    def get_birthdays_per_days(self, days) -> dict[str, list[Record]]:
+        self._ensure_birthdays_indexed()
+        return super().get_birthdays_per_days(days)
+
+    def search_by_number(self, number_query: str) -> list[Record]:
+        """Find all records in address book by number query.
+
+        Phones are matched by regex search over digits of the phone column, see
+        _ColumnarRecords.digits.
+
+        Args:
+            number_query: Number search term
+
+        Returns:
+            All matched records if any.
+        """
+        # The query is too long, phone has 10 chars at max
+        if len(number_query) > PHONE_LENGTH:
+            return []
+
+        # Every phone contains an empty query.
+        if not number_query:
+            return self.data.get_many(sorted(set(self.data.phone_rows) - {NO_ROW}))
+
+        query = number_query.encode()
+        rows = self.data.rows_with_phone(re.compile(re.escape(query)))
+
+        # Advanced search will make too much false positives if input term is too short.
+        if not rows and len(query) > 3:
+            # Replace a single search character with any digit to account for input error.
+            # Patterns are searched one by one, patterns starting with a literal are much faster
+            # than a single alternation.
+            found = set()
+            for i in range(len(query)):
+                pattern = re.escape(query[:i]) + b"[0-9]" + re.escape(query[i + 1:])
+                found.update(self.data.rows_with_phone(re.compile(pattern)))
+            rows = sorted(found)
+
+        return self.data.get_many(rows)
@@ -1,38 +1,82 @@
+from __future__ import annotations
+
 import datetime
 from datetime import date
 import re
 
 
 DATE_FORMAT = "%Y.%m.%d"
+# Dates parsed by Birthday.validate_date, by their strings: the same birthdays repeat a lot.
+_parsed_dates: dict[str, date] = {}
+# The table is cleared once it grows that big, there are fewer distinct birthdays in practice.
+PARSED_DATES_LIMIT = 65536
+EMAIL_PATTERN = re.compile(r"^[\w\.-]+@[a-zA-Z\d\.-]+\.[a-zA-Z]{2,}$")
 
 
 class Field:
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
+    @classmethod
+    def from_validated(cls, value):
+        """Create field with already validated value, validation of subclasses is skipped."""
+        field = cls.__new__(cls)
+        field.value = value
+        return field
+
     def __str__(self):
         return str(self.value)
 
 
 class Name(Field):
-    pass
+    __slots__ = ()
 
 
 class Birthday(Field):
+    __slots__ = ()
+
     def __init__(self, value):
-        if value is not None and value != "None":
+        # Already parsed dates are accepted as is.
+        if value is not None and value != "None" and not isinstance(value, date):
             value = self.validate_date(value)
         super().__init__(value=value)
 
     @staticmethod
     def validate_date(date_str: str) -> date:
-        """Validate date string, raises ValueError if date cannot be parsed"""
+        """Validate date string, raises ValueError if date cannot be parsed
+
+        Dates are parsed the same way as with strptime and DATE_FORMAT, parsed dates are remembered.
+        """
+        parsed = _parsed_dates.get(date_str) if type(date_str) is str else None
+        if parsed is not None:
+            return parsed
+
         try:
-            return datetime.datetime.strptime(date_str, DATE_FORMAT).date()
-        except Exception:
+            parsed = Birthday._parse_date(date_str)
+        except (ValueError, TypeError) as e:
             raise ValueError(
                 f"Provided date {date_str} should follow format {DATE_FORMAT}, aborting ..."
-            )
+            ) from e
+
+        if len(_parsed_dates) >= PARSED_DATES_LIMIT:
+            _parsed_dates.clear()
+        _parsed_dates[date_str] = parsed
+        return parsed
+
+    @staticmethod
+    def _parse_date(date_str: str) -> date:
+        """Parse date in YYYY.MM.DD form without strptime, other forms it accepts are left to it."""
+        year, month, day = date_str[:4], date_str[5:7], date_str[8:]
+        if (
+            len(date_str) == 10
+            and date_str[4] == date_str[7] == "."
+            and date_str.isascii()
+            and (year + month + day).isdigit()
+        ):
+            return date(int(year), int(month), int(day))
+        return datetime.datetime.strptime(date_str, DATE_FORMAT).date()
 
     def __str__(self):
         if not self.value or self.value == "None":
@@ -41,6 +85,8 @@ class Birthday(Field):
 
 
 class Phone(Field):
+    __slots__ = ()
+
     def __init__(self, phone: str):
         validated_phone = self.validate_phone(phone)
         super().__init__(value=validated_phone)
@@ -62,12 +108,19 @@ class Phone(Field):
 
 
 class Address(Field):
+    __slots__ = ()
+
     def __init__(self, address: str):
-        self.address = address
         super().__init__(value=address)
 
+    @property
+    def address(self) -> str:
+        return self.value
+
 
 class Email(Field):
+    __slots__ = ()
+
     def __init__(self, email: str):
         super().__init__(value=email)
 
@@ -75,8 +128,7 @@ class Email(Field):
     def validate_email(email: str):
         """Validate email, raises ValueError if email is not valid"""
         try:
-            pattern = r"^[\w\.-]+@[a-zA-Z\d\.-]+\.[a-zA-Z]{2,}$"
-            if re.match(pattern, email):
+            if EMAIL_PATTERN.match(email):
                 return email
             else:
                 raise ValueError
@@ -84,20 +136,26 @@ class Email(Field):
         except ValueError as e:
             raise ValueError(f"Email is not valid, entered: {email}") from e
 
+    @staticmethod
+    def local_part(email: str | None) -> str | None:
+        """Get part of email before @, if email is set."""
+        if email is not None and email != "None":
+            return email.partition("@")[0]
+
 
 class ProjectRole(Field):
     """Generic class for project roles"""
 
-    pass
+    __slots__ = ()
 
 
 class ProjectTasks(Field):
     """Generic class for project tasks"""
 
-    pass
+    __slots__ = ()
 
 
 class Hobby(Field):
     """Generic class for hobbies"""
 
-    pass
+    __slots__ = ()
@@ -0,0 +1,555 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+import calendar
+from collections import Counter, OrderedDict, defaultdict
+from datetime import date, timedelta
+from functools import cache
+import heapq
+from itertools import combinations
+import math
+import re
+
+from source.utils import compile_search_pattern
+
+
+# Any leap year works, it is used only to number days of year including Feb 29.
+_LEAP_YEAR = 2000
+_FEB_29_SLOT = date(_LEAP_YEAR, 2, 29).timetuple().tm_yday - 1
+
+
+class NameIndex:
+    """Record names sorted case-insensitively, for fast prefix lookups.
+
+    New names are appended and the list is re-sorted lazily on the next lookup, which is cheap
+    for an almost sorted list and lets bulk loads pay for a single sort.
+    """
+
+    def __init__(self):
+        self._names: list[tuple[str, str]] = []
+        self._is_sorted = True
+
+    def _ensure_sorted(self) -> None:
+        if not self._is_sorted:
+            self._names.sort()
+            self._is_sorted = True
+
+    def add(self, name_: str) -> None:
+        self._names.append((name_.casefold(), name_))
+        self._is_sorted = False
+
+    def remove(self, name_: str) -> None:
+        self._ensure_sorted()
+        key = (name_.casefold(), name_)
+        position = bisect_left(self._names, key)
+        if position < len(self._names) and self._names[position] == key:
+            del self._names[position]
+
+    def startswith(self, prefix: str):
+        """Iterate over names starting with prefix, ignoring case."""
+        self._ensure_sorted()
+        prefix = prefix.casefold()
+        position = bisect_left(self._names, (prefix,))
+        while position < len(self._names) and self._names[position][0].startswith(prefix):
+            yield self._names[position][1]
+            position += 1
+
+
+class ValueIndex:
+    """Field values of book entries, compared ignoring case, mapped to names of entries that have them."""
+
+    def __init__(self):
+        # Dicts keep names ordered by insertion, values are unused.
+        self._names: dict[str, dict[str, None]] = defaultdict(dict)
+
+    def add(self, value: str | None, name_: str) -> None:
+        """Add value of entry with name_, values other than strings are ignored."""
+        if isinstance(value, str):
+            self._names[value.casefold()][name_] = None
+
+    def remove(self, value: str | None, name_: str) -> None:
+        """Remove value of entry with name_, if present."""
+        if not isinstance(value, str):
+            return
+
+        key = value.casefold()
+        names = self._names.get(key)
+        if names is None:
+            return
+
+        names.pop(name_, None)
+        if not names:
+            del self._names[key]
+
+    def get(self, value: str) -> list[str]:
+        """Get names of entries that have value, ignoring case."""
+        return list(self._names.get(value.casefold(), ()))
+
+
+def substring_matcher(query: str):
+    """Build a function that gets the smallest edit distance between query and any substring of a text.
+
+    Uses bit-parallel algorithm by Myers, every bit holds a difference between neighbouring
+    cells of one column of the edit distance matrix, so a whole column is updated at once.
+    """
+    length = len(query)
+    full_mask = (1 << length) - 1
+    last_bit = 1 << (length - 1) if length else 0
+    # char -> bits set at positions where it appears in query
+    char_masks = {}
+    for position, char in enumerate(query):
+        char_masks[char] = char_masks.get(char, 0) | (1 << position)
+
+    def distance(text: str) -> int:
+        positive, negative = full_mask, 0
+        score = best = length
+        for char in text:
+            equal = char_masks.get(char, 0)
+            vertical = equal | negative
+            horizontal = (((equal & positive) + positive) ^ positive) | equal
+            horizontal_positive = negative | (~(horizontal | positive) & full_mask)
+            horizontal_negative = positive & horizontal
+
+            if horizontal_positive & last_bit:
+                score += 1
+            elif horizontal_negative & last_bit:
+                score -= 1
+                if score < best:
+                    best = score
+
+            # Matches can start anywhere in text, so the top row stays zero.
+            horizontal_positive = (horizontal_positive << 1) & full_mask
+            horizontal_negative = (horizontal_negative << 1) & full_mask
+            positive = horizontal_negative | (~(vertical | horizontal_positive) & full_mask)
+            negative = horizontal_positive & vertical
+
+        return best
+
+    return distance
+
+
+class _TermIndex:
+    """Short terms (e.g. names) of book entries, along with postings of their bigrams."""
+
+    def __init__(self):
+        # term -> names of entries that have it
+        self._owners: dict[str, dict[str, None]] = defaultdict(dict)
+        # bigram -> terms containing it
+        self._grams: dict[str, set[str]] = defaultdict(set)
+
+    @staticmethod
+    def _normalize(term: str) -> str:
+        return term
+
+    @staticmethod
+    def _split(value: str) -> set[str]:
+        return {value[i:i + 2] for i in range(len(value) - 1)}
+
+    def add(self, term: str | None, name_: str) -> None:
+        """Add term of entry with name_, values other than strings are ignored."""
+        if not isinstance(term, str):
+            return
+
+        term = self._normalize(term)
+        if term not in self._owners:
+            for gram in self._split(term):
+                self._grams[gram].add(term)
+        self._owners[term][name_] = None
+
+    def remove(self, term: str | None, name_: str) -> None:
+        """Remove term of entry with name_, if present."""
+        if not isinstance(term, str):
+            return
+
+        term = self._normalize(term)
+        owners = self._owners.get(term)
+        if owners is None:
+            return
+
+        owners.pop(name_, None)
+        if owners:
+            return
+
+        del self._owners[term]
+        for gram in self._split(term):
+            terms = self._grams[gram]
+            terms.discard(term)
+            if not terms:
+                del self._grams[gram]
+
+    def _terms_containing(self, piece: str):
+        """Get terms that contain piece as is, piece has to be at least one character long.
+
+        Terms of a single character are left out for pieces of a single character.
+        """
+        if len(piece) == 1:
+            return set().union(*(terms for gram, terms in self._grams.items() if piece in gram))
+
+        postings = sorted((self._grams.get(gram, set()) for gram in self._split(piece)), key=len)
+        return {term for term in postings[0].intersection(*postings[1:]) if piece in term}
+
+    def _estimate(self, piece: str) -> int:
+        """Get the number of terms containing piece at most, without looking them up."""
+        if len(piece) == 1:
+            return sum(len(terms) for gram, terms in self._grams.items() if piece in gram)
+        return min(len(self._grams.get(gram, ())) for gram in self._split(piece))
+
+    def _owners_of(self, terms) -> list[str]:
+        names = {}
+        for term in terms:
+            names.update(self._owners[term])
+        return list(names)
+
+
+class SubstringIndex(_TermIndex):
+    """Index of short terms (e.g. names and emails), that finds terms containing a query as is.
+
+    Only terms that have every bigram of the query are checked.
+    """
+
+    def search(self, query: str) -> list[str]:
+        """Get names of entries that have a term containing query, case-sensitively.
+
+        Returns:
+            Names sorted ignoring case, the same way as in NameIndex.
+        """
+        # Query is too short to be narrowed down by bigrams, every term is checked.
+        if len(query) < 2:
+            terms = [term for term in self._owners if query in term]
+        else:
+            terms = self._terms_containing(query)
+        return sorted(self._owners_of(terms), key=lambda name_: (name_.casefold(), name_))
+
+
+class FuzzyIndex(_TermIndex):
+    """Typo tolerant index of short terms (e.g. names), that finds terms containing a query with few edits.
+
+    Terms are compared ignoring case. Query is split into one more piece than the number of
+    tolerated edits, every edit changes at most one piece, so only terms containing one of the
+    pieces as is are checked with the edit distance. Pieces are cut so that they are contained
+    in as few terms as possible, which is estimated with postings of their bigrams.
+    """
+
+    @staticmethod
+    def _normalize(term: str) -> str:
+        return term.casefold()
+
+    def _pieces(self, query: str, count: int) -> list[str]:
+        """Split query into count pieces, that are contained in the fewest terms."""
+        estimate = cache(self._estimate)
+        cuts = min(
+            combinations(range(1, len(query)), count - 1),
+            key=lambda cuts: sum(
+                estimate(query[start:end]) for start, end in zip((0, *cuts), (*cuts, len(query)))
+            ),
+        )
+        return [query[start:end] for start, end in zip((0, *cuts), (*cuts, len(query)))]
+
+    def _candidates(self, query: str, max_distance: int):
+        # Query is too short to be narrowed down by an index, every term is a candidate. Longer
+        # queries can't be contained in terms of a single character, so pieces never miss them.
+        if len(query) <= max_distance + 1:
+            return self._owners
+
+        pieces = self._pieces(query, max_distance + 1)
+        candidates = set().union(*(self._terms_containing(piece) for piece in pieces))
+
+        # Every edit breaks at most two bigrams of the query, terms sharing too few are dropped.
+        grams = self._split(query)
+        min_shared = len(grams) - 2 * max_distance
+        if min_shared <= 0:
+            return candidates
+        postings = [self._grams.get(gram, set()) for gram in grams]
+        return [term for term in candidates if sum(term in terms for terms in postings) >= min_shared]
+
+    def search(self, query: str, max_distance: int = 1) -> list[str]:
+        """Get names of entries that have a term containing query with at most max_distance edits.
+
+        Returns:
+            Names ordered by distance, the closest first.
+        """
+        query = query.casefold()
+        distance = substring_matcher(query)
+        matches = []
+        for term in self._candidates(query, max_distance):
+            term_distance = distance(term)
+            if term_distance <= max_distance:
+                matches.append((term_distance, term))
+
+        return self._owners_of(term for _, term in sorted(matches))
+
+
+class TextIndex:
+    """Inverted index over free text of book entries, that ranks matches with Okapi BM25.
+
+    Text is split into casefolded words. Every word keeps its frequency per entry, so a query
+    visits only entries that contain at least one of its words.
+    """
+
+    k1 = 1.2
+    b = 0.75
+    _word_pattern = re.compile(r"\w+")
+
+    def __init__(self):
+        # word -> name of entry -> number of occurrences
+        self._postings: dict[str, dict[str, int]] = defaultdict(dict)
+        # name of entry -> number of words in its text
+        self._lengths: dict[str, int] = {}
+        # name of entry -> distinct words of its text
+        self._words: dict[str, list[str]] = {}
+        self._total_length = 0
+
+    @classmethod
+    def tokenize(cls, text: str) -> list[str]:
+        return [word.casefold() for word in cls._word_pattern.findall(text)]
+
+    def add(self, text: str, name_: str) -> None:
+        """Index text of entry with name_, replacing previously indexed text if any."""
+        self.remove(name_)
+
+        words = self.tokenize(text)
+        counts = Counter(words)
+        for word, count in counts.items():
+            self._postings[word][name_] = count
+        self._words[name_] = list(counts)
+        self._lengths[name_] = len(words)
+        self._total_length += len(words)
+
+    def remove(self, name_: str) -> None:
+        """Remove text of entry with name_ from index, if present."""
+        length = self._lengths.pop(name_, None)
+        if length is None:
+            return
+
+        self._total_length -= length
+        for word in self._words.pop(name_):
+            del self._postings[word][name_]
+            if not self._postings[word]:
+                del self._postings[word]
+
+    def search(self, query: str, limit: int | None = None) -> list[str]:
+        """Get names of entries that contain any word of query, most relevant first.
+
+        Args:
+            query: Search text.
+            limit: Maximum number of names to return, all matches if not set.
+        """
+        if not self._lengths:
+            return []
+
+        entries_count = len(self._lengths)
+        average_length = self._total_length / entries_count
+        scores = defaultdict(float)
+
+        for word in set(self.tokenize(query)):
+            postings = self._postings.get(word)
+            if not postings:
+                continue
+
+            idf = math.log(1 + (entries_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for name_, count in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[name_] / average_length)
+                scores[name_] += idf * count * (self.k1 + 1) / (count + norm)
+
+        if limit is None:
+            return sorted(scores, key=scores.get, reverse=True)
+        return heapq.nlargest(limit, scores, key=scores.get)
+
+
+class SearchCache:
+    """LRU cache of names found by search queries, that is emptied once the searched book changes.
+
+    Book changes are tracked by a generation number, that the book increments on every change
+    and passes along with every lookup.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self.generation = 0
+        self._entries: OrderedDict[str, list[str]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.refinements = 0
+
+    def _validate(self, generation: int) -> None:
+        if generation != self.generation:
+            self._entries.clear()
+            self.generation = generation
+
+    def get(self, query: str, generation: int) -> list[str] | None:
+        """Get names cached for query, if any."""
+        self._validate(generation)
+        names = self._entries.get(query)
+        if names is not None:
+            self._entries.move_to_end(query)
+            self.hits += 1
+        return names
+
+    def get_longest_prefix(self, query: str, generation: int) -> tuple[str, list[str]] | None:
+        """Get the longest cached query that query starts with, along with its names."""
+        self._validate(generation)
+        for length in range(len(query) - 1, 0, -1):
+            names = self._entries.get(query[:length])
+            if names is not None:
+                return query[:length], names
+
+    def put(self, query: str, names: list[str], generation: int, refined: bool = False) -> None:
+        """Cache names found for query, either by a full search or by refining cached names."""
+        self._validate(generation)
+        if refined:
+            self.refinements += 1
+        else:
+            self.misses += 1
+
+        if self.maxsize <= 0:
+            return
+
+        self._entries[query] = names
+        self._entries.move_to_end(query)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refinements": self.refinements,
+            "size": len(self._entries),
+        }
+
+
+class PhoneIndex:
+    """Substring index over phone numbers of address book records.
+
+    Every phone is split into all its digit bigrams and trigrams. A query is answered by
+    intersecting postings of its n-grams, and only the remaining candidates are checked
+    against the full query.
+    """
+
+    gram_sizes = (2, 3)
+
+    def __init__(self):
+        # n-gram -> phones containing it
+        self._grams: dict[str, set[str]] = defaultdict(set)
+        # phone -> names of records that have it
+        self._owners: dict[str, set[str]] = defaultdict(set)
+
+    def _split(self, value: str) -> set[str]:
+        return {
+            value[i:i + size]
+            for size in self.gram_sizes
+            for i in range(len(value) - size + 1)
+        }
+
+    def add(self, phone: str, name_: str) -> None:
+        """Index phone of record with name_."""
+        if phone not in self._owners:
+            for gram in self._split(phone):
+                self._grams[gram].add(phone)
+        self._owners[phone].add(name_)
+
+    def remove(self, phone: str, name_: str) -> None:
+        """Remove phone of record with name_ from index, if present."""
+        owners = self._owners.get(phone)
+        if owners is None:
+            return
+
+        owners.discard(name_)
+        if owners:
+            return
+
+        del self._owners[phone]
+        for gram in self._split(phone):
+            phones = self._grams[gram]
+            phones.discard(phone)
+            if not phones:
+                del self._grams[gram]
+
+    def _candidates(self, *parts: str):
+        """Get phones that contain every n-gram of every part."""
+        grams = set()
+        for part in parts:
+            grams.update(self._split(part))
+
+        # Query is too short to be narrowed down by an index, every phone is a candidate.
+        if not grams:
+            return self._owners
+
+        postings = sorted((self._grams.get(gram, set()) for gram in grams), key=len)
+        return set.intersection(*postings)
+
+    def _owners_of(self, phones) -> list[str]:
+        names = set()
+        for phone in phones:
+            names.update(self._owners[phone])
+        # Phones are kept in sets, names are sorted so results do not depend on their order.
+        return sorted(names, key=lambda name_: (name_.casefold(), name_))
+
+    def search(self, query: str) -> list[str]:
+        """Get names of records that have a phone containing query, sorted the same way as in NameIndex."""
+        return self._owners_of(phone for phone in self._candidates(query) if query in phone)
+
+    def search_with_typo(self, query: str) -> list[str]:
+        """Get names of records that have a phone containing query with any single digit replaced."""
+        phones = set()
+        for i in range(len(query)):
+            left, right = query[:i], query[i + 1:]
+            pattern = compile_search_pattern(re.escape(left) + r"\d" + re.escape(right))
+            phones.update(
+                phone for phone in self._candidates(left, right) if pattern.search(phone)
+            )
+
+        return self._owners_of(phones)
+
+
+class BirthdayIndex:
+    """Calendar of address book birthdays, with one bucket of record names per day of year.
+
+    There are 366 buckets, Feb 29 birthdays have their own bucket that is visited together
+    with Feb 28 in non-leap years.
+    """
+
+    def __init__(self):
+        # Dicts keep names ordered by insertion, values are unused.
+        self._slots: list[dict[str, None]] = [{} for _ in range(366)]
+
+    @staticmethod
+    def _slot(day: date) -> int:
+        return date(_LEAP_YEAR, day.month, day.day).timetuple().tm_yday - 1
+
+    def add(self, birthday: date | None, name_: str) -> None:
+        """Add birthday of record with name_, values other than dates are ignored."""
+        if isinstance(birthday, date):
+            self._slots[self._slot(birthday)][name_] = None
+
+    def remove(self, birthday: date | None, name_: str) -> None:
+        """Remove birthday of record with name_, values other than dates are ignored."""
+        if isinstance(birthday, date):
+            self._slots[self._slot(birthday)].pop(name_, None)
+
+    def upcoming(self, today: date, days: int) -> list[tuple[date, list[str]]]:
+        """Get names of records that have birthday in following number of days, starting from today.
+
+        Returns:
+            A list of dates in ascending order, along with names that celebrate on that date.
+        """
+        result = []
+        visited = set()
+
+        # A year has at most 366 days, every bucket gets visited by then.
+        for offset in range(min(days, 366)):
+            day = today + timedelta(days=offset)
+            slots = [self._slot(day)]
+            if day.month == 2 and day.day == 28 and not calendar.isleap(day.year):
+                slots.append(_FEB_29_SLOT)
+
+            names = []
+            for slot in slots:
+                if slot not in visited:
+                    visited.add(slot)
+                    names.extend(self._slots[slot])
+
+            if names:
+                result.append((day, names))
+
+        return result
@@ -0,0 +1,489 @@
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable, MutableMapping
+from itertools import accumulate
+import json
+import mmap
+import os
+
+from .address_book import AddressBook, Record
+from .indexes import BirthdayIndex, FuzzyIndex, NameIndex, PhoneIndex, SubstringIndex
+from .note_book import Note, NotesBook
+from source.json_stream import iter_json_spans
+from source.snapshots import atomic_write
+
+
+# Offset index of a data file is cached next to it, with this suffix.
+OFFSET_INDEX_SUFFIX = ".idx"
+_OFFSET_SIZE = array("q").itemsize
+
+
+def _file_stamp(path: str) -> dict:
+    # Inode tells apart files of the same size, replaced by other processes within one mtime tick.
+    stat = os.stat(path)
+    return {"inode": stat.st_ino, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _sort_key(name_: str) -> tuple[str, str]:
+    return name_.casefold(), name_
+
+
+class _SortedKeys:
+    """Sort keys of index names in sorted order, built on access, for bisect."""
+
+    def __init__(self, offset_index: OffsetIndex):
+        self.offset_index = offset_index
+
+    def __len__(self) -> int:
+        return len(self.offset_index)
+
+    def __getitem__(self, sorted_position: int) -> tuple[str, str]:
+        offset_index = self.offset_index
+        return _sort_key(offset_index.name(offset_index.order[sorted_position]))
+
+
+class OffsetIndex:
+    """Names and byte ranges of entries in JSON data file, in file order.
+
+    The index is cached in a file next to the data file, that is memory-mapped on open, so
+    opening takes the same time for any number of entries. Names are stored as one UTF-8 blob
+    along with a permutation that sorts them ignoring case, which is used for lookups.
+
+    The cache file is a JSON header line, padded to offsets size, followed by packed start and
+    end offsets of entries, start offsets of names in the blob, sorting permutation and the blob.
+    """
+
+    def __init__(self, starts, ends, name_starts, order, names, buffer: mmap.mmap | None = None):
+        self.starts = starts
+        self.ends = ends
+        self.name_starts = name_starts
+        self.order = order
+        self.names = names
+        self._buffer = buffer
+        self._sorted_keys = _SortedKeys(self)
+
+    @classmethod
+    def empty(cls) -> OffsetIndex:
+        return cls(array("q"), array("q"), array("q", [0]), array("q"), b"")
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def name(self, position: int) -> str:
+        return str(self.names[self.name_starts[position]:self.name_starts[position + 1]], "utf-8")
+
+    def find(self, name_: str) -> int | None:
+        """Get position of the entry with name_, None if there is none."""
+        sorted_position = bisect_left(self._sorted_keys, _sort_key(name_))
+        if sorted_position < len(self):
+            position = self.order[sorted_position]
+            if self.name(position) == name_:
+                return position
+        return None
+
+    def startswith(self, prefix: str):
+        """Iterate over names starting with prefix, ignoring case, in sorted order."""
+        prefix = prefix.casefold()
+        sorted_position = bisect_left(self._sorted_keys, (prefix,))
+        while sorted_position < len(self):
+            name_ = self.name(self.order[sorted_position])
+            if not name_.casefold().startswith(prefix):
+                return
+            yield name_
+            sorted_position += 1
+
+    @staticmethod
+    def write(path: str, names: list[str], starts: array, ends: array) -> None:
+        """Cache offset index of data file at path, along with the file size and modification time."""
+        encoded_names = [name_.encode("utf-8") for name_ in names]
+        name_starts = array("q", accumulate(map(len, encoded_names), initial=0))
+        order = array("q", sorted(range(len(names)), key=lambda position: _sort_key(names[position])))
+
+        header = json.dumps({**_file_stamp(path), "count": len(names)}).encode()
+        header += b" " * (-(len(header) + 1) % _OFFSET_SIZE) + b"\n"
+
+        # Index is replaced rather than rewritten, since other processes may have it mapped.
+        with atomic_write(path + OFFSET_INDEX_SUFFIX, "wb", backups=0) as index_out:
+            index_out.write(header)
+            for offsets in (starts, ends, name_starts, order):
+                offsets.tofile(index_out)
+            index_out.write(b"".join(encoded_names))
+
+    @classmethod
+    def read(cls, path: str) -> OffsetIndex | None:
+        """Map cached offset index of data file at path, None if it is missing, stale or broken."""
+        try:
+            with open(path + OFFSET_INDEX_SUFFIX, "rb") as index_in:
+                header = json.loads(index_in.readline())
+                stamp = _file_stamp(path)
+                if {key: header.get(key) for key in stamp} != stamp:
+                    return None
+                buffer = mmap.mmap(index_in.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        count = header["count"]
+        view = memoryview(buffer)
+        position = buffer.find(b"\n") + 1
+        arrays = []
+        for size in (count, count, count + 1, count):
+            arrays.append(view[position:position + size * _OFFSET_SIZE].cast("q"))
+            position += size * _OFFSET_SIZE
+
+        offset_index = cls(*arrays, view[position:], buffer)
+        # Index file could be cut short, if the process was killed while writing it.
+        if len(arrays[2]) != count + 1 or len(offset_index.names) != arrays[2][-1]:
+            offset_index.close()
+            return None
+        return offset_index
+
+    @classmethod
+    def build(cls, path: str) -> OffsetIndex:
+        """Scan data file at path for byte ranges of its entries and cache them.
+
+        Raises:
+            FileNotFoundError: if data file doesn't exist.
+            json.JSONDecodeError: if data file is not a valid JSON.
+        """
+        names = []
+        starts = array("q")
+        ends = array("q")
+        with open(path, "r", encoding="utf-8") as json_in:
+            for start, end, item_data in iter_json_spans(json_in):
+                names.append(item_data["name_"])
+                starts.append(start)
+                ends.append(end)
+
+        cls.write(path, names, starts, ends)
+        return cls.read(path) or cls.empty()
+
+    def close(self) -> None:
+        if self._buffer is None:
+            return
+        # Views into the map have to be released before it is closed.
+        for view in (self.starts, self.ends, self.name_starts, self.order, self.names):
+            view.release()
+        self._buffer.close()
+        self._buffer = None
+
+
+class _LazyJsonMapping(MutableMapping):
+    """Dict-like view over JSON data file, that parses entries only when they are first accessed.
+
+    Only the memory-mapped offset index of the file is used to look entries up. Accessed entries
+    are kept as objects, since they can be changed in place, along with added and removed ones,
+    until the book is saved.
+    """
+
+    model: type
+
+    def __init__(self, book, path: str):
+        self.book = book
+        self.path = path
+        self._file = None
+        self._offset_index = OffsetIndex.empty()
+        # Entries of the data file that were accessed or replaced, and names of removed ones.
+        self._loaded = {}
+        self._removed: set[str] = set()
+        # Entries that are not in the data file, in insertion order.
+        self._added = {}
+
+    def open(self) -> None:
+        """Map offset index of the data file, building it if needed, entries are not parsed.
+
+        Raises:
+            FileNotFoundError: if data file doesn't exist.
+            json.JSONDecodeError: if data file is not a valid JSON.
+        """
+        offset_index = OffsetIndex.read(self.path) or OffsetIndex.build(self.path)
+        self.close()
+        self._file = open(self.path, "rb")
+        self._offset_index = offset_index
+        self._unbind(self._loaded.values(), self._added.values())
+        self._loaded = {}
+        self._removed = set()
+        self._added = {}
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._offset_index.close()
+        self._offset_index = OffsetIndex.empty()
+
+    @staticmethod
+    def _unbind(*values_groups) -> None:
+        for values in values_groups:
+            for value in values:
+                value.book = None
+
+    def _read(self, position: int) -> dict:
+        return json.loads(self._read_bytes(position))
+
+    def _file_position(self, name_: str) -> int | None:
+        if name_ in self._removed:
+            return None
+        return self._offset_index.find(name_)
+
+    def __getitem__(self, name_: str):
+        value = self._added.get(name_) or self._loaded.get(name_)
+        if value is None:
+            position = self._file_position(name_)
+            if position is None:
+                raise KeyError(name_)
+            value = self.model(**self._read(position))
+            value.book = self.book
+            self._loaded[name_] = value
+        return value
+
+    def __setitem__(self, name_: str, value) -> None:
+        replaced = self._added.get(name_) or self._loaded.get(name_)
+        if replaced is not None and replaced is not value:
+            replaced.book = None
+
+        if name_ in self._added or self._file_position(name_) is None:
+            self._added[name_] = value
+        else:
+            self._loaded[name_] = value
+        value.book = self.book
+
+    def __delitem__(self, name_: str) -> None:
+        value = self._added.pop(name_, None)
+        if value is None:
+            if self._file_position(name_) is None:
+                raise KeyError(name_)
+            self._removed.add(name_)
+            value = self._loaded.pop(name_, None)
+        if value is not None:
+            value.book = None
+
+    def __contains__(self, name_: object) -> bool:
+        return name_ in self._added or self._file_position(name_) is not None
+
+    def __iter__(self):
+        for position in range(len(self._offset_index)):
+            name_ = self._offset_index.name(position)
+            if name_ not in self._removed:
+                yield name_
+        yield from self._added
+
+    def __len__(self) -> int:
+        return len(self._offset_index) - len(self._removed) + len(self._added)
+
+    def names_starting_with(self, prefix: str) -> list[str]:
+        """Get names starting with prefix, ignoring case, sorted the same way as by NameIndex."""
+        names = [
+            name_ for name_ in self._offset_index.startswith(prefix) if name_ not in self._removed
+        ]
+        prefix = prefix.casefold()
+        names.extend(name_ for name_ in self._added if name_.casefold().startswith(prefix))
+        return sorted(names, key=_sort_key)
+
+    def replace_all(self, json_data: Iterable[dict]) -> None:
+        """Replace whole content with already serialized entries, that are kept in memory."""
+        self.close()
+        self._unbind(self._loaded.values(), self._added.values())
+        self._loaded = {}
+        self._removed = set()
+        self._added = {}
+        for item_data in json_data:
+            self[item_data["name_"]] = self.model(**item_data)
+
+    def iter_json_data(self):
+        """Iterate over serialized entries, the ones that were never accessed are not built."""
+        for position in range(len(self._offset_index)):
+            name_ = self._offset_index.name(position)
+            if name_ in self._removed:
+                continue
+            value = self._loaded.get(name_)
+            yield value.dump_to_json() if value is not None else self._read(position)
+
+        for value in self._added.values():
+            yield value.dump_to_json()
+
+    def _read_bytes(self, position: int) -> bytes:
+        start = self._offset_index.starts[position]
+        self._file.seek(start)
+        return self._file.read(self._offset_index.ends[position] - start)
+
+    def _iter_encoded(self, changed_names: set[str]):
+        """Iterate over names and JSON of entries, unchanged ones are copied from the data file as is."""
+        for position in range(len(self._offset_index)):
+            name_ = self._offset_index.name(position)
+            if name_ in self._removed:
+                continue
+            value = self._loaded.get(name_)
+            if value is not None and name_ in changed_names:
+                yield name_, json.dumps(value.dump_to_json()).encode()
+            else:
+                yield name_, self._read_bytes(position)
+
+        for name_, value in self._added.items():
+            yield name_, json.dumps(value.dump_to_json()).encode()
+
+    def save(self, changed_names: set[str]) -> None:
+        """Write all entries to the data file with atomic_write, and cache its offset index.
+
+        Only entries with changed_names are serialized, the rest are copied from the old file.
+        Entries stay in memory as they are, but all of them are in the data file from now on.
+        """
+        names = []
+        starts = array("q")
+        ends = array("q")
+
+        loaded = {**self._loaded, **self._added}
+        with atomic_write(self.path, "wb") as json_out:
+            # The same layout as written by write_json_array.
+            json_out.write(b"[")
+            for name_, encoded in self._iter_encoded(changed_names):
+                if names:
+                    json_out.write(b", ")
+                names.append(name_)
+                starts.append(json_out.tell())
+                json_out.write(encoded)
+                ends.append(json_out.tell())
+            json_out.write(b"]")
+            # Files that are still open can't be replaced on some platforms.
+            self.close()
+
+        OffsetIndex.write(self.path, names, starts, ends)
+
+        self._file = open(self.path, "rb")
+        self._offset_index = OffsetIndex.read(self.path) or OffsetIndex.empty()
+        self._loaded = loaded
+        self._removed = set()
+        self._added = {}
+
+
+class _LazyRecords(_LazyJsonMapping):
+    model = Record
+
+
+class _LazyNotes(_LazyJsonMapping):
+    model = Note
+
+
+class LazyAddressBook(AddressBook):
+    """Address book backed by JSON file, records are parsed only when first accessed.
+
+    Searches and birthdays need in-memory indexes, so the first of them parses the whole book.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.data = _LazyRecords(self, path)
+        self._is_indexed = False
+
+    def open(self) -> None:
+        """Map offset index of the data file, see _LazyJsonMapping.open."""
+        self.data.open()
+        self._drop_indexes()
+
+    def close(self) -> None:
+        self.data.close()
+
+    def save(self) -> None:
+        """Write the book to its data file, serializing only changed entries."""
+        self.data.save(self.changed_names)
+
+    def _drop_indexes(self) -> None:
+        self.generation += 1
+        self._is_indexed = False
+        self.name_index = NameIndex()
+        self.substring_index = SubstringIndex()
+        self.fuzzy_index = FuzzyIndex()
+        self.phone_index = PhoneIndex()
+        self.birthday_index = BirthdayIndex()
+
+    def _ensure_indexed(self) -> None:
+        if not self._is_indexed:
+            self._is_indexed = True
+            for record_ in self.data.values():
+                self._index_record(record_)
+
+    def __setitem__(self, name_: str, record_: Record) -> None:
+        if self._is_indexed:
+            super().__setitem__(name_, record_)
+        else:
+            self.generation += 1
+            self.changed_names.add(name_)
+            self.data[name_] = record_
+
+    def __delitem__(self, name_: str) -> None:
+        if self._is_indexed:
+            super().__delitem__(name_)
+        else:
+            self.generation += 1
+            del self.data[name_]
+            self.changed_names.add(name_)
+
+    def record_changed(self, record_: Record, field: str, old_value=None, new_value=None) -> None:
+        if self._is_indexed:
+            super().record_changed(record_, field, old_value, new_value)
+        else:
+            self.generation += 1
+            self.changed_names.add(record_.name.value)
+
+    def load_data_from_json(self, json_data):
+        self._drop_indexes()
+        self.data.replace_all(json_data)
+        self.changed_names.clear()
+
+    def iter_json_data(self):
+        return self.data.iter_json_data()
+
+    def get_birthdays_per_days(self, days) -> dict[str, list[Record]]:
+        self._ensure_indexed()
+        return super().get_birthdays_per_days(days)
+
+    def get_names_starting_with(self, prefix: str):
+        """Iterate over names from address book that start with prefix, ignoring case.
+
+        Until the book is indexed, names are looked up in the offset index, without parsing records.
+        """
+        if self._is_indexed:
+            return super().get_names_starting_with(prefix)
+        return iter(self.data.names_starting_with(prefix))
+
+
+class LazyNotesBook(NotesBook):
+    """Notes book backed by JSON file, notes are parsed only when first accessed.
+
+    Searches need in-memory indexes, so the first of them parses the whole book.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.data = _LazyNotes(self, path)
+        self._is_indexed = False
+
+    def open(self) -> None:
+        """Map offset index of the data file, see _LazyJsonMapping.open."""
+        self.data.open()
+        self._drop_indexes()
+
+    def close(self) -> None:
+        self.data.close()
+
+    def save(self) -> None:
+        """Write the book to its data file, serializing only changed entries."""
+        self.data.save(self.changed_names)
+
+    def __delitem__(self, name_: str) -> None:
+        if self._is_indexed:
+            super().__delitem__(name_)
+        else:
+            # Removed note is not parsed just to be forgotten.
+            del self.data[name_]
+            self.changed_names.add(name_)
+
+    def load_data_from_json(self, json_data):
+        self._drop_indexes()
+        self.data.replace_all(json_data)
+        self.changed_names.clear()
+
+    def iter_json_data(self):
+        return self.data.iter_json_data()
+
@@ -1,14 +1,24 @@
 from __future__ import annotations
 
 from collections import UserDict
+from typing import Iterable
 import warnings
 
 from .fields import Name, Hobby, ProjectRole, ProjectTasks
+from .indexes import TextIndex, ValueIndex
+
+
+def get_search_text(note_data: dict) -> str:
+    """Get text of serialized note, that is used for full-text search: project role, tasks and hobbies."""
+    parts = [note_data["project_role"], note_data["project_tasks"], *note_data["hobbies"]]
+    return " ".join(part for part in parts if part is not None and part != "None")
 
 
 class Note:
     """This class initialises new Note with the name and project role"""
 
+    __slots__ = ("name", "project_role", "project_tasks", "hobbies", "book", "__weakref__")
+
     def __init__(
         self,
         name_: str,
@@ -20,14 +30,24 @@ class Note:
         self.project_role: ProjectRole = ProjectRole(project_role)
         self.project_tasks: ProjectTasks = ProjectTasks(project_tasks)
         self.hobbies: list[Hobby] = [Hobby(hobby) for hobby in (hobbies or [])]
+        # Notes book the note belongs to, it is notified about changes of the note.
+        self.book: NotesBook | None = None
+
+    def _changed(self, field: str, old_value=None, new_value=None) -> None:
+        if self.book is not None:
+            self.book.note_changed(self, field, old_value, new_value)
 
     def add_project_role(self, project_role: str):
         """Add project role to note"""
+        old_project_role = self.project_role.value
         self.project_role = ProjectRole(project_role)
+        self._changed("project_role", old_project_role, project_role)
 
     def add_project_tasks(self, project_tasks: str):
         """Add project tasks to note"""
+        old_project_tasks = self.project_tasks.value
         self.project_tasks = ProjectTasks(project_tasks)
+        self._changed("project_tasks", old_project_tasks, project_tasks)
 
     def add_hobby(self, hobby: str):
         """Add hobby to note if not already present.
@@ -42,6 +62,7 @@ class Note:
             )
         except KeyError:
             self.hobbies.append(Hobby(hobby))
+            self._changed("hobbies", new_value=hobby)
 
     def find_hobby(self, hobby: str):
         """Find hobby record by value.
@@ -75,6 +96,7 @@ class Note:
         """
         _hobby = self.find_hobby(hobby)
         self.hobbies.remove(_hobby)
+        self._changed("hobbies", old_value=_hobby.value)
 
     def edit_hobby(self, hobby: str, new_hobby: str):
         """Edit hobby.
@@ -90,6 +112,15 @@ class Note:
         self.remove_hobby(hobby)
         self.add_hobby(new_hobby)
 
+    def dump_to_json(self) -> dict:
+        """Dump note into a JSON serializable dict, accepted back by Note constructor."""
+        return {
+            "name_": self.name.value,
+            "project_role": str(self.project_role),
+            "project_tasks": str(self.project_tasks),
+            "hobbies": [hobby.value for hobby in self.hobbies],
+        }
+
     def __str__(self):
         return (
             f"\n\tNote for: {self.name.value}"
@@ -104,6 +135,90 @@ class NotesBook(UserDict):
 
     data: dict[str, Note] = {}
 
+    def __init__(self, *args, **kwargs):
+        # Names of notes added, changed or removed since the book was last saved.
+        self.changed_names: set[str] = set()
+        self._drop_indexes()
+        self._is_indexed = True
+        super().__init__(*args, **kwargs)
+
+    def _drop_indexes(self) -> None:
+        """Forget indexes, they are built again by the first search that needs them."""
+        self._is_indexed = False
+        self.project_role_index = ValueIndex()
+        self.hobby_index = ValueIndex()
+        self.text_index = TextIndex()
+
+    def _ensure_indexed(self) -> None:
+        if self._is_indexed:
+            return
+        for note_ in self.data.values():
+            self._index_note(note_)
+        self._is_indexed = True
+
+    def __setitem__(self, name_: str, note_: Note) -> None:
+        self.changed_names.add(name_)
+        if not self._is_indexed:
+            note_.book = self
+            self.data[name_] = note_
+            return
+        if name_ in self.data:
+            self._unindex_note(self.data[name_])
+        self.data[name_] = note_
+        self._index_note(note_)
+
+    def __delitem__(self, name_: str) -> None:
+        if self._is_indexed:
+            self._unindex_note(self.data.pop(name_))
+        else:
+            self.data.pop(name_).book = None
+        self.changed_names.add(name_)
+
+    def _index_note(self, note_: Note) -> None:
+        note_.book = self
+        self.project_role_index.add(note_.project_role.value, note_.name.value)
+        for hobby in note_.hobbies:
+            self.hobby_index.add(hobby.value, note_.name.value)
+        self.text_index.add(get_search_text(note_.dump_to_json()), note_.name.value)
+
+    def _unindex_note(self, note_: Note) -> None:
+        note_.book = None
+        self.project_role_index.remove(note_.project_role.value, note_.name.value)
+        for hobby in note_.hobbies:
+            self.hobby_index.remove(hobby.value, note_.name.value)
+        self.text_index.remove(note_.name.value)
+
+    def note_changed(self, note_: Note, field: str, old_value=None, new_value=None) -> None:
+        """Keep indexes up to date with a change made to one of the book notes.
+
+        Args:
+            note_: Changed note.
+            field: Name of the changed note field.
+            old_value: Removed value, if any.
+            new_value: Added value, if any.
+        """
+        self.changed_names.add(note_.name.value)
+        if not self._is_indexed:
+            return
+        self.text_index.add(get_search_text(note_.dump_to_json()), note_.name.value)
+
+        index = {"project_role": self.project_role_index, "hobbies": self.hobby_index}.get(field)
+        if index is None:
+            return
+
+        # Notes can keep the same hobby in different case, the index entry stays while any is left.
+        if old_value is not None and not (
+            field == "hobbies"
+            and any(hobby.value.casefold() == old_value.casefold() for hobby in note_.hobbies)
+        ):
+            index.remove(old_value, note_.name.value)
+        if new_value is not None:
+            index.add(new_value, note_.name.value)
+
+    def mark_saved(self) -> None:
+        """Forget changes made so far, should be called once the book is saved or loaded."""
+        self.changed_names.clear()
+
     def print_notes_book(self):
         """Print all notes"""
 
@@ -113,22 +228,37 @@ class NotesBook(UserDict):
     def load_data_from_json(self, json_data):
         """Print all existing notes from file"""
 
-        self.data = {
-            _note_data["name_"]: Note(**_note_data) for _note_data in json_data
-        }
+        self.data = {}
+        self._drop_indexes()
+        self._is_indexed = True
+        for _note_data in json_data:
+            self[_note_data["name_"]] = Note(**_note_data)
+        self.changed_names.clear()
+
+    def load_notes(self, notes: Iterable[Note]) -> None:
+        """Replace book content with notes, indexes are built only once they are needed."""
+        self.data = {}
+        self._drop_indexes()
+        for note_ in notes:
+            self[note_.name.value] = note_
+        self.changed_names.clear()
 
     def dump_data_to_json(self):
         """Save notes to file"""
 
-        return [
-            {
-                "name_": _note.name.value,
-                "project_role": str(_note.project_role),
-                "project_tasks": str(_note.project_tasks),
-                "hobbies": [hobby.value for hobby in _note.hobbies],
-            }
-            for _note in self.data.values()
-        ]
+        return list(self.iter_json_data())
+
+    def iter_json_data(self):
+        """Iterate over notes serialized one by one, the same way as in dump_data_to_json."""
+        return (_note.dump_to_json() for _note in self.data.values())
+
+    def snapshot_json_data(self):
+        """Iterate over notes serialized one by one, that were in the book at the time of the call.
+
+        See AddressBook.snapshot_json_data.
+        """
+        notes = list(self.data.values())
+        return (_note.dump_to_json() for _note in notes)
 
     def add_note(self, note_: Note) -> Note | None:
         """Add a note to notes book if not already present.
@@ -137,7 +267,7 @@ class NotesBook(UserDict):
             note_: Note to add.
         """
         if note_.name.value not in self.data:
-            self.data[note_.name.value] = note_
+            self[note_.name.value] = note_
             return note_
 
     def find(self, name_: str) -> Note:
@@ -154,8 +284,21 @@ class NotesBook(UserDict):
 
         return self.data[name_]
 
+    def search(self, query: str, limit: int | None = None) -> list[Note]:
+        """Find notes that mention any word of query in project role, tasks or hobbies.
+
+        Args:
+            query: Search text.
+            limit: Maximum number of notes to return, all matches if not set.
+
+        Returns:
+            Found notes, most relevant first.
+        """
+        self._ensure_indexed()
+        return [self.data[name_] for name_ in self.text_index.search(query, limit)]
+
     def find_project_role(self, project_role_: str) -> list[Note]:
-        """Find a note/s in the notes book by project role.
+        """Find a note/s in the notes book by project role, ignoring case.
 
         Args:
             project_role_: Project role of to find.
@@ -163,13 +306,8 @@ class NotesBook(UserDict):
         Raises:
             KeyError: if note doesn't exist.
         """
-
-        notes = list(
-            filter(
-                lambda note_: note_.project_role.value == project_role_,
-                self.data.values(),
-            )
-        )
+        self._ensure_indexed()
+        notes = [self.data[name_] for name_ in self.project_role_index.get(project_role_)]
 
         if not notes:
             raise KeyError(f"Note for {project_role_} was not found.")
@@ -185,15 +323,8 @@ class NotesBook(UserDict):
         Raises:
             KeyError: if note doesn't exist.
         """
-        notes = list(
-            filter(
-                lambda note_: any(
-                    _hobby.value.casefold() == hobby_.casefold()
-                    for _hobby in note_.hobbies
-                ),
-                self.data.values(),
-            )
-        )
+        self._ensure_indexed()
+        notes = [self.data[name_] for name_ in self.hobby_index.get(hobby_)]
 
         if not notes:
             raise KeyError(f"Notes with {hobby_} were not found.")
@@ -210,4 +341,4 @@ class NotesBook(UserDict):
             KeyError: if record doesn't exist.
         """
 
-        del self.data[name_]
+        del self[name_]
@@ -0,0 +1,476 @@
+from __future__ import annotations
+
+from abc import abstractmethod
+import calendar
+from collections.abc import Iterable, MutableMapping
+from datetime import date, timedelta
+from itertools import islice
+import sqlite3
+import weakref
+
+from .address_book import AddressBook, Record
+from .indexes import TextIndex
+from .note_book import Note, NotesBook, get_search_text
+from source.utils import get_birthdays_per_days
+
+
+# Number of serialized objects inserted by a single statement when the whole table is replaced.
+STORE_CHUNK_SIZE = 1000
+
+ADDRESS_BOOK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    name TEXT PRIMARY KEY,
+    birthday TEXT,
+    birthday_month INTEGER,
+    birthday_day INTEGER,
+    address TEXT,
+    email TEXT
+);
+CREATE INDEX IF NOT EXISTS records_email ON records (email);
+CREATE INDEX IF NOT EXISTS records_birthday ON records (birthday_month, birthday_day);
+CREATE TABLE IF NOT EXISTS phones (
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    phone TEXT NOT NULL,
+    PRIMARY KEY (name, position)
+);
+CREATE INDEX IF NOT EXISTS phones_phone ON phones (phone);
+"""
+
+NOTES_BOOK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    name TEXT PRIMARY KEY,
+    project_role TEXT,
+    project_tasks TEXT
+);
+-- Roles are looked up ignoring case, databases created before that have a case-sensitive index.
+DROP INDEX IF EXISTS notes_project_role;
+CREATE INDEX IF NOT EXISTS notes_project_role_nocase ON notes (project_role COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS hobbies (
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    hobby TEXT NOT NULL,
+    hobby_casefold TEXT NOT NULL,
+    PRIMARY KEY (name, position)
+);
+CREATE INDEX IF NOT EXISTS hobbies_hobby ON hobbies (hobby_casefold);
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_text USING fts5 (name UNINDEXED, text);
+"""
+
+
+def _glob_escape(query: str) -> str:
+    """Escape GLOB special characters, so query is matched literally."""
+    return "".join(f"[{c}]" if c in "*?[" else c for c in query)
+
+
+def _single_typo_globs(query: str, wildcard: str) -> list[str]:
+    """Build GLOB patterns that tolerate a single wrong character at any position."""
+    escaped = [_glob_escape(c) for c in query]
+    return [
+        "*" + "".join(escaped[:i]) + wildcard + "".join(escaped[i + 1:]) + "*"
+        for i in range(len(query))
+    ]
+
+
+class _SqliteMapping(MutableMapping):
+    """Dict-like view over a SQLite table, that materializes objects only on access.
+
+    Objects that are still referenced elsewhere are kept in an identity map, so two lookups
+    of the same name return the same object, while the rest of the book stays on disk.
+    Subclasses define how objects are read from and written to their tables.
+    """
+
+    table: str
+    # Tables with multivalued fields (phones, hobbies) or search data linked by name.
+    child_tables: tuple[str, ...]
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+        self._loaded = weakref.WeakValueDictionary()
+
+    @abstractmethod
+    def _fetch(self, name_: str):
+        """Read object from the database, None if there is no object with such name."""
+
+    def _remove(self, name_: str) -> None:
+        for child_table in self.child_tables:
+            self.connection.execute(f"DELETE FROM {child_table} WHERE name = ?", (name_,))
+        self.connection.execute(f"DELETE FROM {self.table} WHERE name = ?", (name_,))
+
+    def __getitem__(self, name_: str):
+        value = self._loaded.get(name_)
+        if value is None:
+            value = self._fetch(name_)
+            if value is None:
+                raise KeyError(name_)
+            self._loaded[name_] = value
+        return value
+
+    def __setitem__(self, name_: str, value) -> None:
+        with self.connection:
+            self.store_many([value.dump_to_json()])
+        self._loaded[name_] = value
+
+    def __delitem__(self, name_: str) -> None:
+        if name_ not in self:
+            raise KeyError(name_)
+        with self.connection:
+            self._remove(name_)
+        self._loaded.pop(name_, None)
+
+    def __contains__(self, name_: object) -> bool:
+        cursor = self.connection.execute(f"SELECT 1 FROM {self.table} WHERE name = ?", (name_,))
+        return cursor.fetchone() is not None
+
+    def __iter__(self):
+        cursor = self.connection.execute(f"SELECT name FROM {self.table} ORDER BY rowid")
+        return (name_ for (name_,) in cursor.fetchall())
+
+    def __len__(self) -> int:
+        return self.connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def get_many(self, names: list[str]) -> list:
+        return [self[name_] for name_ in names]
+
+    def replace_all(self, json_data: Iterable[dict]) -> None:
+        """Replace whole table content with already serialized objects, stored in chunks."""
+        json_data = iter(json_data)
+        with self.connection:
+            for child_table in self.child_tables:
+                self.connection.execute(f"DELETE FROM {child_table}")
+            self.connection.execute(f"DELETE FROM {self.table}")
+            while chunk := list(islice(json_data, STORE_CHUNK_SIZE)):
+                self.store_many(chunk)
+        self._loaded.clear()
+
+    @abstractmethod
+    def store_many(self, json_data: list[dict]) -> None:
+        """Insert or update already serialized objects, should be called inside a transaction."""
+
+
+class _SqliteRecords(_SqliteMapping):
+    table = "records"
+    child_tables = ("phones",)
+
+    def _fetch(self, name_: str) -> Record | None:
+        row = self.connection.execute(
+            "SELECT name, birthday, address, email FROM records WHERE name = ?", (name_,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        phones = self.connection.execute(
+            "SELECT phone FROM phones WHERE name = ? ORDER BY position", (name_,)
+        ).fetchall()
+        return Record(
+            name_=row[0],
+            phones=[phone for (phone,) in phones],
+            birthday=row[1],
+            address=row[2],
+            email=row[3],
+        )
+
+    def store_many(self, records_data: list[dict]) -> None:
+        record_rows = []
+        phone_rows = []
+
+        for record_data in records_data:
+            birthday = record_data["birthday"]
+            month = day = None
+            if birthday is not None and birthday != "None":
+                _, month, day = (int(part) for part in birthday.split("."))
+
+            record_rows.append(
+                (
+                    record_data["name_"],
+                    birthday,
+                    month,
+                    day,
+                    record_data["address"],
+                    record_data["email"],
+                )
+            )
+            phone_rows.extend(
+                (record_data["name_"], position, phone)
+                for position, phone in enumerate(record_data["phones"])
+            )
+
+        self.connection.executemany(
+            "INSERT INTO records (name, birthday, birthday_month, birthday_day, address, email) "
+            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (name) DO UPDATE SET "
+            "birthday = excluded.birthday, birthday_month = excluded.birthday_month, "
+            "birthday_day = excluded.birthday_day, address = excluded.address, email = excluded.email",
+            record_rows,
+        )
+        self.connection.executemany(
+            "DELETE FROM phones WHERE name = ?", [(row[0],) for row in record_rows]
+        )
+        self.connection.executemany(
+            "INSERT INTO phones (name, position, phone) VALUES (?, ?, ?)", phone_rows
+        )
+
+
+class _SqliteNotes(_SqliteMapping):
+    table = "notes"
+    child_tables = ("hobbies", "notes_text")
+
+    def _fetch(self, name_: str) -> Note | None:
+        row = self.connection.execute(
+            "SELECT name, project_role, project_tasks FROM notes WHERE name = ?", (name_,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        hobbies = self.connection.execute(
+            "SELECT hobby FROM hobbies WHERE name = ? ORDER BY position", (name_,)
+        ).fetchall()
+        return Note(
+            name_=row[0],
+            project_role=row[1],
+            project_tasks=row[2],
+            hobbies=[hobby for (hobby,) in hobbies],
+        )
+
+    def store_many(self, notes_data: list[dict]) -> None:
+        self.connection.executemany(
+            "INSERT INTO notes (name, project_role, project_tasks) VALUES (?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET "
+            "project_role = excluded.project_role, project_tasks = excluded.project_tasks",
+            [
+                (note_data["name_"], note_data["project_role"], note_data["project_tasks"])
+                for note_data in notes_data
+            ],
+        )
+        self.connection.executemany(
+            "DELETE FROM hobbies WHERE name = ?", [(note_data["name_"],) for note_data in notes_data]
+        )
+        self.connection.executemany(
+            "INSERT INTO hobbies (name, position, hobby, hobby_casefold) VALUES (?, ?, ?, ?)",
+            [
+                (note_data["name_"], position, hobby, hobby.casefold())
+                for note_data in notes_data
+                for position, hobby in enumerate(note_data["hobbies"])
+            ],
+        )
+        self.connection.executemany(
+            "DELETE FROM notes_text WHERE name = ?", [(note_data["name_"],) for note_data in notes_data]
+        )
+        self.connection.executemany(
+            "INSERT INTO notes_text (name, text) VALUES (?, ?)",
+            [(note_data["name_"], get_search_text(note_data)) for note_data in notes_data],
+        )
+
+
+class SqliteAddressBook(AddressBook):
+    """Address book stored in SQLite, records are loaded only when accessed."""
+
+    # Records are stored back by the journal without notifying the book, so searches are not cached.
+    search_cache_size = 0
+
+    def __init__(self, connection: sqlite3.Connection):
+        super().__init__()
+        connection.executescript(ADDRESS_BOOK_SCHEMA)
+        self.connection = connection
+        self.data = _SqliteRecords(connection)
+
+    def __setitem__(self, name_: str, record_: Record) -> None:
+        # Database indexes are used instead of in-memory ones.
+        self.data[name_] = record_
+
+    def __delitem__(self, name_: str) -> None:
+        del self.data[name_]
+
+    def load_data_from_json(self, json_data):
+        self.data.replace_all(json_data)
+
+    def get_names_starting_with(self, prefix: str):
+        """Iterate over names from address book that start with prefix, ignoring case of ASCII letters."""
+        escaped_prefix = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        cursor = self.connection.execute(
+            "SELECT name FROM records WHERE name LIKE ? ESCAPE '\\' ORDER BY name COLLATE NOCASE",
+            (escaped_prefix + "%",),
+        )
+        return (name_ for (name_,) in cursor)
+
+    def _query_records(self, query: str, params) -> list[Record]:
+        names = [name_ for (name_,) in self.connection.execute(query, params).fetchall()]
+        return self.data.get_many(names)
+
+    def get_birthdays_per_days(self, days) -> dict[str, list[Record]]:
+        """Returns a list of records for users that have BD in a following number of days."""
+        if days <= 0:
+            return {}
+
+        today = date.today()
+        last_day = today + timedelta(days=days - 1)
+        last_month_day = (last_day.month, last_day.day)
+        # Feb 29 birthdays are celebrated on Feb 28 in non-leap years.
+        if last_month_day == (2, 28) and not calendar.isleap(last_day.year):
+            last_month_day = (2, 29)
+
+        if days > 365:
+            ranges = [((1, 1), (12, 31))]
+        elif last_day.year == today.year:
+            ranges = [((today.month, today.day), last_month_day)]
+        else:
+            ranges = [((today.month, today.day), (12, 31)), ((1, 1), last_month_day)]
+
+        records = []
+        for (start_month, start_day), (end_month, end_day) in ranges:
+            # Birthdays that already passed this year come after the rest, as in AddressBook.
+            records.extend(
+                self._query_records(
+                    "SELECT name FROM records "
+                    "WHERE (birthday_month, birthday_day) BETWEEN (?, ?) AND (?, ?) "
+                    "ORDER BY (birthday_month, birthday_day) < (?, ?), birthday_month, birthday_day, rowid",
+                    (start_month, start_day, end_month, end_day, today.month, today.day),
+                )
+            )
+
+        return get_birthdays_per_days(records, days)
+
+    def search_by_number(self, number_query: str) -> list[Record]:
+        """Find all records in address book by number query.
+
+        Args:
+            number_query: Number search term
+
+        Returns:
+            All matched records if any.
+        """
+        if len(number_query) > 10:
+            return []
+
+        results = self._query_records(
+            "SELECT name FROM records WHERE name IN "
+            "(SELECT name FROM phones WHERE instr(phone, ?) > 0) ORDER BY rowid",
+            (number_query,),
+        )
+
+        # Advanced search will make too much false positives if input term is too short.
+        if not results and len(number_query) > 3:
+            patterns = _single_typo_globs(number_query, "[0-9]")
+            results = self._query_records(
+                "SELECT name FROM records WHERE name IN (SELECT name FROM phones WHERE "
+                + " OR ".join("phone GLOB ?" for _ in patterns)
+                + ") ORDER BY rowid",
+                patterns,
+            )
+
+        return results
+
+    def search_by_name_or_email(self, query: str):
+        """Find all records in address book by name or email query.
+
+        Args:
+            query: Search term
+
+        Returns:
+            All matched records if any.
+        """
+        results = self._query_records(
+            "SELECT name FROM records WHERE instr(name, ?) > 0 OR instr(email, ?) > 0 ORDER BY rowid",
+            (query, query),
+        )
+
+        # Advanced search will make too much false positives if input term is too short.
+        if not results and len(query) > 3:
+            patterns = _single_typo_globs(query, "?")
+            results = self._query_records(
+                "SELECT name FROM records WHERE "
+                + " OR ".join("name GLOB ? OR email GLOB ?" for _ in patterns)
+                + " ORDER BY rowid",
+                [pattern for pattern in patterns for _ in range(2)],
+            )
+
+        return results
+
+
+class SqliteNotesBook(NotesBook):
+    """Notes book stored in SQLite, notes are loaded only when accessed."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        super().__init__()
+        connection.executescript(NOTES_BOOK_SCHEMA)
+        self.connection = connection
+        self.data = _SqliteNotes(connection)
+
+        # Databases created before full-text search was added have notes but no search data.
+        notes_count = connection.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+        texts_count = connection.execute("SELECT COUNT(*) FROM notes_text").fetchone()[0]
+        if notes_count != texts_count:
+            with connection:
+                connection.execute("DELETE FROM notes_text")
+                self.data.store_many([note_.dump_to_json() for note_ in self.data.values()])
+
+    def __setitem__(self, name_: str, note_: Note) -> None:
+        # Database indexes are used instead of in-memory ones.
+        self.data[name_] = note_
+
+    def __delitem__(self, name_: str) -> None:
+        del self.data[name_]
+
+    def load_data_from_json(self, json_data):
+        self.data.replace_all(json_data)
+
+    def _query_notes(self, query: str, params) -> list[Note]:
+        names = [name_ for (name_,) in self.connection.execute(query, params).fetchall()]
+        return self.data.get_many(names)
+
+    def search(self, query: str, limit: int | None = None) -> list[Note]:
+        """Find notes that mention any word of query in project role, tasks or hobbies.
+
+        Args:
+            query: Search text.
+            limit: Maximum number of notes to return, all matches if not set.
+
+        Returns:
+            Found notes, most relevant first.
+        """
+        words = TextIndex.tokenize(query)
+        if not words:
+            return []
+
+        return self._query_notes(
+            "SELECT name FROM notes_text WHERE notes_text MATCH ? ORDER BY bm25(notes_text) LIMIT ?",
+            (" OR ".join(f'"{word}"' for word in words), -1 if limit is None else limit),
+        )
+
+    def find_project_role(self, project_role_: str) -> list[Note]:
+        """Find a note/s in the notes book by project role, ignoring case of ASCII letters.
+
+        Args:
+            project_role_: Project role of to find.
+
+        Raises:
+            KeyError: if note doesn't exist.
+        """
+        notes = self._query_notes(
+            "SELECT name FROM notes WHERE project_role = ? COLLATE NOCASE ORDER BY rowid",
+            (project_role_,),
+        )
+
+        if not notes:
+            raise KeyError(f"Note for {project_role_} was not found.")
+
+        return notes
+
+    def find_hobby(self, hobby_: str) -> list[Note]:
+        """Find a notes in the notes book by hobby.
+
+        Args:
+            hobby_: Hobby role of to find.
+
+        Raises:
+            KeyError: if note doesn't exist.
+        """
+        notes = self._query_notes(
+            "SELECT name FROM notes WHERE name IN "
+            "(SELECT name FROM hobbies WHERE hobby_casefold = ?) ORDER BY rowid",
+            (hobby_.casefold(),),
+        )
+
+        if not notes:
+            raise KeyError(f"Notes with {hobby_} were not found.")
+
+        return notes
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import csv
+import datetime
+import json
+from typing import TYPE_CHECKING, Callable, Iterable, TextIO
+
+from source.importer import CSV_FIELDS, PHONES_SEPARATOR
+from source.utils import next_birthday
+
+if TYPE_CHECKING:
+    from source.datamodels import AddressBook, NotesBook, Record
+
+
+NOTES_CSV_FIELDS = ("name", "project_role", "project_tasks", "hobbies")
+HOBBIES_SEPARATOR = ";"
+
+
+def _empty_if_none(value: str | None) -> str:
+    return "" if value is None or value == "None" else value
+
+
+def iter_book_data(book: AddressBook | NotesBook, predicate: Callable | None = None):
+    """Iterate over serialized records (or notes) of the book, that predicate is true for.
+
+    Unfiltered books are serialized by the book itself, which lets it skip building objects.
+    """
+    if predicate is None:
+        return book.iter_json_data()
+    return (item.dump_to_json() for item in book.values() if predicate(item))
+
+
+def search_predicate(address_book: AddressBook, query: str) -> Callable[[Record], bool]:
+    """Get predicate, that is true for records found by search query without typos."""
+    return lambda record_: address_book.matches_query(record_, query)
+
+
+def birthday_predicate(days: int, today: datetime.date = None) -> Callable[[Record], bool]:
+    """Get predicate, that is true for records that have birthday in a following number of days."""
+    today = today or datetime.date.today()
+
+    def predicate(record_: Record) -> bool:
+        birthday = record_.get_birthday_date()
+        return birthday is not None and (next_birthday(birthday, today) - today).days < days
+
+    return predicate
+
+
+def write_json_array(items_data: Iterable[dict], stream: TextIO) -> None:
+    """Write serialized items as a JSON array, one item at a time."""
+    stream.write("[")
+    for i, item_data in enumerate(items_data):
+        if i:
+            stream.write(", ")
+        json.dump(item_data, stream)
+    stream.write("]")
+
+
+def write_json_lines(items_data: Iterable[dict], stream: TextIO) -> None:
+    """Write serialized items as JSON Lines, one item per line."""
+    for item_data in items_data:
+        stream.write(json.dumps(item_data, ensure_ascii=False) + "\n")
+
+
+def write_records_csv(records_data: Iterable[dict], stream: TextIO) -> None:
+    """Write serialized records as CSV with CSV_FIELDS columns, accepted back by importer."""
+    writer = csv.writer(stream)
+    writer.writerow(CSV_FIELDS)
+    for record_data in records_data:
+        writer.writerow(
+            (
+                record_data["name_"],
+                PHONES_SEPARATOR.join(record_data["phones"]),
+                _empty_if_none(record_data["birthday"]),
+                _empty_if_none(record_data["address"]),
+                _empty_if_none(record_data["email"]),
+            )
+        )
+
+
+def write_notes_csv(notes_data: Iterable[dict], stream: TextIO) -> None:
+    """Write serialized notes as CSV with NOTES_CSV_FIELDS columns."""
+    writer = csv.writer(stream)
+    writer.writerow(NOTES_CSV_FIELDS)
+    for note_data in notes_data:
+        writer.writerow(
+            (
+                note_data["name_"],
+                _empty_if_none(note_data["project_role"]),
+                _empty_if_none(note_data["project_tasks"]),
+                HOBBIES_SEPARATOR.join(note_data["hobbies"]),
+            )
+        )
+
+
+def _vcard_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;").replace("\n", "\\n")
+
+
+def write_vcards(records_data: Iterable[dict], stream: TextIO) -> None:
+    """Write serialized records as vCard 3.0 cards."""
+    for record_data in records_data:
+        lines = ["BEGIN:VCARD", "VERSION:3.0", f"FN:{_vcard_escape(record_data['name_'])}"]
+        lines.extend(f"TEL:{phone}" for phone in record_data["phones"])
+
+        birthday = _empty_if_none(record_data["birthday"])
+        if birthday:
+            lines.append(f"BDAY:{birthday.replace('.', '-')}")
+        address = _empty_if_none(record_data["address"])
+        if address:
+            lines.append(f"ADR:;;{_vcard_escape(address)};;;;")
+        email = _empty_if_none(record_data["email"])
+        if email:
+            lines.append(f"EMAIL:{email}")
+
+        lines.append("END:VCARD")
+        stream.write("\r\n".join(lines) + "\r\n")
+
+
+# Extension of export file -> writer of serialized records
+RECORDS_WRITERS = {
+    ".csv": write_records_csv,
+    ".jsonl": write_json_lines,
+    ".vcf": write_vcards,
+}
+NOTES_WRITERS = {
+    ".csv": write_notes_csv,
+    ".jsonl": write_json_lines,
+}
+
+
+def _get_writer(writers: dict, path: str):
+    for extension, writer in writers.items():
+        if path.lower().endswith(extension):
+            return writer
+
+    raise ValueError(
+        f"File {path} should have one of extensions: {', '.join(writers)}"
+    )
+
+
+def export_records(address_book: AddressBook, path: str, predicate: Callable | None = None) -> None:
+    """Write records to CSV, JSON Lines or vCard file, format is chosen by file extension.
+
+    Raises:
+        ValueError: if file extension is not supported.
+    """
+    writer = _get_writer(RECORDS_WRITERS, path)
+    with open(path, "w", newline="", encoding="utf-8") as file_out:
+        writer(iter_book_data(address_book, predicate), file_out)
+
+
+def export_notes(notes_book: NotesBook, path: str, predicate: Callable | None = None) -> None:
+    """Write notes to CSV or JSON Lines file, format is chosen by file extension.
+
+    Raises:
+        ValueError: if file extension is not supported.
+    """
+    writer = _get_writer(NOTES_WRITERS, path)
+    with open(path, "w", newline="", encoding="utf-8") as file_out:
+        writer(iter_book_data(notes_book, predicate), file_out)
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+import os
+import threading
+from typing import Iterator, NamedTuple
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where processes are not kept from using the same books at once.
+    fcntl = None
+
+
+# Longest generation counter kept in a lock file.
+_GENERATION_SIZE = 32
+
+
+class FileStamp(NamedTuple):
+    """Identity of a file version, that changes once the file is replaced or written to."""
+
+    inode: int
+    size: int
+    mtime_ns: int
+
+
+def file_stamp(path: str) -> FileStamp | None:
+    """Get stamp of file at path, None if it doesn't exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return FileStamp(stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+class FileLock:
+    """Advisory lock of files shared by processes, taken on a separate lock file with flock.
+
+    Lock is reentrant within a thread, a shared lock can't be upgraded to an exclusive one though.
+    Every acquisition uses its own file descriptor, so threads of one process exclude each other
+    the same way processes do.
+
+    Lock file also keeps a generation counter, that holders of the exclusive lock increase once
+    they move aside or remove files that other processes may be reading.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._held = threading.local()
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        """Hold the lock along with other readers and appenders."""
+        with self._locked(exclusive=False):
+            yield
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """Hold the lock alone, to replace or remove locked files."""
+        with self._locked(exclusive=True):
+            yield
+
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        if getattr(self._held, "fd", None) is not None:
+            if exclusive and not self._held.exclusive:
+                raise RuntimeError(f"Shared lock of {self.path} can't be upgraded to exclusive one")
+            yield
+            return
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._held.fd = fd
+            self._held.exclusive = exclusive
+            try:
+                yield
+            finally:
+                self._held.fd = None
+        finally:
+            # Closing the descriptor releases the lock.
+            os.close(fd)
+
+    def generation(self) -> int:
+        """Get generation counter, should be called holding the lock."""
+        fd = self._held.fd
+        os.lseek(fd, 0, os.SEEK_SET)
+        return int(os.read(fd, _GENERATION_SIZE) or 0)
+
+    def increase_generation(self) -> int:
+        """Increase generation counter, should be called holding the exclusive lock.
+
+        Returns:
+            New generation.
+        """
+        generation = self.generation() + 1
+        fd = self._held.fd
+        os.ftruncate(fd, 0)
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, str(generation).encode())
+        return generation
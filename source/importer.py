@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from itertools import chain, islice
+import multiprocessing
+import os
+import re
+from typing import TYPE_CHECKING, Iterable, Iterator, NamedTuple, TextIO
+
+if TYPE_CHECKING:
+    from source.datamodels import AddressBook, Record
+
+
+# Columns of contacts CSV files, phones are joined with PHONES_SEPARATOR in a single column.
+CSV_FIELDS = ("name", "phones", "birthday", "address", "email")
+PHONES_SEPARATOR = ";"
+IMPORT_CHUNK_SIZE = 1000
+# Smaller files are validated in the importing process, spawning workers takes longer than that.
+PARALLEL_IMPORT_MIN_ROWS = 20000
+# Characters used to format phone numbers in vCards, that are not part of the number.
+_PHONE_FORMATTING = str.maketrans("", "", " -().")
+# Separator of structured vCard values, that is not escaped with a backslash.
+_VCARD_SEPARATOR = re.compile(r"(?<!\\);")
+_VCARD_ESCAPE = re.compile(r"\\(.)")
+
+
+class RejectedRow(NamedTuple):
+    row_number: int
+    reason: str
+    row: dict
+
+
+class ImportResult(NamedTuple):
+    imported: list[Record]
+    rejected: list[RejectedRow]
+
+
+def read_csv_rows(csv_in: TextIO) -> Iterator[dict]:
+    """Iterate over contacts from CSV file with CSV_FIELDS columns."""
+    for row in csv.DictReader(csv_in):
+        yield {field: row.get(field) or "" for field in CSV_FIELDS}
+
+
+def _vcard_lines(vcard_in: TextIO) -> Iterator[str]:
+    """Iterate over vCard lines, joining folded lines back."""
+    line = None
+    for raw_line in vcard_in:
+        raw_line = raw_line.rstrip("\r\n")
+        if raw_line[:1] in (" ", "\t") and line is not None:
+            line += raw_line[1:]
+            continue
+        if line is not None:
+            yield line
+        line = raw_line
+    if line is not None:
+        yield line
+
+
+def _vcard_unescape(value: str) -> str:
+    return _VCARD_ESCAPE.sub(lambda m: "\n" if m.group(1) in "nN" else m.group(1), value).strip()
+
+
+def read_vcard_rows(vcard_in: TextIO) -> Iterator[dict]:
+    """Iterate over contacts from vCard file, converted to CSV_FIELDS columns."""
+    row = None
+    for line in _vcard_lines(vcard_in):
+        prop, _, value = line.partition(":")
+        # Property parameters (e.g. TEL;TYPE=cell) are not used.
+        prop = prop.split(";", 1)[0].upper()
+
+        if prop == "BEGIN":
+            row = {field: "" for field in CSV_FIELDS}
+            phones = []
+        elif row is None:
+            continue
+        elif prop == "END":
+            row["phones"] = PHONES_SEPARATOR.join(phones)
+            yield row
+            row = None
+        elif prop == "FN":
+            row["name"] = _vcard_unescape(value)
+        elif prop == "TEL":
+            phones.append(value.translate(_PHONE_FORMATTING))
+        elif prop == "BDAY":
+            # Both YYYY-MM-DD and YYYYMMDD forms are used by vCard.
+            value = value.strip().replace("-", "")
+            row["birthday"] = f"{value[:4]}.{value[4:6]}.{value[6:8]}" if len(value) == 8 else value
+        elif prop == "ADR":
+            parts = (_vcard_unescape(part) for part in _VCARD_SEPARATOR.split(value))
+            row["address"] = ", ".join(part for part in parts if part)
+        elif prop == "EMAIL" and not row["email"]:
+            row["email"] = value.strip()
+
+
+def validate_row(row: dict) -> dict:
+    """Validate contact fields and convert them to Record.from_validated arguments.
+
+    Raises:
+        ValueError: if any of the fields is invalid.
+    """
+    from source.datamodels.fields import Birthday, Email, Phone
+
+    name_ = row["name"].strip()
+    if not name_:
+        raise ValueError("Contact name is missing")
+
+    phones = [phone.strip() for phone in row["phones"].split(PHONES_SEPARATOR) if phone.strip()]
+    birthday = row["birthday"].strip()
+    email = row["email"].strip()
+
+    return {
+        "name_": name_,
+        "phones": [Phone.validate_phone(phone) for phone in phones],
+        "birthday": Birthday.validate_date(birthday) if birthday else None,
+        "address": row["address"].strip() or None,
+        "email": Email.validate_email(email) if email else None,
+    }
+
+
+def validate_chunk(rows: list[tuple[int, dict]]) -> list[tuple[int, dict, dict | None, str | None]]:
+    """Validate numbered rows, every row is returned with either Record arguments or rejection reason."""
+    results = []
+    for row_number, row in rows:
+        try:
+            results.append((row_number, row, validate_row(row), None))
+        except ValueError as e:
+            results.append((row_number, row, None, str(e)))
+    return results
+
+
+def _chunks(rows: Iterable[dict], chunk_size: int) -> Iterator[list[tuple[int, dict]]]:
+    numbered_rows = enumerate(rows, 1)
+    while chunk := list(islice(numbered_rows, chunk_size)):
+        yield chunk
+
+
+def _validate_in_pool(chunks: Iterator[list], workers: int) -> Iterator[list]:
+    """Validate chunks in worker processes, keeping only a few chunks per worker in flight.
+
+    Workers are spawned rather than forked, so they don't inherit a copy of the books, their locks
+    or the autosave thread of the parent process.
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(validate_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def import_rows(
+    address_book: AddressBook,
+    rows: Iterable[dict],
+    workers: int | None = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> ImportResult:
+    """Validate contacts and add them to address book, skipping ones that already exist.
+
+    Rows are read and validated in chunks, in worker processes if workers is more than one and
+    there are at least PARALLEL_IMPORT_MIN_ROWS rows. Valid records are added to the book at once.
+
+    Args:
+        address_book: Address book to add contacts to.
+        rows: Contacts with CSV_FIELDS keys.
+        workers: Number of worker processes, number of CPUs by default.
+        chunk_size: Number of rows validated at once.
+
+    Returns:
+        Added records and rejected rows, along with rejection reasons.
+    """
+    from source.datamodels import Record
+
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunks(rows, chunk_size)
+    first_chunks = list(islice(chunks, -(-PARALLEL_IMPORT_MIN_ROWS // chunk_size)))
+    is_parallel = workers > 1 and sum(map(len, first_chunks)) >= PARALLEL_IMPORT_MIN_ROWS
+    chunks = chain(first_chunks, chunks)
+    validated_chunks = _validate_in_pool(chunks, workers) if is_parallel else map(validate_chunk, chunks)
+
+    result = ImportResult([], [])
+    valid_rows = []
+    records = []
+    for validated_chunk in validated_chunks:
+        for row_number, row, record_data, reason in validated_chunk:
+            if reason is not None:
+                result.rejected.append(RejectedRow(row_number, reason, row))
+            else:
+                valid_rows.append((row_number, row))
+                records.append(Record.from_validated(**record_data))
+
+    added_records = address_book.add_records(records)
+    for (row_number, row), record_, added_record in zip(valid_rows, records, added_records):
+        if added_record is None:
+            result.rejected.append(
+                RejectedRow(row_number, f"Contact {record_.name.value} already exists", row)
+            )
+        else:
+            result.imported.append(added_record)
+
+    result.rejected.sort(key=lambda rejected_row: rejected_row.row_number)
+    return result
+
+
+def import_file(address_book: AddressBook, path: str, workers: int | None = None) -> ImportResult:
+    """Import contacts from CSV file, or from vCard file with .vcf or .vcard extension."""
+    with open(path, "r", newline="", encoding="utf-8") as file_in:
+        if path.lower().endswith((".vcf", ".vcard")):
+            rows = read_vcard_rows(file_in)
+        else:
+            rows = read_csv_rows(file_in)
+        return import_rows(address_book, rows, workers)
+
+
+def write_rejected_report(rejected: list[RejectedRow], path: str) -> None:
+    """Write rejected rows to CSV file, with row number and reason before contact columns."""
+    with open(path, "w", newline="", encoding="utf-8") as report_out:
+        writer = csv.writer(report_out)
+        writer.writerow(("row", "reason", *CSV_FIELDS))
+        for rejected_row in rejected:
+            writer.writerow(
+                (
+                    rejected_row.row_number,
+                    rejected_row.reason,
+                    *(rejected_row.row.get(field, "") for field in CSV_FIELDS),
+                )
+            )
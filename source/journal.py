@@ -0,0 +1,332 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+import json
+import os
+import shutil
+import time
+from typing import TYPE_CHECKING, Iterator
+
+from source.file_lock import FileLock
+
+if TYPE_CHECKING:
+    from source.datamodels import AddressBook, NotesBook, Note, Record
+
+
+USERS_BOOK = "users"
+NOTES_BOOK = "notes"
+
+PUT_OPERATION = "put"
+DELETE_OPERATION = "del"
+
+# Entries moved aside by Journal.checkpoint are kept in a file with this suffix until released.
+CHECKPOINT_SUFFIX = ".checkpoint"
+# Lock file of a journal that is not shared with book snapshots.
+LOCK_SUFFIX = ".lock"
+
+
+class Journal:
+    """Append-only write-ahead journal of changes made to address book and notes book.
+
+    Every entry holds the full state of one record (or note) after a change, so replaying
+    the same entry multiple times over a snapshot always gives the same result.
+
+    With sync disabled entries are synced to disk only on close, which is much faster for
+    bulk changes, but the last entries can be lost if the process is killed.
+
+    Entries can be moved aside with checkpoint while snapshots are written in the background,
+    they are replayed along with the new ones until the checkpoint is released.
+
+    Journal can be shared by processes, it is appended to, moved aside or cleared holding the
+    exclusive file lock, and read holding the shared one. Entries appended by other processes are
+    picked up with catch_up. Within batch the lock is taken once for all appended entries.
+    """
+
+    def __init__(self, path: str, sync: bool = True, file_lock: FileLock | None = None):
+        self.path = path
+        self.checkpoint_path = path + CHECKPOINT_SUFFIX
+        self.sync = sync
+        self.file_lock = file_lock or FileLock(path + LOCK_SUFFIX)
+        self._file = None
+        # Generation of the lock at the time the file was opened, it is reopened once journal is moved aside.
+        self._file_generation: int | None = None
+        self._entries_count = 0
+        # Monotonic time of the first entry appended since the last checkpoint or clear.
+        self.oldest_entry_at: float | None = None
+        # Generation of the lock when journal was last replayed, and byte position in journal
+        # up to which entries were applied to the books since then.
+        self.generation: int | None = None
+        self.position = 0
+        # Generation of the lock and journal size when the current batch started, None outside of batch.
+        self._batch_start: tuple[int, int] | None = None
+
+    def __len__(self):
+        return self._entries_count
+
+    def log_record(self, record: Record) -> None:
+        """Append current state of the address book record."""
+        self._append(USERS_BOOK, PUT_OPERATION, record.name.value, record.dump_to_json())
+
+    def log_records(self, records: list[Record]) -> None:
+        """Append current state of many address book records, syncing to disk only once."""
+        with self.batch():
+            for record in records:
+                self.log_record(record)
+
+    def log_record_deleted(self, name_: str) -> None:
+        """Append removal of the address book record."""
+        self._append(USERS_BOOK, DELETE_OPERATION, name_)
+
+    def log_note(self, note: Note) -> None:
+        """Append current state of the note."""
+        self._append(NOTES_BOOK, PUT_OPERATION, note.name.value, note.dump_to_json())
+
+    def log_note_deleted(self, name_: str) -> None:
+        """Append removal of the note."""
+        self._append(NOTES_BOOK, DELETE_OPERATION, name_)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Hold the exclusive file lock while entries are appended, they are flushed once at the end.
+
+        Other processes can't read or append to the journal until the batch ends, and the journal
+        should be used by one thread at a time meanwhile, the same way as the books.
+        """
+        if self._batch_start is not None:
+            yield
+            return
+
+        with self.file_lock.exclusive():
+            self._batch_start = self._open()
+            try:
+                yield
+            finally:
+                generation, start = self._batch_start
+                self._batch_start = None
+                self._commit(generation, start)
+
+    def _open(self) -> tuple[int, int]:
+        """Open journal file for appending, should be called holding the exclusive lock.
+
+        Returns:
+            Generation of the lock and size of the journal file.
+        """
+        generation = self.file_lock.generation()
+        if self._file is not None and self._file_generation != generation:
+            # Another process moved the journal aside, the file is not the journal anymore.
+            self._file.close()
+            self._file = None
+        if self._file is None:
+            self._file = open(self.path, "a")
+            self._file_generation = generation
+        return generation, os.fstat(self._file.fileno()).st_size
+
+    def _commit(self, generation: int, start: int) -> None:
+        """Flush entries appended since the journal had start size, holding the exclusive lock."""
+        # Entries are flushed while the lock is held, so other processes never see a part of one.
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+        # Nothing was appended by other processes since the last catch up, the entries are known already.
+        if generation == self.generation and start == self.position:
+            self.position = os.fstat(self._file.fileno()).st_size
+
+    def _append(self, book: str, operation: str, name_: str, data: dict = None) -> None:
+        entry = {"book": book, "op": operation, "name_": name_}
+        if data is not None:
+            entry["data"] = data
+
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        if self._batch_start is not None:
+            self._file.write(line)
+        else:
+            with self.file_lock.exclusive():
+                generation, start = self._open()
+                self._file.write(line)
+                self._commit(generation, start)
+        self._entries_count += 1
+        if self.oldest_entry_at is None:
+            self.oldest_entry_at = time.monotonic()
+
+    def replay(self, address_book: AddressBook, notes_book: NotesBook) -> int:
+        """Apply all journal entries over already loaded books, checkpointed entries first.
+
+        Returns:
+            Number of applied entries.
+        """
+        books = self._books(address_book, notes_book)
+        with self.file_lock.shared():
+            self.generation = self.file_lock.generation()
+            self._entries_count, _ = self._replay_file(self.checkpoint_path, books)
+            entries_count, self.position = self._replay_file(self.path, books)
+        self._entries_count += entries_count
+        return self._entries_count
+
+    def catch_up(self, address_book: AddressBook, notes_book: NotesBook) -> bool:
+        """Apply entries appended by other processes since the last replay or catch up.
+
+        If other processes moved the journal aside, entries are replayed again while they are kept
+        in the checkpoint, replaying an entry twice gives the same result.
+
+        Returns:
+            False if other processes folded entries into snapshots and dropped them meanwhile, then
+            changed books have to be loaded again before the journal is replayed. Nothing is
+            applied in this case.
+        """
+        books = self._books(address_book, notes_book)
+        with self.file_lock.shared():
+            generation = self.file_lock.generation()
+            if generation == self.generation:
+                entries_count, self.position = self._replay_file(self.path, books, self.position)
+                self._entries_count += entries_count
+                return True
+            # The only change is a checkpoint, the checkpoint ends with entries of the old journal.
+            if generation == self.generation + 1 and os.path.exists(self.checkpoint_path):
+                self.replay(address_book, notes_book)
+                return True
+        return False
+
+    @staticmethod
+    def _books(address_book: AddressBook, notes_book: NotesBook) -> dict:
+        from source.datamodels import Note, Record
+
+        return {
+            USERS_BOOK: (address_book, Record),
+            NOTES_BOOK: (notes_book, Note),
+        }
+
+    @staticmethod
+    def _replay_file(path: str, books: dict, position: int = 0) -> tuple[int, int]:
+        """Apply entries of journal file starting at byte position.
+
+        Returns:
+            Number of applied entries and byte position right after the last one.
+        """
+        entries_count = 0
+        try:
+            with open(path, "rb") as journal_in:
+                journal_in.seek(position)
+                for line in journal_in:
+                    if not line.endswith(b"\n"):
+                        # Entry is not complete, it is being written or the process was killed.
+                        break
+                    position += len(line)
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Entry cut short when a process was killed got joined with the next one, skip it.
+                        print("Journal entry is not a valid JSON, skipping ...")
+                        continue
+
+                    book, model = books[entry["book"]]
+                    if entry["op"] == PUT_OPERATION:
+                        book[entry["name_"]] = model(**entry["data"])
+                    else:
+                        book.pop(entry["name_"], None)
+
+                    entries_count += 1
+        except FileNotFoundError:
+            pass
+
+        return entries_count, position
+
+    def checkpoint(self) -> float | None:
+        """Move entries appended so far aside, new entries go to an empty journal.
+
+        Should be called right before snapshots are taken, moved entries have to be kept until
+        the snapshots are written. If the previous checkpoint was not released, entries are
+        added to it.
+
+        Returns:
+            Monotonic time of the oldest entry appended since the last checkpoint, if any.
+        """
+        self.close()
+        with self.file_lock.exclusive():
+            if os.path.exists(self.path):
+                if os.path.exists(self.checkpoint_path):
+                    with open(self.path, "r") as journal_in, open(self.checkpoint_path, "a") as checkpoint_out:
+                        shutil.copyfileobj(journal_in, checkpoint_out)
+                        checkpoint_out.flush()
+                        os.fsync(checkpoint_out.fileno())
+                    os.remove(self.path)
+                else:
+                    os.replace(self.path, self.checkpoint_path)
+            self.generation = self.file_lock.increase_generation()
+            self.position = 0
+
+        oldest_entry_at, self.oldest_entry_at = self.oldest_entry_at, None
+        self._entries_count = 0
+        return oldest_entry_at
+
+    def release_checkpoint(self, generation: int | None = None) -> None:
+        """Drop checkpointed entries, should be called once snapshots taken after them are written.
+
+        Args:
+            generation: Generation of the file lock after the checkpoint. If another process moved
+                the journal aside since then, the checkpoint is left to it.
+        """
+        with self.file_lock.exclusive():
+            if generation is not None and self.file_lock.generation() != generation:
+                return
+            if os.path.exists(self.checkpoint_path):
+                os.remove(self.checkpoint_path)
+
+    def clear(self) -> None:
+        """Drop all journal entries, should be called once they are folded into a snapshot."""
+        self.close()
+        with self.file_lock.exclusive():
+            # Journal is removed rather than truncated, so files of other processes that are still
+            # open don't take new entries.
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.release_checkpoint()
+            self.generation = self.file_lock.increase_generation()
+            self.position = 0
+        self._entries_count = 0
+        self.oldest_entry_at = None
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+
+class WriteThroughJournal:
+    """Journal counterpart for books that persist every change on their own (e.g. SQLite).
+
+    Logging a changed record just stores it back into the book, removals are already
+    persisted by the book itself.
+    """
+
+    def __init__(self, address_book: AddressBook, notes_book: NotesBook):
+        self.address_book = address_book
+        self.notes_book = notes_book
+
+    def __len__(self):
+        return 0
+
+    def log_record(self, record: Record) -> None:
+        self.address_book.data[record.name.value] = record
+
+    def log_records(self, records: list[Record]) -> None:
+        for record in records:
+            self.log_record(record)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Nothing to batch, every change is already stored by the book."""
+        yield
+
+    def log_record_deleted(self, name_: str) -> None:
+        pass
+
+    def log_note(self, note: Note) -> None:
+        self.notes_book.data[note.name.value] = note
+
+    def log_note_deleted(self, name_: str) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
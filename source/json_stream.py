@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Iterator, TextIO
+
+
+READ_CHUNK_SIZE = 64 * 1024
+# Characters allowed around items of JSON array or JSON Lines, array items are also separated by a comma.
+_WHITESPACE = " \t\r\n"
+# Decoding error this close to the end of the buffer may be caused by a token cut short by the chunk
+# end, the longest of them is an escaped surrogate pair in a string.
+_MAX_TOKEN_LENGTH = len("\\ud83d\\ude00")
+
+_decoder = json.JSONDecoder()
+
+
+def iter_json_items(stream: TextIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Any]:
+    """Iterate over items of a JSON array, or over lines of JSON Lines, parsing one item at a time.
+
+    Only a chunk of the file and the item being parsed are kept in memory.
+
+    Raises:
+        json.JSONDecodeError: if an item is not a valid JSON, or JSON array is not closed.
+    """
+    return (item for _, _, item in iter_json_spans(stream, chunk_size))
+
+
+def iter_json_spans(
+    stream: TextIO, chunk_size: int = READ_CHUNK_SIZE
+) -> Iterator[tuple[int, int, Any]]:
+    """Same as iter_json_items, but every item comes along with its byte range [start, end) in UTF-8 file.
+
+    Raises:
+        json.JSONDecodeError: if an item is not a valid JSON, or JSON array is not closed.
+    """
+    buffer = ""
+    position = 0
+    eof = False
+    # Byte offset of buffer[position] in the file.
+    offset = 0
+
+    def read_more() -> None:
+        nonlocal buffer, position, eof
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer, position = buffer[position:] + chunk, 0
+
+    def skip_whitespace() -> bool:
+        """Move position to the next meaningful character, returns False at the end of stream."""
+        nonlocal position, offset
+        while True:
+            start = position
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            offset += position - start
+            if position < len(buffer):
+                return True
+            if eof:
+                return False
+            read_more()
+
+    def skip_character() -> None:
+        nonlocal position, offset
+        position += 1
+        offset += 1
+
+    def error(message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, buffer, position)
+
+    if not skip_whitespace():
+        return
+    # JSON Lines have no enclosing brackets.
+    is_array = buffer[position] == "["
+    if is_array:
+        skip_character()
+        if not skip_whitespace():
+            raise error("Expecting value")
+        if buffer[position] == "]":
+            skip_character()
+            if skip_whitespace():
+                raise error("Extra data")
+            return
+
+    while True:
+        try:
+            item, end = _decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            if eof or not _is_cut_short(e, buffer):
+                raise
+            read_more()
+            continue
+
+        # Item may continue in the next chunk.
+        if end == len(buffer) and not eof:
+            read_more()
+            continue
+
+        size = _byte_length(buffer, position, end)
+        yield offset, offset + size, item
+        position = end
+        offset += size
+
+        if not skip_whitespace():
+            # File cut short after an item must not pass for a complete array.
+            if is_array:
+                raise error("Expecting ',' delimiter or ']'")
+            return
+        if not is_array:
+            continue
+
+        if buffer[position] == "]":
+            skip_character()
+            if skip_whitespace():
+                raise error("Extra data")
+            return
+        if buffer[position] != ",":
+            raise error("Expecting ',' delimiter")
+        skip_character()
+        if not skip_whitespace() or buffer[position] == "]":
+            raise error("Expecting value")
+
+
+def _is_cut_short(error: json.JSONDecodeError, buffer: str) -> bool:
+    """Check whether decoding error may be caused by the end of the buffer, rather than by invalid JSON."""
+    return error.msg.startswith("Unterminated string") or len(buffer) - error.pos <= _MAX_TOKEN_LENGTH
+
+
+def _byte_length(text: str, start: int, end: int) -> int:
+    part = text[start:end]
+    return len(part) if part.isascii() else len(part.encode("utf-8"))
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from itertools import islice
+import json
+import sys
+from typing import Iterable, TextIO
+
+
+DEFAULT_PAGE_SIZE = 50
+
+
+class StreamedOutput:
+    """Command output that is rendered lazily, line by line, while it is being written."""
+
+    def __init__(self, lines: Iterable[str], page_size: int = DEFAULT_PAGE_SIZE):
+        self.lines = iter(lines)
+        self.page_size = page_size
+
+    def __iter__(self):
+        return self.lines
+
+    def pages(self):
+        """Iterate over chunks of at most page_size rendered lines."""
+        while page := list(islice(self.lines, self.page_size)):
+            yield page
+
+    def __str__(self):
+        return "\n".join(self.lines)
+
+
+def paginate(header: str, items: Iterable, offset: int = 0, limit: int | None = None):
+    """Render header and then items in range [offset, offset + limit) one by one."""
+    yield header
+
+    stop = None if limit is None else offset + limit
+    for item in islice(items, offset, stop):
+        yield str(item)
+
+
+def _write_json_line(result: dict, stream: TextIO = None) -> None:
+    stream = stream or sys.stdout
+    stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+def write_batch_result(
+    line_number: int, command: str, output: str | StreamedOutput, stream: TextIO = None
+) -> None:
+    """Write output of a successful command as a single JSON line, streamed output is rendered in full."""
+    _write_json_line(
+        {"line": line_number, "command": command, "ok": True, "output": str(output)}, stream
+    )
+
+
+def write_batch_error(line_number: int, command: str, error: str, stream: TextIO = None) -> None:
+    """Write error of a failed command as a single JSON line."""
+    _write_json_line({"line": line_number, "command": command, "ok": False, "error": error}, stream)
+
+
+def write_output(output: str | StreamedOutput, stream: TextIO = None) -> None:
+    """Write command output to stream (stdout by default), streamed output is written page by page."""
+    stream = stream or sys.stdout
+
+    if not isinstance(output, StreamedOutput):
+        stream.write(f"{output}\n")
+        return
+
+    for page in output.pages():
+        stream.write("\n".join(page) + "\n")
+        stream.flush()
@@ -1,9 +1,35 @@
 from __future__ import annotations
 
+from contextlib import contextmanager
+from functools import partial
 import json
 import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterable, Iterator
 
-from source.datamodels import AddressBook, NotesBook
+from source.autosave import AUTOSAVE_INTERVAL, Autosaver
+from source.datamodels import (
+    AddressBook,
+    ColumnarAddressBook,
+    LazyAddressBook,
+    LazyNotesBook,
+    NotesBook,
+    SnapshotError,
+    SqliteAddressBook,
+    SqliteNotesBook,
+    is_snapshot_complete,
+    read_notes_snapshot,
+    read_records_snapshot,
+    write_notes_snapshot,
+    write_records_snapshot,
+)
+from source.exporter import write_json_array
+from source.file_lock import FileLock, FileStamp, file_stamp
+from source.journal import Journal, WriteThroughJournal
+from source.json_stream import iter_json_items
+from source.snapshots import atomic_write, generations, looks_complete, restore_backup
 from source.utils import get_root_path
 
 
@@ -11,61 +37,435 @@ DATE_FORMAT = "%Y.%m.%d"
 ROOT_PROJECT_PATH = get_root_path()
 JSON_DB_PATH = os.path.join(ROOT_PROJECT_PATH, "users.json")
 NOTES_JSON_DB_PATH = os.path.join(ROOT_PROJECT_PATH, "notes.json")
+JOURNAL_PATH = os.path.join(ROOT_PROJECT_PATH, "journal.jsonl")
+SQLITE_DB_PATH = os.path.join(ROOT_PROJECT_PATH, "books.sqlite3")
+# Advisory lock of snapshots and journal, that are shared by all processes using the books.
+LOCK_PATH = os.path.join(ROOT_PROJECT_PATH, "books.lock")
+USERS_SNAPSHOT_PATH = os.path.join(ROOT_PROJECT_PATH, "users.snapshot")
+NOTES_SNAPSHOT_PATH = os.path.join(ROOT_PROJECT_PATH, "notes.snapshot")
+# Binary snapshots have a journal and a lock of their own, their changes never reach JSON files.
+SNAPSHOT_JOURNAL_PATH = os.path.join(ROOT_PROJECT_PATH, "journal.snapshot.jsonl")
+SNAPSHOT_LOCK_PATH = os.path.join(ROOT_PROJECT_PATH, "books.snapshot.lock")
+# Journal is folded into JSON snapshots on exit only once it grows that big.
+JOURNAL_COMPACTION_THRESHOLD = 1000
 
 
 class BookReader:
+    address_book_class = AddressBook
+    users_path = JSON_DB_PATH
+    notes_path = NOTES_JSON_DB_PATH
+    journal_path = JOURNAL_PATH
+    lock_path = LOCK_PATH
     address_book: None | AddressBook = None
     notes_book: None | NotesBook = None
+    journal: None | Journal = None
+    autosaver: None | Autosaver = None
+
+    def __init__(self):
+        # Held while books are used or snapshots are taken, so autosave never sees a half-made change.
+        self.lock = threading.RLock()
+        # Held by processes while snapshots are read or replaced and while journal is appended to.
+        self.file_lock = FileLock(self.lock_path)
+        # Stamps of snapshots the books were loaded from or saved to, see refresh.
+        self._stamps: dict[str, FileStamp | None] = {}
 
     def __enter__(self):
-        self.notes_book = NotesBook()
-        self.load_existing_notes()
-        self.address_book = AddressBook()
-        self.load_existing_users()
+        # Damaged snapshots are restored from backups on load, so the lock is exclusive.
+        with self.file_lock.exclusive():
+            self.notes_book = NotesBook()
+            self.load_existing_notes()
+            self.address_book = self.address_book_class()
+            self.load_existing_users()
+            self.journal = Journal(self.journal_path, file_lock=self.file_lock)
+            self.replay_journal()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.save_existing_notes()
-        self.save_existing_users()
+        if self.autosaver is not None:
+            self.autosaver.stop()
+        self.journal.close()
+        if len(self.journal) >= JOURNAL_COMPACTION_THRESHOLD:
+            self.compact()
 
-    def load_existing_notes(self):
-        """Load existing data from NOTES_JSON_DB_PATH, fallback to empty list, if file not present."""
-        notes_data = []
+    def start_autosave(self, interval: float = AUTOSAVE_INTERVAL) -> Autosaver:
+        """Save changed books in a background thread, at most once per interval.
+
+        Books have to be used only while holding the lock from now on. The last changes are
+        saved on exit.
+        """
+        self.autosaver = Autosaver(self, interval)
+        self.autosaver.start()
+        return self.autosaver
+
+    def autosave(self) -> float | None:
+        """Save books changed since the last save, the lock is held only while snapshots are taken.
+
+        Journal entries appended before the snapshots are dropped once they are written, the ones
+        appended while they are written are kept and replayed over them on the next start. Changes
+        journaled by other processes are picked up first, so they are saved too.
+
+        Returns:
+            Monotonic time of the oldest saved change, None if nothing has changed.
+        """
+        with self.lock, self.file_lock.exclusive():
+            self.refresh()
+            if not self.notes_book.changed_names and not self.address_book.changed_names:
+                return None
+            oldest_change_at = self.journal.checkpoint() or time.monotonic()
+            generation = self.journal.generation
+            changed_names = (set(self.notes_book.changed_names), set(self.address_book.changed_names))
+            writes = self._take_snapshots(generation)
 
         try:
-            print("Loading existing notes data ...")
-            with open(NOTES_JSON_DB_PATH, "r") as json_in:
-                notes_data = json.load(json_in)
-        except FileNotFoundError:
-            print("Notes data file don't exist, returning empty list ...")
-        except json.JSONDecodeError:
-            print("Users data file is not a valid JSON, returning empty list ...")
+            for write in writes:
+                write()
+        except OSError:
+            # Changes are still in the checkpointed journal, the next save will retry them.
+            with self.lock:
+                self.notes_book.changed_names |= changed_names[0]
+                self.address_book.changed_names |= changed_names[1]
+            raise
+
+        self.journal.release_checkpoint(generation)
+        return oldest_change_at
+
+    def _take_snapshots(self, generation: int | None = None) -> list[Callable[[], None]]:
+        """Take snapshots of changed books and mark them saved, should be called holding the lock.
+
+        Args:
+            generation: Generation of the file lock when the journal was moved aside, see _committing.
+
+        Returns:
+            Functions that write the snapshots, can be called without the lock.
+        """
+        writes = []
+        if self.notes_book.changed_names:
+            writes.append(
+                partial(
+                    self._write_snapshot,
+                    self.notes_path,
+                    self.notes_book.snapshot_json_data(),
+                    generation,
+                )
+            )
+            self.notes_book.mark_saved()
+        if self.address_book.changed_names:
+            writes.append(
+                partial(
+                    self._write_snapshot,
+                    self.users_path,
+                    self.address_book.snapshot_json_data(),
+                    generation,
+                )
+            )
+            self.address_book.mark_saved()
+        return writes
+
+    def _write_snapshot(
+        self, path: str, items_data: Iterable[dict], generation: int | None = None
+    ) -> None:
+        with atomic_write(path, commit_lock=self._committing(path, generation)) as json_out:
+            write_json_array(items_data, json_out)
+
+    @contextmanager
+    def _committing(self, path: str, generation: int | None = None) -> Iterator[bool]:
+        """Hold the exclusive file lock while snapshot at path is replaced, then remember its stamp.
+
+        Yields:
+            False if the snapshot is outdated: another process moved the journal aside after
+            generation and is writing a newer snapshot, that includes changes of this one.
+        """
+        with self.file_lock.exclusive():
+            if generation is not None and self.file_lock.generation() != generation:
+                yield False
+                return
+            yield True
+            self._remember_stamp(path)
+
+    def _remember_stamp(self, path: str) -> None:
+        self._stamps[path] = file_stamp(path)
+
+    def refresh(self) -> None:
+        """Pick up changes made by other processes since the books were loaded or last refreshed.
+
+        Changes journaled by other processes are applied from the journal. Only if they were folded
+        into snapshots and dropped from the journal meanwhile, books whose snapshots have changed
+        (see FileStamp) are loaded again and the journal is replayed over them. Should be called
+        holding the lock.
+        """
+        with self.file_lock.shared():
+            if self.journal.catch_up(self.address_book, self.notes_book):
+                self._remember_stamp(self.notes_path)
+                self._remember_stamp(self.users_path)
+                return
+
+        # Snapshots may be restored from backups on load.
+        with self.file_lock.exclusive():
+            if self.journal.catch_up(self.address_book, self.notes_book):
+                return
+            if file_stamp(self.notes_path) != self._stamps.get(self.notes_path):
+                self.load_existing_notes()
+            if file_stamp(self.users_path) != self._stamps.get(self.users_path):
+                self.load_existing_users()
+            self.replay_journal()
 
-        self.notes_book.load_data_from_json(notes_data)
+    def replay_journal(self):
+        """Apply changes from journal_path, that were not yet folded into snapshots."""
+        print("Replaying journal ...")
+        self.journal.replay(self.address_book, self.notes_book)
+
+    def compact(self):
+        """Fold the journal into JSON snapshots and start a new empty journal.
+
+        Only books that were changed since they were loaded are saved, changes journaled by other
+        processes are picked up first.
+        """
+        with self.file_lock.exclusive():
+            self.refresh()
+            if self.notes_book.changed_names:
+                self.save_existing_notes()
+            if self.address_book.changed_names:
+                self.save_existing_users()
+            self.journal.clear()
+
+    def _read_snapshot(self, book: AddressBook | NotesBook, path: str) -> None:
+        """Load book from JSON file, items are parsed and added one by one.
+
+        The file may be a JSON array or JSON Lines.
+        """
+        with open(path, "r") as json_in:
+            book.load_data_from_json(iter_json_items(json_in))
+
+    def _is_complete(self, path: str) -> bool:
+        """Check that file at path was written to the end, see looks_complete."""
+        return looks_complete(path)
+
+    def _load_snapshot(self, book: AddressBook | NotesBook, path: str, title: str) -> None:
+        """Load book from JSON file, falling back to the newest of its backups that is valid.
+
+        A backup that is loaded replaces the damaged file. The book stays empty if there is
+        no valid file.
+        """
+        found = False
+        for snapshot_path in generations(path):
+            file_name = os.path.basename(snapshot_path)
+            try:
+                if not self._is_complete(snapshot_path):
+                    print(f"{title} data file {file_name} is not complete, skipping it ...")
+                    found = True
+                    continue
+                if snapshot_path != path:
+                    print(f"Restoring {title.lower()} data from {file_name} ...")
+                    restore_backup(path, snapshot_path)
+                self._read_snapshot(book, path)
+                book.mark_saved()
+                return
+            except FileNotFoundError:
+                continue
+            except json.JSONDecodeError:
+                print(f"{title} data file {file_name} is not a valid JSON, skipping it ...")
+                found = True
+            except SnapshotError as e:
+                print(f"{title} data file {file_name}: {e}, skipping it ...")
+                found = True
+
+        if found:
+            print(f"{title} data file has no valid backups, returning empty list ...")
+        else:
+            print(f"{title} data file don't exist, returning empty list ...")
+        book.load_data_from_json([])
+
+    def load_existing_notes(self):
+        """Load existing data from NOTES_JSON_DB_PATH, or from its newest valid backup."""
+        print("Loading existing notes data ...")
+        self._load_snapshot(self.notes_book, self.notes_path, "Notes")
+        self._remember_stamp(self.notes_path)
 
     def save_existing_notes(self):
-        """Save existing notes data to NOTES_JSON_DB_PATH."""
-        with open(NOTES_JSON_DB_PATH, "w") as json_out:
-            print("Saving existing notes data ...")
-            json.dump(self.notes_book.dump_data_to_json(), json_out)
+        """Save existing notes data to NOTES_JSON_DB_PATH, previous data is kept as a backup."""
+        print("Saving existing notes data ...")
+        self._write_snapshot(self.notes_path, self.notes_book.iter_json_data())
+        self.notes_book.mark_saved()
 
     def load_existing_users(self):
-        """Load existing data from JSON_DB_PATH, fallback to empty list, if file not present."""
-        users_data = []
+        """Load existing data from JSON_DB_PATH, or from its newest valid backup."""
+        print("Loading existing users data ...")
+        self._load_snapshot(self.address_book, self.users_path, "Users")
+        self._remember_stamp(self.users_path)
 
-        try:
-            print("Loading existing users data ...")
-            with open(JSON_DB_PATH, "r") as json_in:
-                users_data = json.load(json_in)
-        except FileNotFoundError:
-            print("Users data file don't exist, returning empty list ...")
-        except json.JSONDecodeError:
-            print("Users data file is not a valid JSON, returning empty list ...")
+    def save_existing_users(self):
+        """Save existing data to JSON_DB_PATH, previous data is kept as a backup."""
+        print("Saving existing users data ...")
+        self._write_snapshot(self.users_path, self.address_book.iter_json_data())
+        self.address_book.mark_saved()
+
+
+class ColumnarBookReader(BookReader):
+    """Book reader that keeps contacts in a columnar address book, backed by the same JSON files."""
+
+    address_book_class = ColumnarAddressBook
+
+
+class SnapshotBookReader(BookReader):
+    """Book reader that keeps books in binary snapshots, that are loaded without parsing JSON.
+
+    Contacts are kept in a columnar address book, that is filled with columns of the snapshot
+    as is. JSON files are converted into snapshots on the first start, later changes are kept
+    apart from them, in a journal of its own.
+    """
+
+    address_book_class = ColumnarAddressBook
+    users_path = USERS_SNAPSHOT_PATH
+    notes_path = NOTES_SNAPSHOT_PATH
+    journal_path = SNAPSHOT_JOURNAL_PATH
+    lock_path = SNAPSHOT_LOCK_PATH
 
-        self.address_book.load_data_from_json(users_data)
+    def _is_binary(self, path: str) -> bool:
+        """Check whether path is a binary snapshot or one of its backups, rather than a JSON file."""
+        return path.startswith((self.users_path, self.notes_path))
+
+    def _is_complete(self, path: str) -> bool:
+        if not self._is_binary(path):
+            return super()._is_complete(path)
+        return is_snapshot_complete(path)
+
+    def _read_snapshot(self, book: ColumnarAddressBook | NotesBook, path: str) -> None:
+        if not self._is_binary(path):
+            super()._read_snapshot(book, path)
+        elif path == self.users_path:
+            read_records_snapshot(path, book)
+        else:
+            read_notes_snapshot(path, book)
+
+    def _write_snapshot(
+        self, path: str, items_data: Iterable[dict], generation: int | None = None
+    ) -> None:
+        if not self._is_binary(path):
+            super()._write_snapshot(path, items_data, generation)
+            return
+        write = write_records_snapshot if path == self.users_path else write_notes_snapshot
+        with atomic_write(path, "wb", commit_lock=self._committing(path, generation)) as snapshot_out:
+            write(items_data, snapshot_out)
+
+    def _load_snapshot(self, book: ColumnarAddressBook | NotesBook, path: str, title: str) -> None:
+        """Load book from binary snapshot, or convert its JSON file if there is no snapshot yet.
+
+        Changes in the journal of JSON files, that were not yet folded into them, are converted too.
+        """
+        if any(os.path.exists(snapshot_path) for snapshot_path in generations(path)):
+            super()._load_snapshot(book, path, title)
+            return
+
+        json_journal = Journal(JOURNAL_PATH, file_lock=FileLock(LOCK_PATH))
+        # JSON files may be restored from backups on load, so the lock is exclusive.
+        with json_journal.file_lock.exclusive():
+            if path == self.users_path:
+                super()._load_snapshot(book, JSON_DB_PATH, title)
+                json_journal.replay(book, NotesBook())
+            else:
+                super()._load_snapshot(book, NOTES_JSON_DB_PATH, title)
+                json_journal.replay(AddressBook(), book)
+        if book:
+            print(f"Converting {title.lower()} data to {os.path.basename(path)} ...")
+            self._write_snapshot(path, book.iter_json_data())
+        book.mark_saved()
+
+
+class LazyBookReader(BookReader):
+    """Book reader that parses records and notes from JSON files only when they are accessed.
+
+    On open only offset indexes of JSON files are read, see LazyAddressBook.
+    """
+
+    address_book: None | LazyAddressBook = None
+    notes_book: None | LazyNotesBook = None
+
+    def __enter__(self):
+        with self.file_lock.exclusive():
+            self.notes_book = LazyNotesBook(self.notes_path)
+            self.load_existing_notes()
+            self.address_book = LazyAddressBook(self.users_path)
+            self.load_existing_users()
+            self.journal = Journal(self.journal_path, file_lock=self.file_lock)
+            self.replay_journal()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        super().__exit__(exc_type, exc_val, exc_tb)
+        self.notes_book.close()
+        self.address_book.close()
+
+    def _read_snapshot(self, book: LazyAddressBook | LazyNotesBook, path: str) -> None:
+        """Map offset index of JSON file at book path, items are parsed only once accessed."""
+        book.open()
+
+    def start_autosave(self, interval: float = AUTOSAVE_INTERVAL) -> None:
+        """Do nothing, lazy books can be saved only while holding the lock.
+
+        Background saves would block commands for the whole save, see _take_snapshots. Changes
+        are kept in the journal until exit.
+        """
+
+    def _take_snapshots(self, generation: int | None = None) -> list[Callable[[], None]]:
+        """Save changed books right away, should be called holding the lock.
+
+        Lazy books copy unchanged entries from their data files, that are replaced by the save,
+        so they can't be written after the lock is released.
+        """
+        for book in (self.notes_book, self.address_book):
+            if book.changed_names:
+                book.save()
+                book.mark_saved()
+                self._remember_stamp(book.data.path)
+        return []
+
+    def save_existing_notes(self):
+        """Save existing notes data to NOTES_JSON_DB_PATH, previous data is kept as a backup."""
+        print("Saving existing notes data ...")
+        self.notes_book.save()
+        self.notes_book.mark_saved()
+        self._remember_stamp(self.notes_path)
 
     def save_existing_users(self):
-        """Save existing data to JSON_DB_PATH."""
-        with open(JSON_DB_PATH, "w") as json_out:
-            print("Saving existing users data ...")
-            json.dump(self.address_book.dump_data_to_json(), json_out)
+        """Save existing data to JSON_DB_PATH, previous data is kept as a backup."""
+        print("Saving existing users data ...")
+        self.address_book.save()
+        self.address_book.mark_saved()
+        self._remember_stamp(self.users_path)
+
+
+class SqliteBookReader(BookReader):
+    """Book reader that keeps both books in SQLite database at SQLITE_DB_PATH.
+
+    Every change is written to the database straight away. JSON files are used only to import
+    data into a new database, commands 'export' and 'export-notes' write data to other files.
+    """
+
+    connection: None | sqlite3.Connection = None
+
+    def __enter__(self):
+        print("Opening books database ...")
+        self.connection = sqlite3.connect(SQLITE_DB_PATH)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.notes_book = SqliteNotesBook(self.connection)
+        self.address_book = SqliteAddressBook(self.connection)
+        self.journal = WriteThroughJournal(self.address_book, self.notes_book)
+
+        if not self.notes_book and not self.address_book:
+            self.import_json()
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.connection.close()
+
+    def start_autosave(self, interval: float = AUTOSAVE_INTERVAL) -> None:
+        """Do nothing, every change is written to the database straight away."""
+
+    def refresh(self) -> None:
+        """Do nothing, changes of other processes are read from the database straight away."""
+
+    def import_json(self):
+        """Replace books content with data from JSON files."""
+        self.load_existing_notes()
+        self.load_existing_users()
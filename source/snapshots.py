@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from contextlib import contextmanager, nullcontext
+import os
+import shutil
+import threading
+from typing import IO, ContextManager, Iterator
+
+
+# Number of previous snapshot generations kept as <path>.1 (the newest) ... <path>.N.
+BACKUP_GENERATIONS = 3
+# Snapshots are written in big chunks, instead of many small writes of separate items.
+WRITE_BUFFER_SIZE = 1024 * 1024
+# Last bytes of a snapshot that are enough to tell whether it was written to the end.
+_TAIL_SIZE = 64
+# Last character of a complete JSON array and of a complete JSON Lines file.
+_ARRAY_ENDING = b"]"
+_LINES_ENDING = b"}"
+
+
+def backup_path(path: str, generation: int) -> str:
+    return f"{path}.{generation}"
+
+
+def generations(path: str, backups: int = BACKUP_GENERATIONS) -> list[str]:
+    """Get paths of the snapshot and its backups, the newest first."""
+    return [path] + [backup_path(path, generation) for generation in range(1, backups + 1)]
+
+
+def looks_complete(path: str) -> bool:
+    """Check that snapshot is not empty and was not cut short, without reading it all.
+
+    JSON array has to end with its closing bracket, JSON Lines with the end of an item.
+
+    Raises:
+        FileNotFoundError: if snapshot doesn't exist.
+    """
+    with open(path, "rb") as snapshot_in:
+        is_array = snapshot_in.read(_TAIL_SIZE).lstrip().startswith(b"[")
+        snapshot_in.seek(0, os.SEEK_END)
+        snapshot_in.seek(max(0, snapshot_in.tell() - _TAIL_SIZE))
+        return snapshot_in.read().rstrip().endswith(_ARRAY_ENDING if is_array else _LINES_ENDING)
+
+
+def _fsync_directory(path: str) -> None:
+    """Persist renames made in the directory of path, where directories can be synced."""
+    try:
+        directory_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(directory_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(directory_fd)
+
+
+def rotate_backups(path: str, backups: int = BACKUP_GENERATIONS) -> None:
+    """Shift backups of snapshot by one generation, the current snapshot becomes the first one."""
+    paths = generations(path, backups)
+    for older, newer in reversed(list(zip(paths[1:], paths))):
+        if os.path.exists(newer):
+            os.replace(newer, older)
+
+
+@contextmanager
+def atomic_write(
+    path: str,
+    mode: str = "w",
+    backups: int = BACKUP_GENERATIONS,
+    commit_lock: ContextManager | None = None,
+) -> Iterator[IO]:
+    """Open a temporary file to write snapshot into, that replaces path once it is synced to disk.
+
+    Until then, path keeps the previous snapshot, which is kept as a backup afterwards. If writing
+    fails, the temporary file is removed and path is left untouched.
+
+    commit_lock is held only while the snapshot and its backups are replaced, not while it is
+    written. If it yields False, the snapshot is outdated and is dropped instead.
+    """
+    # Every writer has its own temporary file, so writers of the same snapshot don't mix their data.
+    temporary_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    encoding = None if "b" in mode else "utf-8"
+    try:
+        with open(temporary_path, mode, buffering=WRITE_BUFFER_SIZE, encoding=encoding) as snapshot_out:
+            yield snapshot_out
+            snapshot_out.flush()
+            os.fsync(snapshot_out.fileno())
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+    with commit_lock or nullcontext() as commit:
+        if commit is False:
+            os.remove(temporary_path)
+            return
+        if backups:
+            rotate_backups(path, backups)
+        os.replace(temporary_path, path)
+        _fsync_directory(path)
+
+
+def restore_backup(path: str, backup: str) -> None:
+    """Replace snapshot with a copy of its backup, the replaced snapshot is kept as <path>.damaged."""
+    if os.path.exists(path):
+        os.replace(path, path + ".damaged")
+    with atomic_write(path, "wb", backups=0) as snapshot_out, open(backup, "rb") as backup_in:
+        shutil.copyfileobj(backup_in, snapshot_out)
@@ -1,14 +1,51 @@
 from __future__ import annotations
 
+import calendar
 from collections import defaultdict
 import datetime
+from functools import lru_cache
 import os
+import re
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from datamodels import Record
 
 
+BIRTHDAY_OUTPUT_FORMAT = "%d %b (%A)"
+# Number of compiled search patterns kept, independently of the re module cache.
+SEARCH_PATTERNS_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=SEARCH_PATTERNS_CACHE_SIZE)
+def compile_search_pattern(pattern: str) -> re.Pattern:
+    """Compile regex pattern of a search query, reusing recently compiled ones.
+
+    Raises:
+        re.error: if pattern is not a valid regex.
+    """
+    return re.compile(pattern)
+
+
+def birthday_in_year(birthday: datetime.date, year: int) -> datetime.date:
+    """Get date of the birthday in a given year, Feb 29 birthdays are moved to Feb 28 in non-leap years."""
+    if birthday.month == 2 and birthday.day == 29 and not calendar.isleap(year):
+        return birthday.replace(year=year, day=28)
+
+    return birthday.replace(year=year)
+
+
+def next_birthday(birthday: datetime.date, today: datetime.date) -> datetime.date:
+    """Get date of the closest birthday, that is today or later."""
+    birthday_date = birthday_in_year(birthday, today.year)
+
+    # Advance by one year if birthday already passed
+    if today > birthday_date:
+        birthday_date = birthday_in_year(birthday, today.year + 1)
+
+    return birthday_date
+
+
 def get_birthdays_per_days(users_data: list[Record], days) -> dict[str, list[Record]]:
     """This function will return dictionary with all users that have birthday in following next number of days.
 
@@ -21,19 +58,15 @@ def get_birthdays_per_days(users_data: list[Record], days) -> dict[str, list[Rec
     """
     # Initial values and consts
     result = defaultdict(list)
+    today = datetime.date.today()
 
     for record in users_data:
-        if record.birthday.value is None or record.birthday.value == "None":
+        if record.birthday is None or record.birthday.value is None or record.birthday.value == "None":
             continue
 
-        birthday_date = record.birthday.value.replace(year=datetime.datetime.today().date().year)
-
-        # Advance by one year if birthday already passed
-        if datetime.datetime.today().date() > birthday_date:
-            birthday_date = birthday_date.replace(year=datetime.datetime.today().date().year + 1)
-
-        if (birthday_date - datetime.datetime.today().date()).days < days:
-            result[birthday_date.strftime("%d %b (%A)")].append(record)
+        birthday_date = next_birthday(record.birthday.value, today)
+        if (birthday_date - today).days < days:
+            result[birthday_date.strftime(BIRTHDAY_OUTPUT_FORMAT)].append(record)
 
     return result
 
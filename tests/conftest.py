@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import json
+import os
+
+import pytest
+
+from source import reader
+from source.reader import BookReader, SnapshotBookReader
+
+
+def make_users(count: int, prefix: str = "user") -> list[dict]:
+    return [
+        {
+            "name_": f"{prefix}{i}",
+            "phones": [f"{i:010d}"],
+            "birthday": f"19{i % 100:02d}.{i % 12 + 1:02d}.{i % 28 + 1:02d}",
+            "address": f"Street {i}",
+            "email": f"{prefix}{i}@example.com",
+        }
+        for i in range(count)
+    ]
+
+
+def make_notes(count: int, prefix: str = "user") -> list[dict]:
+    return [
+        {
+            "name_": f"{prefix}{i}",
+            "project_role": "Developer",
+            "project_tasks": f"Task {i}",
+            "hobbies": ["Reading", "Music"],
+        }
+        for i in range(count)
+    ]
+
+
+def write_json(path: str, items: list[dict]) -> None:
+    with open(path, "w", encoding="utf-8") as json_out:
+        json.dump(items, json_out, indent=2)
+
+
+@pytest.fixture
+def book_files(tmp_path, monkeypatch):
+    """Keep all files of book readers in a temporary directory, returns its path."""
+    root = str(tmp_path)
+    paths = {
+        "JSON_DB_PATH": os.path.join(root, "users.json"),
+        "NOTES_JSON_DB_PATH": os.path.join(root, "notes.json"),
+        "JOURNAL_PATH": os.path.join(root, "journal.jsonl"),
+        "SQLITE_DB_PATH": os.path.join(root, "books.sqlite3"),
+        "LOCK_PATH": os.path.join(root, "books.lock"),
+        "USERS_SNAPSHOT_PATH": os.path.join(root, "users.snapshot"),
+        "NOTES_SNAPSHOT_PATH": os.path.join(root, "notes.snapshot"),
+        "SNAPSHOT_JOURNAL_PATH": os.path.join(root, "journal.snapshot.jsonl"),
+        "SNAPSHOT_LOCK_PATH": os.path.join(root, "books.snapshot.lock"),
+    }
+    for name, path in paths.items():
+        monkeypatch.setattr(reader, name, path)
+    monkeypatch.setattr(BookReader, "users_path", paths["JSON_DB_PATH"])
+    monkeypatch.setattr(BookReader, "notes_path", paths["NOTES_JSON_DB_PATH"])
+    monkeypatch.setattr(BookReader, "journal_path", paths["JOURNAL_PATH"])
+    monkeypatch.setattr(BookReader, "lock_path", paths["LOCK_PATH"])
+    monkeypatch.setattr(SnapshotBookReader, "users_path", paths["USERS_SNAPSHOT_PATH"])
+    monkeypatch.setattr(SnapshotBookReader, "notes_path", paths["NOTES_SNAPSHOT_PATH"])
+    monkeypatch.setattr(SnapshotBookReader, "journal_path", paths["SNAPSHOT_JOURNAL_PATH"])
+    monkeypatch.setattr(SnapshotBookReader, "lock_path", paths["SNAPSHOT_LOCK_PATH"])
+    return root
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+import random
+import re
+
+import pytest
+
+from source.datamodels import AddressBook, Record
+from source.utils import next_birthday
+
+
+def names_of(records) -> set[str]:
+    return {record_.name.value for record_ in records}
+
+
+def linear_search_by_number(records, query: str) -> set[str]:
+    """Find records by number the way search worked before the phone index, phone by phone."""
+    if len(query) > 10:
+        return set()
+    found = {
+        record_.name.value
+        for record_ in records
+        if any(query in phone.value for phone in record_.phones)
+    }
+    if not found and len(query) > 3:
+        patterns = [
+            re.escape(query[:i]) + r"\d" + re.escape(query[i + 1:]) for i in range(len(query))
+        ]
+        found = {
+            record_.name.value
+            for record_ in records
+            if any(
+                re.search(pattern, phone.value) for pattern in patterns for phone in record_.phones
+            )
+        }
+    return found
+
+
+def linear_upcoming_birthdays(records, today: date, days: int) -> dict[date, set[str]]:
+    """Find upcoming birthdays the way it worked before the birthday index, record by record."""
+    result = {}
+    for record_ in records:
+        birthday = record_.get_birthday_date()
+        if birthday is None:
+            continue
+        birthday_date = next_birthday(birthday, today)
+        if (birthday_date - today).days < days:
+            result.setdefault(birthday_date, set()).add(record_.name.value)
+    return result
+
+
+def uncached_search(address_book: AddressBook, query: str) -> list[str]:
+    """Search the book by phone, name or email, bypassing cached queries."""
+    query = query.strip()
+    if address_book._is_number_query(query):
+        return [record_.name.value for record_ in address_book.search_by_number(query)]
+    return [record_.name.value for record_ in address_book.search_by_name_or_email(query)]
+
+
+def test_reload_drops_cached_searches():
+    address_book = AddressBook()
+    address_book.add_record(Record("Alice", phones=["0501234567"], email="alice@example.com"))
+    assert [record_.name.value for record_ in address_book.search("Alice")] == ["Alice"]
+
+    address_book.load_data_from_json([])
+    assert address_book.search("Alice") == []
+    assert not address_book.changed_names
+
+
+def test_search_indexes_are_built_on_first_search():
+    address_book = AddressBook()
+    address_book.load_data_from_json(
+        [
+            Record("Alice", phones=["0501234567"], email="alice@example.com").dump_to_json(),
+            Record("Bob", phones=["0507654321"]).dump_to_json(),
+        ]
+    )
+    assert not address_book._is_indexed
+
+    # Changes made before the indexes are built are seen by the first search.
+    address_book.find("Bob").add_phone("0671112233")
+    address_book.find("Alice").update_email("carol@test.org")
+    address_book.add_record(Record("Dave", phones=["0501234568"]))
+    del address_book["Bob"]
+
+    assert [record_.name.value for record_ in address_book.search("067111")] == []
+    assert [record_.name.value for record_ in address_book.search("carol")] == ["Alice"]
+    assert [record_.name.value for record_ in address_book.search("example.com")] == []
+    assert {record_.name.value for record_ in address_book.search("050123456")} == {"Alice", "Dave"}
+    assert address_book._is_indexed
+
+    # Once built, indexes follow the changes.
+    address_book.find("Dave").add_phone("0671112233")
+    assert [record_.name.value for record_ in address_book.search("067111")] == ["Dave"]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_phone_index_matches_linear_search(seed):
+    rng = random.Random(seed)
+
+    def random_phone() -> str:
+        return "".join(rng.choice("0127") for _ in range(10))
+
+    address_book = AddressBook()
+    for i in range(150):
+        phones = [random_phone() for _ in range(rng.randint(0, 2))]
+        address_book.add_record(Record(f"user{i}", phones=phones))
+
+    # Index follows phones added, edited and removed after it is built.
+    address_book.search("0")
+    for record_ in rng.sample(list(address_book.values()), 60):
+        if record_.phones and rng.random() < 0.5:
+            record_.edit_phone(record_.phones[0].value, random_phone())
+        elif record_.phones:
+            record_.remove_phone(record_.phones[-1].value)
+        else:
+            record_.add_phone(random_phone())
+    del address_book["user0"]
+
+    queries = ["", "12345678901"]
+    queries += ["".join(rng.choice("0127") for _ in range(rng.randint(1, 10))) for _ in range(150)]
+    for query in queries:
+        expected = linear_search_by_number(address_book.values(), query)
+        assert names_of(address_book.search_by_number(query)) == expected, query
+
+
+@pytest.mark.parametrize(
+    "today",
+    [
+        date(2023, 2, 27),  # Feb 29 birthdays are celebrated on Feb 28
+        date(2023, 2, 28),
+        date(2024, 2, 28),  # leap year, Feb 29 exists
+        date(2024, 2, 29),
+        date(2023, 3, 1),  # Feb 29 birthdays already passed
+        date(2023, 12, 20),  # upcoming week wraps to next year
+        date(2023, 12, 31),
+        date(2027, 12, 25),  # wraps into leap year 2028
+    ],
+)
+def test_birthday_index_matches_linear_scan(today):
+    rng = random.Random(today.toordinal())
+    special_days = [(2, 27), (2, 28), (2, 29), (3, 1), (12, 31), (1, 1), (1, 2)]
+
+    def random_birthday() -> date:
+        if rng.random() < 0.5:
+            month, day = rng.choice(special_days)
+            return date(rng.choice([1992, 1996, 2000]), month, day)
+        return date(1990, 1, 1) + timedelta(days=rng.randrange(366 * 4))
+
+    address_book = AddressBook()
+    for i in range(200):
+        birthday = random_birthday() if rng.random() < 0.9 else None
+        address_book.add_record(Record(f"user{i}", birthday=birthday))
+
+    # Index follows birthdays added, updated and removed.
+    for record_ in rng.sample(list(address_book.values()), 80):
+        action = rng.random()
+        if action < 0.4:
+            record_.update_birthday(random_birthday().strftime("%Y.%m.%d"))
+        elif action < 0.7:
+            record_.remove_birthday()
+        else:
+            record_.add_birthday(random_birthday().strftime("%Y.%m.%d"))
+    for name_ in ["user1", "user2", "user3"]:
+        del address_book[name_]
+
+    for days in [1, 2, 3, 7, 30, 365, 366, 400]:
+        expected = linear_upcoming_birthdays(address_book.values(), today, days)
+        upcoming = address_book.birthday_index.upcoming(today, days)
+        assert [birthday_date for birthday_date, _ in upcoming] == sorted(expected), days
+        assert {birthday_date: set(names) for birthday_date, names in upcoming} == expected, days
+
+
+def test_search_cache_stats():
+    address_book = AddressBook()
+    address_book.add_record(Record("Alice", phones=["0501234567"]))
+    address_book.add_record(Record("Alina", phones=["0671234567"]))
+
+    assert [record_.name.value for record_ in address_book.search("Ali")] == ["Alice", "Alina"]
+    assert [record_.name.value for record_ in address_book.search("Alic")] == ["Alice"]
+    assert [record_.name.value for record_ in address_book.search("Alic")] == ["Alice"]
+    assert address_book.search_cache.stats() == {
+        "hits": 1, "misses": 1, "refinements": 1, "size": 2
+    }
+
+    # Any change of the book drops cached queries.
+    address_book.find("Alina").add_phone("0509999999")
+    assert address_book.search("Alic") and address_book.search_cache.stats()["size"] == 1
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_cached_search_matches_uncached_search(seed):
+    rng = random.Random(seed)
+    names = ["Alice", "Alina", "Alan", "Bob", "Bobby", "alice", "Carol", "Caroline"]
+
+    def random_phone() -> str:
+        return "".join(rng.choice("0567") for _ in range(10))
+
+    address_book = AddressBook()
+    for i in range(40):
+        address_book.add_record(
+            Record(
+                f"{rng.choice(names)}{i}",
+                phones=[random_phone() for _ in range(rng.randint(0, 2))],
+                email=f"{rng.choice(names).lower()}@example.com" if rng.random() < 0.5 else None,
+            )
+        )
+
+    # Chains of queries, every query extending the previous one, mixed with book changes.
+    queries = ["Al", "Ali", "Alic", "Alice", "Alice1", "Bo", "Bob", "Bobb", "Carol", "Caroline",
+               "ex", "exa", "example", "0", "05", "056", "0567", "05670", " Ali ", "Alixe", "0577"]
+    for _ in range(150):
+        action = rng.random()
+        if action < 0.1:
+            record_ = rng.choice(list(address_book.values()))
+            record_.add_phone(random_phone())
+        elif action < 0.15:
+            record_ = rng.choice(list(address_book.values()))
+            record_.update_email(f"{rng.choice(names).lower()}@example.org")
+        elif action < 0.2:
+            address_book.add_record(Record(f"{rng.choice(names)}x{rng.random()}"))
+        elif action < 0.25 and len(address_book) > 10:
+            address_book.delete(rng.choice(list(address_book.keys())))
+        else:
+            query = rng.choice(queries)
+            found = [record_.name.value for record_ in address_book.search(query)]
+            assert found == uncached_search(address_book, query), query
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import io
+import json
+
+from source.cli_bot import CliHelperBot
+from source.datamodels import AddressBook, NotesBook
+from source.journal import Journal
+
+
+def run_batch(lines: list[str]) -> list[dict]:
+    stream = io.StringIO()
+    CliHelperBot(AddressBook(), NotesBook()).run_batch(lines, stream)
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_failed_commands_do_not_stop_batch():
+    results = run_batch(["hello", "no-such-command", "# comment", "", "hello", "exit", "hello"])
+
+    assert [(result["line"], result["ok"]) for result in results] == [
+        (1, True),
+        (2, False),
+        (5, True),
+        (6, True),
+    ]
+    assert "error" in results[1] and "output" not in results[1]
+
+
+def test_invalid_input_is_reported_as_failure():
+    results = run_batch(["add Quinn 0501234567", "add Quinn 0501234567", "add Riley 12"])
+
+    assert [result["ok"] for result in results] == [True, False, False]
+
+
+def test_unexpected_arguments_of_listing_commands_are_ignored_with_warning():
+    results = run_batch(
+        ["add Quinn 0501234567", "add Riley 0501234568", "all extra limit=1", "all-notes extra"]
+    )
+
+    assert [result["ok"] for result in results] == [True, True, True, True]
+    warning, header, record_ = results[2]["output"].split("\n", 2)
+    assert warning.startswith("Warning:") and warning.endswith("Received: extra")
+    assert header == "All Records: " and "Quinn" in record_ and "Riley" not in record_
+    assert results[3]["output"].startswith("Warning:")
+
+
+def test_batch_is_journaled_under_one_lock(tmp_path):
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    generation_reads = []
+    generation = journal.file_lock.generation
+    journal.file_lock.generation = lambda: generation_reads.append(1) or generation()
+
+    stream = io.StringIO()
+    lines = ["add Quinn 0501234567", "add Riley 0501234568", "delete-contact Quinn", "add Sage 12"]
+    CliHelperBot(AddressBook(), NotesBook(), journal).run_batch(lines, stream)
+    assert len(generation_reads) == 1
+
+    address_book = AddressBook()
+    assert Journal(journal.path).replay(address_book, NotesBook()) == 3
+    assert list(address_book) == ["Riley"]
+    journal.close()
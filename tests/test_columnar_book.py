@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from source.datamodels import AddressBook, Record
+from source.datamodels.columnar_book import ColumnarAddressBook
+
+
+def fill_books(phones: list[list[str]]) -> tuple[AddressBook, ColumnarAddressBook]:
+    address_book = AddressBook()
+    columnar_book = ColumnarAddressBook()
+    for i, record_phones in enumerate(phones):
+        for book in (address_book, columnar_book):
+            book.add_record(Record(f"user{i}", phones=record_phones))
+    return address_book, columnar_book
+
+
+def found_names(book, query: str) -> set[str]:
+    return {record_.name.value for record_ in book.search_by_number(query)}
+
+
+def test_typo_in_first_digit_overlapping_match():
+    address_book, columnar_book = fill_books([["1212100000"]])
+    assert found_names(columnar_book, "9121") == found_names(address_book, "9121") == {"user0"}
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_search_by_number_matches_address_book(seed):
+    rng = random.Random(seed)
+    # Few distinct digits, so that queries and their typos match often.
+    phones = [
+        ["".join(rng.choice("0129") for _ in range(10)) for _ in range(rng.randint(0, 2))]
+        for _ in range(200)
+    ]
+    address_book, columnar_book = fill_books(phones)
+
+    queries = ["", "0000000000", "12345678901"]
+    queries += ["".join(rng.choice("0129") for _ in range(rng.randint(1, 10))) for _ in range(200)]
+    for query in queries:
+        assert found_names(columnar_book, query) == found_names(address_book, query), query
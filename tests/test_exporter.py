@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import csv
+from datetime import date
+import json
+
+import pytest
+
+from source.datamodels import AddressBook, Note, NotesBook, Record
+from source.datamodels.columnar_book import ColumnarAddressBook
+from source.exporter import birthday_predicate, export_notes, export_records, search_predicate
+from source.importer import import_file
+from source.utils import get_birthdays_per_days
+
+
+def make_records() -> list[Record]:
+    today = date.today()
+    return [
+        Record("Alice", phones=["0501234567", "0671234567"], birthday=date(1990, today.month, 1)),
+        Record(
+            "Bob, Jr.", phones=["0507654321"], address="Kyiv; Main st., 1", email="bob@example.com"
+        ),
+        Record("Carol", address="Line 1\nLine 2 \\ back", email="carol@test.org"),
+        Record("Dave", birthday=date(1992, 2, 29)),
+        Record("Ева", phones=["0931112233"], birthday=date(1985, 12, 31), address="Львів"),
+    ]
+
+
+def make_book(book_class=AddressBook) -> AddressBook:
+    address_book = book_class()
+    for record_ in make_records():
+        address_book.add_record(record_)
+    return address_book
+
+
+def read_json_lines(path) -> list[dict]:
+    with open(path, encoding="utf-8") as file_in:
+        return [json.loads(line) for line in file_in]
+
+
+@pytest.mark.parametrize("extension", [".csv", ".vcf"])
+def test_exported_records_are_imported_back(tmp_path, extension):
+    address_book = make_book()
+    path = str(tmp_path / f"contacts{extension}")
+    export_records(address_book, path)
+
+    imported_book = AddressBook()
+    result = import_file(imported_book, path, workers=1)
+    assert result.rejected == []
+    assert imported_book.dump_data_to_json() == address_book.dump_data_to_json()
+
+
+@pytest.mark.parametrize("book_class", [AddressBook, ColumnarAddressBook])
+def test_json_lines_export_matches_book_dump(tmp_path, book_class):
+    address_book = make_book(book_class)
+    path = tmp_path / "contacts.jsonl"
+    export_records(address_book, str(path))
+    assert read_json_lines(path) == address_book.dump_data_to_json()
+    assert path.read_text(encoding="utf-8").count("\n") == len(address_book)
+
+
+@pytest.mark.parametrize("book_class", [AddressBook, ColumnarAddressBook])
+@pytest.mark.parametrize("query", ["Al", "o", "example", "050", "0671234567", "nobody"])
+def test_search_export_matches_linear_filter(tmp_path, book_class, query):
+    address_book = make_book(book_class)
+    path = tmp_path / "contacts.jsonl"
+    export_records(address_book, str(path), search_predicate(address_book, query))
+
+    if query.isdigit():
+        expected = [
+            record_.dump_to_json()
+            for record_ in make_records()
+            if any(query in phone.value for phone in record_.phones)
+        ]
+    else:
+        expected = [
+            record_.dump_to_json()
+            for record_ in make_records()
+            if query in record_.name.value or query in str(record_.email)
+        ]
+    assert read_json_lines(path) == expected
+
+
+@pytest.mark.parametrize("days", [1, 7, 366])
+def test_birthday_export_matches_linear_calendar(tmp_path, days):
+    address_book = make_book()
+    path = tmp_path / "contacts.jsonl"
+    export_records(address_book, str(path), birthday_predicate(days))
+
+    records = get_birthdays_per_days(make_records(), days).values()
+    expected = {record_.name.value for day_records in records for record_ in day_records}
+    assert {record_data["name_"] for record_data in read_json_lines(path)} == expected
+
+
+def test_notes_csv_export(tmp_path):
+    notes_book = NotesBook()
+    notes_book.add_note(Note("Alice", "Developer", "Fix bugs, write tests", ["Chess", "Music"]))
+    notes_book.add_note(Note("Bob", "QA"))
+    path = tmp_path / "notes.csv"
+    export_notes(notes_book, str(path))
+
+    with open(path, newline="", encoding="utf-8") as file_in:
+        rows = list(csv.DictReader(file_in))
+    assert rows == [
+        {
+            "name": "Alice",
+            "project_role": "Developer",
+            "project_tasks": "Fix bugs, write tests",
+            "hobbies": "Chess;Music",
+        },
+        {"name": "Bob", "project_role": "QA", "project_tasks": "", "hobbies": ""},
+    ]
+
+
+def test_unsupported_extension(tmp_path):
+    with pytest.raises(ValueError):
+        export_records(make_book(), str(tmp_path / "contacts.xml"))
+    with pytest.raises(ValueError):
+        export_notes(NotesBook(), str(tmp_path / "notes.vcf"))
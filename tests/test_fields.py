@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from datetime import date
+import re
+
+import pytest
+
+from source.datamodels import Birthday, Email, Record
+from source.utils import SEARCH_PATTERNS_CACHE_SIZE, compile_search_pattern
+
+
+def test_validate_date():
+    assert Birthday.validate_date("1990.02.28") == date(1990, 2, 28)
+    for invalid_date in ("1990.02.30", "28.02.1990", "", None, 19900228):
+        with pytest.raises(ValueError):
+            Birthday.validate_date(invalid_date)
+
+
+def test_search_phone_matches_uncached_regex():
+    record_ = Record("Alice", phones=["0501234567", "0679876543"])
+    for query in ["050", "67$", "^0[56]", "9.7", "12|98", r"\d{3}43", "4444", "01234567890"]:
+        expected = None
+        if len(query) <= 10:
+            expected = next(
+                (phone for phone in record_.phones if re.search(query, phone.value)), None
+            )
+        assert record_.search_phone(query) is expected, query
+
+    with pytest.raises(re.error):
+        record_.search_phone("05(")
+
+
+def test_search_patterns_cache_is_bounded():
+    compile_search_pattern.cache_clear()
+    for i in range(SEARCH_PATTERNS_CACHE_SIZE * 2):
+        assert compile_search_pattern(f"{i}$").pattern == f"{i}$"
+    assert compile_search_pattern.cache_info().currsize == SEARCH_PATTERNS_CACHE_SIZE
+
+    # Recently used patterns are compiled only once.
+    assert compile_search_pattern("050") is compile_search_pattern("050")
+
+
+def test_validate_email():
+    for email in ["alice@example.com", "a.b-c_d@mail.example.org"]:
+        assert Email.validate_email(email) == email
+    for invalid_email in ["alice", "alice@example", "alice@example.c", "al ice@example.com", ""]:
+        with pytest.raises(ValueError):
+            Email.validate_email(invalid_email)
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import pytest
+
+from source import importer
+from source.datamodels import AddressBook
+from source.importer import import_rows
+
+
+def make_rows(count: int) -> list[dict]:
+    rows = [
+        {
+            "name": f"user{i}",
+            "phones": f"{i:010d};{i + 1:010d}",
+            "birthday": f"1990.{i % 12 + 1:02d}.{i % 28 + 1:02d}",
+            "address": f"Street {i}",
+            "email": f"user{i}@example.com",
+        }
+        for i in range(count)
+    ]
+    rows[3]["phones"] = "123"
+    rows[5]["birthday"] = "1990.13.01"
+    rows[7]["name"] = "user0"
+    return rows
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_import_rows(workers, monkeypatch):
+    monkeypatch.setattr(importer, "PARALLEL_IMPORT_MIN_ROWS", 10)
+    address_book = AddressBook()
+    result = import_rows(address_book, make_rows(50), workers=workers, chunk_size=8)
+
+    assert [rejected.row_number for rejected in result.rejected] == [4, 6, 8]
+    assert len(result.imported) == len(address_book) == 47
+    record_ = address_book.find("user10")
+    assert [phone.value for phone in record_.phones] == ["0000000010", "0000000011"]
+    assert str(record_.birthday) == "1990.11.11"
+    assert record_.get_email() == "user10@example.com"
+    found = address_book.search_by_number("0000000011")
+    assert {found_record.name.value for found_record in found} == {"user10", "user11"}
+
+
+def test_small_import_is_not_parallel(monkeypatch):
+    def fail(*args):
+        raise AssertionError("Worker processes are spawned")
+
+    monkeypatch.setattr(importer, "_validate_in_pool", fail)
+    result = import_rows(AddressBook(), make_rows(50), workers=4, chunk_size=8)
+    assert len(result.imported) == 47
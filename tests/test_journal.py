@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import os
+
+from source.datamodels import AddressBook, Note, NotesBook, Record
+from source.journal import Journal
+
+
+def make_books() -> tuple[AddressBook, NotesBook]:
+    return AddressBook(), NotesBook()
+
+
+def test_replay_applies_entries_in_order(tmp_path):
+    journal = Journal(str(tmp_path / "journal.jsonl"), sync=False)
+    journal.log_record(Record("Quinn", phones=["0501234567"]))
+    journal.log_record(Record("Riley", phones=["0501234568"]))
+    journal.log_record(Record("Quinn", phones=["0509999999"]))
+    journal.log_record_deleted("Riley")
+    journal.log_note(Note("Quinn", project_role="Developer"))
+    journal.close()
+
+    address_book, notes_book = make_books()
+    assert Journal(journal.path).replay(address_book, notes_book) == 5
+    assert list(address_book) == ["Quinn"]
+    assert address_book["Quinn"].phones[0].value == "0509999999"
+    assert notes_book["Quinn"].project_role.value == "Developer"
+
+    # Entries hold the full state, so replaying them again changes nothing.
+    Journal(journal.path).replay(address_book, notes_book)
+    assert list(address_book) == ["Quinn"]
+
+
+def test_catch_up_across_checkpoint(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    writer = Journal(path, sync=False)
+    reader = Journal(path)
+    address_book, notes_book = make_books()
+
+    writer.log_record(Record("Quinn", phones=["0501234567"]))
+    reader.replay(address_book, notes_book)
+    writer.log_record(Record("Riley", phones=["0501234568"]))
+    assert reader.catch_up(address_book, notes_book)
+    assert set(address_book) == {"Quinn", "Riley"}
+
+    # Entries moved aside by a checkpoint are replayed along with the ones appended after it.
+    writer.checkpoint()
+    writer.log_record(Record("Sage", phones=["0501234569"]))
+    writer.log_record_deleted("Quinn")
+    assert reader.catch_up(address_book, notes_book)
+    assert set(address_book) == {"Riley", "Sage"}
+
+    writer.log_record(Record("Taylor", phones=["0501234560"]))
+    assert reader.catch_up(address_book, notes_book)
+    assert set(address_book) == {"Riley", "Sage", "Taylor"}
+
+    # Once entries are folded into snapshots and dropped, the books have to be loaded again.
+    writer.release_checkpoint(writer.generation)
+    writer.clear()
+    assert not reader.catch_up(address_book, notes_book)
+    writer.close()
+
+
+def test_batch_checks_journal_once(tmp_path, monkeypatch):
+    path = tmp_path / "journal.jsonl"
+    journal = Journal(str(path))
+    address_book, notes_book = make_books()
+    journal.replay(address_book, notes_book)
+
+    calls = []
+    generation = journal.file_lock.generation
+    monkeypatch.setattr(
+        journal.file_lock, "generation", lambda: calls.append("generation") or generation()
+    )
+    fstat, fsync = os.fstat, os.fsync
+    monkeypatch.setattr(os, "fstat", lambda fd: calls.append("fstat") or fstat(fd))
+    monkeypatch.setattr(os, "fsync", lambda fd: calls.append("fsync") or fsync(fd))
+
+    with journal.batch():
+        for i in range(100):
+            journal.log_record(Record(f"user{i}", phones=[f"{i:010d}"]))
+            # Nested batches are a part of the outer one.
+            journal.log_records([Record(f"other{i}", phones=[f"{i:010d}"])])
+        journal.log_record_deleted("user0")
+    assert calls == ["generation", "fstat", "fsync", "fstat"]
+    assert len(journal) == 201
+
+    # Entries of the batch are known already, catching up applies nothing.
+    assert journal.position == path.stat().st_size
+    assert journal.catch_up(address_book, notes_book)
+    assert len(address_book) == 0
+
+    assert Journal(str(path)).replay(address_book, notes_book) == 201
+    assert len(address_book) == 199 and "user0" not in address_book
+    journal.close()
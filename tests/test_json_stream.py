@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import io
+import json
+
+import pytest
+
+from source.json_stream import iter_json_items, iter_json_spans
+
+ITEMS = [
+    {"name_": "Zoë", "address": "Київ, вул. Хрещатик 1", "phones": ["0501234567"]},
+    {"name_": "李雷", "email": "li@example.com", "text": 'escaped " quote \\ é 😀'},
+    [1, -2.5e3, True, None, "x" * 100],
+    "plain string",
+    -12345678901234567890,
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 64 * 1024])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_spans_of_array_items(chunk_size, indent):
+    text = json.dumps(ITEMS, indent=indent, ensure_ascii=False)
+    data = text.encode("utf-8")
+
+    spans = list(iter_json_spans(io.StringIO(text), chunk_size))
+
+    assert [item for _, _, item in spans] == ITEMS
+    for start, end, item in spans:
+        assert json.loads(data[start:end]) == item
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 64 * 1024])
+def test_json_lines(chunk_size):
+    text = "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in ITEMS)
+    assert list(iter_json_items(io.StringIO(text), chunk_size)) == ITEMS
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["[]", " [ ] \n", "", "\n", "[1]", "[ 1 , 2 ]", '[{"a": [1, 2]}, "]"]'],
+)
+def test_valid_documents_load_as_with_json(text):
+    expected = json.loads(text) if text.strip() else []
+    for chunk_size in (1, 2, 64):
+        assert list(iter_json_items(io.StringIO(text), chunk_size)) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "[1 2]",
+        "[,1]",
+        "[1,,2]",
+        "[1,]",
+        "[1,2",
+        "[1,2,",
+        "[",
+        "[1] 2",
+        '[{"a": 1}',
+        '{"a": 1},\n{"b": 2}\n',
+    ],
+)
+def test_invalid_documents_are_rejected(text):
+    for chunk_size in (1, 2, 64):
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_items(io.StringIO(text), chunk_size))
+
+
+def test_invalid_item_fails_before_reading_the_rest():
+    class CountingStream(io.StringIO):
+        reads = 0
+
+        def read(self, size=-1):
+            self.reads += 1
+            return super().read(size)
+
+    text = '[{"a": 1}, {"b" 2}, ' + ", ".join(['{"c": 3}'] * 10000) + "]"
+    stream = CountingStream(text)
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_items(stream, chunk_size=64))
+    assert stream.reads < 5
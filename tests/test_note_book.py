@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import math
+import random
+import re
+
+import pytest
+
+from source.datamodels import Note, NotesBook
+from source.datamodels.note_book import get_search_text
+
+
+ROLES = ["Developer", "developer", "QA", "qa", "Manager", "DevOps"]
+HOBBIES = ["Chess", "chess", "Hiking", "Music", "music", "Straße", "STRASSE"]
+WORDS = ["fix", "bugs", "write", "tests", "review", "code", "deploy", "release", "docs"]
+
+
+def names_of(notes) -> set[str]:
+    return {note_.name.value for note_ in notes}
+
+
+def linear_find(notes, field: str, value: str) -> set[str]:
+    """Find notes by hobby or project role the way it worked before the value indexes, note by note."""
+    if field == "project_role":
+        return {
+            note_.name.value
+            for note_ in notes
+            if note_.project_role.value.casefold() == value.casefold()
+        }
+    return {
+        note_.name.value
+        for note_ in notes
+        if any(hobby.value.casefold() == value.casefold() for hobby in note_.hobbies)
+    }
+
+
+def find_names(find, value: str) -> set[str]:
+    try:
+        return names_of(find(value))
+    except KeyError:
+        return set()
+
+
+def test_hobby_kept_in_other_case_is_still_found():
+    notes_book = NotesBook()
+    notes_book.add_note(Note("Alice", "Developer", hobbies=["Chess", "chess"]))
+    notes_book.find("Alice").remove_hobby("chess")
+    assert names_of(notes_book.find_hobby("CHESS")) == {"Alice"}
+
+
+def linear_bm25(notes, query: str, k1: float = 1.2, b: float = 0.75) -> dict[str, float]:
+    """Score every note against query with Okapi BM25, counting words of each note from scratch."""
+    texts = {
+        note_.name.value: re.findall(r"\w+", get_search_text(note_.dump_to_json()).casefold())
+        for note_ in notes
+    }
+    if not texts:
+        return {}
+    average_length = sum(map(len, texts.values())) / len(texts)
+    scores = {}
+    for word in set(re.findall(r"\w+", query.casefold())):
+        having = [name_ for name_, words in texts.items() if word in words]
+        idf = math.log(1 + (len(texts) - len(having) + 0.5) / (len(having) + 0.5))
+        for name_ in having:
+            count = texts[name_].count(word)
+            norm = k1 * (1 - b + b * len(texts[name_]) / average_length)
+            scores[name_] = scores.get(name_, 0.0) + idf * count * (k1 + 1) / (count + norm)
+    return scores
+
+
+@pytest.mark.filterwarnings("ignore:Hobby .* was already added")
+@pytest.mark.parametrize("seed", range(3))
+def test_value_indexes_match_linear_scan(seed):
+    rng = random.Random(seed)
+    notes_book = NotesBook()
+    for i in range(100):
+        hobbies = rng.sample(HOBBIES, rng.randint(0, 3))
+        notes_book.add_note(Note(f"user{i}", rng.choice(ROLES), hobbies=hobbies))
+
+    # Indexes follow roles and hobbies changed after they are built.
+    notes_book.find_hobby("Chess")
+    for note_ in rng.sample(list(notes_book.values()), 50):
+        action = rng.random()
+        if action < 0.3:
+            note_.add_project_role(rng.choice(ROLES))
+        elif action < 0.6 and note_.hobbies:
+            note_.edit_hobby(note_.hobbies[0].value, rng.choice(HOBBIES))
+        elif action < 0.8 and note_.hobbies:
+            note_.remove_hobby(note_.hobbies[-1].value)
+        else:
+            note_.add_hobby(rng.choice(HOBBIES))
+    for name_ in ["user1", "user2", "user3"]:
+        notes_book.delete(name_)
+    notes_book.add_note(Note("user1", "Designer", hobbies=["chess"]))
+
+    for role in ROLES + ["Designer", "designer", "Unknown"]:
+        expected = linear_find(notes_book.values(), "project_role", role)
+        assert find_names(notes_book.find_project_role, role) == expected, role
+    for hobby in HOBBIES + ["strasse", "Unknown"]:
+        expected = linear_find(notes_book.values(), "hobbies", hobby)
+        assert find_names(notes_book.find_hobby, hobby) == expected, hobby
+
+
+@pytest.mark.filterwarnings("ignore:Hobby .* was already added")
+@pytest.mark.parametrize("seed", range(3))
+def test_text_search_matches_linear_bm25(seed):
+    rng = random.Random(seed)
+
+    def random_text() -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 8)))
+
+    notes_book = NotesBook()
+    for i in range(80):
+        hobbies = rng.sample(HOBBIES, rng.randint(0, 2))
+        notes_book.add_note(Note(f"user{i}", rng.choice(ROLES), random_text(), hobbies))
+
+    # Text index follows tasks, roles and hobbies changed after it is built.
+    notes_book.search("code")
+    for note_ in rng.sample(list(notes_book.values()), 40):
+        action = rng.random()
+        if action < 0.5:
+            note_.add_project_tasks(random_text())
+        elif action < 0.7:
+            note_.add_project_role(rng.choice(ROLES))
+        elif action < 0.85 and note_.hobbies:
+            note_.remove_hobby(note_.hobbies[0].value)
+        else:
+            note_.add_hobby(rng.choice(HOBBIES))
+    for name_ in ["user1", "user2", "user3"]:
+        notes_book.delete(name_)
+
+    queries = ["", "unknown", "Developer", "chess code", "fix fix bugs", "STRASSE deploy"]
+    queries += [random_text() for _ in range(20)]
+    for query in queries:
+        scores = linear_bm25(notes_book.values(), query)
+        found = [note_.name.value for note_ in notes_book.search(query)]
+        assert set(found) == set(scores), query
+        ranked = [scores[name_] for name_ in found]
+        assert all(a >= b - 1e-9 for a, b in zip(ranked, ranked[1:])), query
+
+        # Limited search returns the best scored notes, whichever of equally scored ones.
+        top = [note_.name.value for note_ in notes_book.search(query, limit=5)]
+        best = sorted(scores.values(), reverse=True)[:5]
+        assert [scores[name_] for name_ in top] == pytest.approx(best), query
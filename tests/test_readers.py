@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import json
+import os
+import random
+
+import pytest
+
+from conftest import make_notes, make_users, write_json
+from source.datamodels import AddressBook, Note, NotesBook, Record
+from source.datamodels.columnar_book import ColumnarAddressBook
+from source.reader import BookReader, LazyBookReader, SnapshotBookReader
+
+
+def add_contact(book, name: str) -> None:
+    """Add contact the way commands do, to the book and to its journal."""
+    book.address_book.add_record(Record(name, phones=["0501234567"]))
+    book.journal.log_record(book.address_book.find(name))
+
+
+def test_snapshot_storage_keeps_own_journal(book_files):
+    write_json(os.path.join(book_files, "users.json"), make_users(3))
+    write_json(os.path.join(book_files, "notes.json"), make_notes(2))
+    # Not yet compacted change of JSON storage is converted along with JSON files.
+    with BookReader() as book:
+        add_contact(book, "Quinn")
+
+    with SnapshotBookReader() as book:
+        assert "Quinn" in book.address_book
+        add_contact(book, "Riley")
+        book.compact()
+
+    with BookReader() as book:
+        assert "Quinn" in book.address_book
+        assert "Riley" not in book.address_book
+    with SnapshotBookReader() as book:
+        assert {"Quinn", "Riley"} <= set(book.address_book)
+        assert len(book.notes_book) == 2
+
+
+def delete_contact(book, name: str) -> None:
+    book.address_book.delete(name)
+    book.journal.log_record_deleted(name)
+
+
+def by_name(items_data) -> list[dict]:
+    return sorted(items_data, key=lambda data: data["name_"])
+
+
+def dump_books(book) -> tuple[list[dict], list[dict]]:
+    return by_name(book.address_book.iter_json_data()), by_name(book.notes_book.iter_json_data())
+
+
+def test_readers_refresh_each_other(book_files):
+    write_json(os.path.join(book_files, "users.json"), make_users(3))
+    write_json(os.path.join(book_files, "notes.json"), make_notes(2))
+
+    with BookReader() as first, BookReader() as second:
+        add_contact(first, "Quinn")
+        second.refresh()
+        assert "Quinn" in second.address_book
+
+        delete_contact(second, "user0")
+        first.refresh()
+        assert "user0" not in first.address_book
+
+        # Changes saved into snapshots by one reader are seen by the other one.
+        first.autosave()
+        add_contact(second, "Riley")
+        first.refresh()
+        assert {"Quinn", "Riley"} <= set(first.address_book)
+
+        first.compact()
+        second.refresh()
+        assert dump_books(second) == dump_books(first)
+
+
+@pytest.mark.parametrize("reader_class", [SnapshotBookReader, LazyBookReader])
+def test_round_trip(book_files, reader_class):
+    users = make_users(20)
+    notes = make_notes(5)
+    write_json(os.path.join(book_files, "users.json"), users)
+    write_json(os.path.join(book_files, "notes.json"), notes)
+
+    with reader_class() as book:
+        assert dump_books(book) == (by_name(users), by_name(notes))
+        add_contact(book, "Quinn")
+        delete_contact(book, "user3")
+        book.compact()
+        expected = dump_books(book)
+
+    assert os.path.exists(reader_class.users_path)
+    assert not os.path.exists(reader_class.journal_path)
+    with reader_class() as book:
+        assert dump_books(book) == expected
+    # Compacted data stays readable by the plain JSON reader, unless it is kept in binary snapshots.
+    if reader_class is LazyBookReader:
+        with open(os.path.join(book_files, "users.json"), "r", encoding="utf-8") as json_in:
+            assert by_name(json.load(json_in)) == expected[0]
+
+
+def changed_by_dump(before: list[dict], after: list[dict]) -> set[str]:
+    """Find names of changed entries by comparing full dumps of the book, entry by entry."""
+    before_by_name = {data["name_"]: data for data in before}
+    after_by_name = {data["name_"]: data for data in after}
+    return {
+        name_
+        for name_ in before_by_name.keys() | after_by_name.keys()
+        if before_by_name.get(name_) != after_by_name.get(name_)
+    }
+
+
+@pytest.mark.parametrize("book_class", [AddressBook, ColumnarAddressBook])
+@pytest.mark.parametrize("seed", range(3))
+def test_changed_records_match_dump_comparison(book_class, seed):
+    rng = random.Random(seed)
+    address_book = book_class()
+    address_book.load_data_from_json(make_users(30))
+    assert not address_book.changed_names
+
+    for _ in range(3):
+        before = address_book.dump_data_to_json()
+        for _ in range(rng.randint(0, 8)):
+            name_ = rng.choice(address_book.get_all_names())
+            action = rng.random()
+            if action < 0.2:
+                address_book.find(name_).add_phone(f"{rng.randrange(10 ** 10):010d}")
+            elif action < 0.4:
+                address_book.find(name_).update_email(f"new{rng.random()}@example.com")
+            elif action < 0.6:
+                address_book.find(name_).update_birthday(f"2000.01.{rng.randint(1, 28):02d}")
+            elif action < 0.8:
+                address_book.add_record(Record(f"new{rng.random()}", phones=["0501234567"]))
+            elif len(address_book) > 5:
+                address_book.delete(name_)
+        assert address_book.changed_names == changed_by_dump(
+            before, address_book.dump_data_to_json()
+        )
+        address_book.mark_saved()
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_changed_notes_match_dump_comparison(seed):
+    rng = random.Random(seed)
+    notes_book = NotesBook()
+    notes_book.load_data_from_json(make_notes(30))
+    assert not notes_book.changed_names
+
+    for _ in range(3):
+        before = notes_book.dump_data_to_json()
+        for _ in range(rng.randint(0, 8)):
+            name_ = rng.choice(list(notes_book.keys()))
+            action = rng.random()
+            if action < 0.2:
+                notes_book.find(name_).add_project_tasks(f"Task {rng.random()}")
+            elif action < 0.4:
+                notes_book.find(name_).add_hobby(f"Hobby {rng.random()}")
+            elif action < 0.6:
+                notes_book.find(name_).add_project_role(f"Role {rng.random()}")
+            elif action < 0.8:
+                notes_book.add_note(Note(f"new{rng.random()}", "QA"))
+            elif len(notes_book) > 5:
+                notes_book.delete(name_)
+        assert notes_book.changed_names == changed_by_dump(before, notes_book.dump_data_to_json())
+        notes_book.mark_saved()
+
+
+def file_state(path: str) -> tuple[int, int, bytes]:
+    with open(path, "rb") as file_in:
+        return os.stat(path).st_ino, os.stat(path).st_mtime_ns, file_in.read()
+
+
+@pytest.mark.parametrize("reader_class", [BookReader, SnapshotBookReader, LazyBookReader])
+def test_only_changed_books_are_saved(book_files, reader_class):
+    write_json(os.path.join(book_files, "users.json"), make_users(10))
+    write_json(os.path.join(book_files, "notes.json"), make_notes(5))
+    with reader_class() as book:
+        add_contact(book, "Quinn")
+        book.notes_book.add_note(Note("Quinn", "QA"))
+        book.journal.log_note(book.notes_book.find("Quinn"))
+        book.compact()
+
+    users_state = file_state(reader_class.users_path)
+    notes_state = file_state(reader_class.notes_path)
+
+    # Nothing is written by a session that only reads.
+    with reader_class() as book:
+        assert "Quinn" in book.address_book
+        book.address_book.search("Quinn")
+        book.compact()
+    assert file_state(reader_class.users_path) == users_state
+    assert file_state(reader_class.notes_path) == notes_state
+
+    with reader_class() as book:
+        delete_contact(book, "user3")
+        book.compact()
+        expected = dump_books(book)
+    assert file_state(reader_class.users_path) != users_state
+    assert file_state(reader_class.notes_path) == notes_state
+
+    with reader_class() as book:
+        assert dump_books(book) == expected
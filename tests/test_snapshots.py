@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+
+import pytest
+
+from conftest import make_users, write_json
+from source.json_stream import iter_json_items
+from source.reader import BookReader
+from source.snapshots import looks_complete
+
+
+def truncate_after_item(path: str, items: int) -> None:
+    """Cut JSON array at path right after the closing brace of its item number items."""
+    with open(path, "r", encoding="utf-8") as json_in:
+        text = json_in.read()
+    end = 0
+    for _ in range(items):
+        end = text.index("\n  }", end) + len("\n  }")
+    with open(path, "w", encoding="utf-8") as json_out:
+        json_out.write(text[:end])
+
+
+def test_looks_complete(tmp_path):
+    path = str(tmp_path / "users.json")
+    write_json(path, make_users(3))
+    assert looks_complete(path)
+
+    truncate_after_item(path, 2)
+    assert not looks_complete(path)
+
+    with open(path, "w") as lines_out:
+        lines_out.write('{"a": 1}\n{"b": 2}\n')
+    assert looks_complete(path)
+
+
+def test_truncated_array_is_not_valid_json():
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_items(io.StringIO('[{"a": 1}, {"b": 2}'), chunk_size=4))
+    assert list(iter_json_items(io.StringIO('{"a": 1}\n{"b": 2}\n'))) == [{"a": 1}, {"b": 2}]
+
+
+def test_truncated_snapshot_is_restored_from_backup(book_files):
+    users_path = os.path.join(book_files, "users.json")
+    write_json(users_path + ".1", make_users(14))
+    write_json(users_path, make_users(14))
+    truncate_after_item(users_path, 3)
+
+    with BookReader() as book:
+        assert len(book.address_book) == 14
+    assert os.path.exists(users_path + ".damaged")
+    assert looks_complete(users_path)
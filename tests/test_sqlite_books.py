@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+import sqlite3
+
+import pytest
+
+from source.datamodels import AddressBook, Note, Record
+from source.datamodels.sqlite_books import SqliteAddressBook, SqliteNotesBook
+
+
+@pytest.mark.parametrize("days", [1, 7, 60, 366])
+def test_birthdays_are_ordered_as_in_address_book(days):
+    today = date.today()
+    address_book = AddressBook()
+    sqlite_book = SqliteAddressBook(sqlite3.connect(":memory:"))
+    # Birthdays are added out of order and wrap around the end of year.
+    for i, offset in enumerate([40, 3, 0, 200, 3, 364, 1, 90]):
+        birthday = (today + timedelta(days=offset)).replace(year=1992).strftime("%Y.%m.%d")
+        for book in (address_book, sqlite_book):
+            book.add_record(Record(f"user{i}", phones=["0501234567"], birthday=birthday))
+
+    def dump(book):
+        return [
+            (day, [record_.name.value for record_ in records])
+            for day, records in book.get_birthdays_per_days(days).items()
+        ]
+
+    assert dump(sqlite_book) == dump(address_book)
+
+
+def test_project_role_lookup_ignores_case_using_index():
+    notes_book = SqliteNotesBook(sqlite3.connect(":memory:"))
+    for name_, role in (("Quinn", "Developer"), ("Riley", "QA"), ("Sage", "developer")):
+        notes_book.add_note(Note(name_, project_role=role))
+
+    found = notes_book.find_project_role("DEVELOPER")
+    assert [note_.name.value for note_ in found] == ["Quinn", "Sage"]
+
+    plan = notes_book.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT name FROM notes WHERE project_role = ? COLLATE NOCASE",
+        ("developer",),
+    ).fetchall()
+    assert "notes_project_role_nocase" in str(plan)